@@ -1,4 +1,6 @@
+import secrets
 import subprocess as sp
+import uuid
 import streamlit as st
 import pandas as pd
 from database.db import init_db
@@ -9,20 +11,44 @@ from database.bank_crud import (
 )
 from database.security import verify_password
 from dialogue_manager.dialogue_handler import DialogueHandler
+from dialogue_manager.flows import SECRET_MASK
+from dialogue_manager.session_store import SessionConflict, get_session_store, save_messages
 
 # Session state init
-if "handler" not in st.session_state:
-    st.session_state.handler = DialogueHandler()
 if "page" not in st.session_state:
     st.session_state.page = "Home"
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
 if "is_logged_in" not in st.session_state:
     st.session_state.is_logged_in = False
 
 init_db()
 st.set_page_config(page_title="BankBot", layout="wide")
 
+# Dialogue state and chat history live in the shared session store, keyed by
+# the sid in the URL, so any app process can carry on the conversation
+if "sid" not in st.session_state:
+    st.session_state.sid = st.query_params.get("sid") or uuid.uuid4().hex
+if "browser_secret" not in st.session_state:
+    st.session_state.browser_secret = secrets.token_hex(16)
+chat_session = get_session_store().load(st.session_state.sid)
+
+# A session belongs to the user who chatted in it, or until someone logs in
+# to the browser that started it. Anyone else with its URL gets a new
+# session instead of that history
+current_user = st.session_state.get("logged_in_username") if st.session_state.is_logged_in else None
+if not chat_session.allows(current_user, st.session_state.browser_secret):
+    st.session_state.sid = uuid.uuid4().hex
+    chat_session = get_session_store().load(st.session_state.sid)
+chat_session.claim(st.session_state.browser_secret)
+if current_user is not None:
+    chat_session.state.username = current_user
+
+st.query_params["sid"] = st.session_state.sid
+# A flow's final state is saved before its action runs (see DialogueHandler)
+st.session_state.handler = DialogueHandler(
+    chat_session.state, before_action=lambda: get_session_store().save(chat_session)
+)
+st.session_state.chat_history = chat_session.history
+
 # Enhanced Styling
 st.markdown("""
 <style>
@@ -129,6 +155,8 @@ button:not([kind="primary"]) {
 
 .card-logs { border-left: 5px solid #e91e63; }
 .card-logs:hover { background: linear-gradient(135deg, #fce4ec 0%, #f8bbd0 100%); }
+.card-latency { border-left: 5px solid #607d8b; }
+.card-latency:hover { background: linear-gradient(135deg, #eceff1 0%, #cfd8dc 100%); }
 
 /* Metric Cards */
 .dashboard-metric-card {
@@ -416,18 +444,49 @@ elif st.session_state.page == "🤖Chatbot":
             else:
                 st.markdown(f"<div class='bot-bubble'>🤖 {msg}</div>", unsafe_allow_html=True)
         
+        # The new exchange is drawn here, above the input box, while the reply streams in
+        live_exchange = st.container()
+        
         with st.form("chat_form", clear_on_submit=True):
             user_input = st.text_input("Type your message...")
             send = st.form_submit_button("Send")
         
         if send and user_input.strip():
-            st.session_state.handler.context["username"] = st.session_state.logged_in_username
+            st.session_state.handler.state.username = st.session_state.logged_in_username
+            # A password reply is shown and kept as a mask, never as typed
+            shown_input = SECRET_MASK if st.session_state.handler.expects_secret() else user_input
             
-            reply = st.session_state.handler.handle_message(user_input)
-            st.session_state.chat_history.append(("You", user_input))
-            st.session_state.chat_history.append(("Bot", reply))
+            with live_exchange:
+                st.markdown(f"<div class='user-bubble'>🧑 {shown_input}</div>", unsafe_allow_html=True)
+                bot_bubble = st.empty()
+                bot_bubble.markdown("<div class='bot-bubble'>🤖 …</div>", unsafe_allow_html=True)
+                
+                reply = ""
+                try:
+                    for chunk in st.session_state.handler.handle_message_stream(user_input):
+                        reply += chunk
+                        bot_bubble.markdown(f"<div class='bot-bubble'>🤖 {reply}▌</div>", unsafe_allow_html=True)
+                except SessionConflict:
+                    # Raised before the flow's action ran, so nothing happened yet
+                    st.session_state.session_conflict = "not_handled"
+                    st.rerun()
+            
+            # The message has been handled (a transfer may have run), so a
+            # concurrent save is merged into, never answered by resending
+            try:
+                save_messages(get_session_store(), chat_session, [("You", shown_input), ("Bot", reply)])
+            except SessionConflict:
+                st.session_state.session_conflict = "handled"
             st.rerun()
         
+        conflict = st.session_state.pop("session_conflict", None)
+        if conflict == "handled":
+            st.warning("⚠️ Your last message was handled, but this chat is busy in another window, "
+                       "so it isn't shown here. There is no need to send it again.")
+        elif conflict == "not_handled":
+            st.warning("⚠️ This chat was updated in another window, so your last message was not "
+                       "processed. Please check the chat above and send it again if needed.")
+        
     bottom_navigation("👤Login", "🗄️Database")
 
 # DATABASE
@@ -481,11 +540,16 @@ elif st.session_state.page == "🛠️Admin Dashboard":
     
     import matplotlib.pyplot as plt
     from database.bank_crud import fetch_chat_history
+    from nlu_engine.relabel_chats import list_label_versions
     
     if st.button("🔄 Refresh Dashboard", type="primary"):
         st.rerun()
     
-    chats = fetch_chat_history()
+    # Intent labels: as logged at chat time, or as relabelled by a model version
+    label_options = ["As logged"] + [version for version, _ in list_label_versions()]
+    label_choice = st.selectbox("🏷️ Intent labels", label_options, key="label_version")
+    
+    chats = fetch_chat_history(None if label_choice == "As logged" else label_choice)
     df = pd.DataFrame(chats, columns=["ID", "User", "Query", "Intent", "Confidence", "Time"]) if chats else pd.DataFrame(columns=["ID", "User", "Query", "Intent", "Confidence", "Time"])
     
     # Filtering Function
@@ -540,7 +604,7 @@ elif st.session_state.page == "🛠️Admin Dashboard":
     st.markdown("### 📊 Dashboard Navigation")
     st.markdown("<br>", unsafe_allow_html=True)
     
-    col1, col2, col3, col4, col5 = st.columns(5)
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
     
     with col1:
         st.markdown("""
@@ -602,6 +666,18 @@ elif st.session_state.page == "🛠️Admin Dashboard":
             st.session_state.admin_view = None if st.session_state.admin_view == "logs" else "logs"
             st.rerun()
     
+    with col6:
+        st.markdown("""
+        <div class="nav-card card-latency">
+            <div class="nav-card-icon">⏱️</div>
+            <div class="nav-card-title">Latency</div>
+            <div class="nav-card-desc">Response time per pipeline stage</div>
+        </div>
+        """, unsafe_allow_html=True)
+        if st.button("Open", key="nav_latency", use_container_width=True):
+            st.session_state.admin_view = None if st.session_state.admin_view == "latency" else "latency"
+            st.rerun()
+    
     st.markdown("<br><br>", unsafe_allow_html=True)
     
     # TOP QUERIES VIEW
@@ -933,7 +1009,11 @@ elif st.session_state.page == "🛠️Admin Dashboard":
     elif st.session_state.admin_view == "retrain":
         st.markdown('<div class="section-header-modern"><h2>🔁 NLU Model Retraining System</h2></div>', unsafe_allow_html=True)
         
-        from nlu_engine.train_intent import load_intents, save_intents, retrain_nlu_model
+        from nlu_engine.train_intent import load_intents, save_intents
+        from nlu_engine.incremental_train import add_examples
+        from nlu_engine.training_jobs import (
+            JobAlreadyRunning, cancel_job, latest_job, read_log, submit_job
+        )
         from nlu_engine.entity_extractor import EntityExtractor
         
         if "retrain_done" not in st.session_state:
@@ -1008,13 +1088,18 @@ elif st.session_state.page == "🛠️Admin Dashboard":
                     if new_example.strip():
                         intents_data[intent_name].append(new_example.strip())
                         save_intents(intents_data)
-                        
-                        st.success(f"✅ Example added to '{intent_name}' successfully!")
-                        st.info(f"New example count: {len(intents_data[intent_name])}")
-                        st.warning("⚠️ Please retrain the model to use this new example")
-                        
-                        st.session_state.retrain_done = False
-                        st.rerun()
+                        try:
+                            add_examples(intent_name, [new_example.strip()], intents_data)
+                        except Exception as e:
+                            st.error(f"❌ Incremental update failed: {e}")
+                            st.info("💾 The example is saved; the full refit scheduled in the background will include it")
+                        else:
+                            st.success(f"✅ Example added to '{intent_name}' successfully!")
+                            st.info(f"New example count: {len(intents_data[intent_name])}")
+                            st.info("⚡ Model updated incrementally; a full refit is scheduled in the background")
+                            
+                            st.session_state.retrain_done = True
+                            st.rerun()
                     else:
                         st.warning("⚠ Please enter a valid example")
         
@@ -1053,12 +1138,17 @@ elif st.session_state.page == "🛠️Admin Dashboard":
                         if examples:
                             intents_data[intent_clean] = examples
                             save_intents(intents_data)
-                            
-                            st.success(f"✅ Intent '{intent_clean}' created with {len(examples)} examples!")
-                            st.warning("⚠️ Please retrain the model to use this new intent")
-                            
-                            st.session_state.retrain_done = False
-                            st.rerun()
+                            try:
+                                add_examples(intent_clean, examples, intents_data)
+                            except Exception as e:
+                                st.error(f"❌ Incremental update failed: {e}")
+                                st.info("💾 The intent is saved; the full refit scheduled in the background will include it")
+                            else:
+                                st.success(f"✅ Intent '{intent_clean}' created with {len(examples)} examples!")
+                                st.info("⚡ Model updated incrementally; a full refit is scheduled in the background")
+                                
+                                st.session_state.retrain_done = True
+                                st.rerun()
                         else:
                             st.error("⚠️ Please provide at least one example")
                 else:
@@ -1074,6 +1164,10 @@ elif st.session_state.page == "🛠️Admin Dashboard":
             else:
                 total_examples = sum(len(examples) for examples in intents_data.values())
                 
+                job = latest_job()
+                if job and job["status"] == "done":
+                    st.session_state.retrain_done = True
+                
                 col1, col2 = st.columns([3, 1])
                 
                 with col1:
@@ -1091,18 +1185,43 @@ elif st.session_state.page == "🛠️Admin Dashboard":
                 
                 with col2:
                     if st.button("🔁 Train Model", type="primary", key="retrain_model_btn", use_container_width=True):
-                        with st.spinner("Training model..."):
-                            try:
-                                success = retrain_nlu_model(intents_data)
-                                if success:
-                                    st.success("✅ Model retrained successfully!")
-                                    st.balloons()
-                                    st.session_state.retrain_done = True
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Model retraining failed!")
-                            except Exception as e:
-                                st.error(f"❌ Error: {e}")
+                        try:
+                            submit_job()
+                            st.rerun()
+                        except JobAlreadyRunning as e:
+                            st.warning(f"⏳ {e}")
+                        except Exception as e:
+                            st.error(f"❌ Error: {e}")
+                
+                # Training runs in a worker process; this view only polls it
+                if job:
+                    status_icons = {"queued": "🕒", "running": "⚙️", "done": "✅", "failed": "❌", "cancelled": "⛔"}
+                    st.markdown(f"**Training job #{job['id']}:** {status_icons.get(job['status'], '')} {job['status']}")
+                    
+                    jcol1, jcol2, jcol3 = st.columns(3)
+                    jcol1.metric("Examples", job["n_examples"] if job["n_examples"] is not None else "–")
+                    jcol2.metric("CV accuracy", f"{job['accuracy']:.2f}" if job["accuracy"] is not None else "–")
+                    jcol3.metric("Duration", f"{job['duration']:.1f}s" if job["duration"] is not None else "–")
+                    
+                    if job["error"]:
+                        st.error(f"❌ {job['error']}")
+                    
+                    log_text, _ = read_log(job["id"])
+                    if log_text:
+                        with st.expander("📜 Training Log", expanded=job["status"] in ("queued", "running")):
+                            st.code(log_text[-5000:])
+                    
+                    if job["status"] in ("queued", "running"):
+                        bcol1, bcol2 = st.columns(2)
+                        with bcol1:
+                            if st.button("🔄 Refresh Status", key="refresh_job_btn"):
+                                st.rerun()
+                        with bcol2:
+                            if st.button("⛔ Cancel Training", key="cancel_job_btn"):
+                                cancel_job(job["id"])
+                                st.rerun()
+                    elif job["status"] == "done" and job["model_version"]:
+                        st.caption(f"Live model version: {job['model_version']}")
             
             st.markdown("---")
             
@@ -1233,4 +1352,70 @@ elif st.session_state.page == "🛠️Admin Dashboard":
                     type="primary"
                 )
     
+    # LATENCY VIEW
+    elif st.session_state.admin_view == "latency":
+        st.markdown('<div class="section-header-modern"><h2>⏱️ Pipeline Latency</h2></div>', unsafe_allow_html=True)
+        
+        from monitoring.metrics import latency_summary
+        
+        windows = {"Last hour": 60, "Last 24 hours": 24 * 60, "Last 7 days": 7 * 24 * 60, "All time": None}
+        window = st.selectbox("Time window", list(windows), key="latency_window")
+        
+        by_stage = latency_summary(windows[window], by_intent=False)
+        if not by_stage:
+            st.warning("No latency data recorded yet")
+        else:
+            columns = {"stage": "Stage", "intent": "Intent", "count": "Count",
+                       "p50_ms": "p50 (ms)", "p95_ms": "p95 (ms)", "p99_ms": "p99 (ms)"}
+            
+            st.markdown("### 🧩 Per Stage")
+            stage_df = pd.DataFrame(by_stage).drop(columns=["intent"]).rename(columns=columns)
+            st.dataframe(stage_df.round(2), use_container_width=True, hide_index=True)
+            
+            st.markdown("### 🎯 Per Intent")
+            stage = st.selectbox("Stage", [row["stage"] for row in by_stage], key="latency_stage")
+            by_intent = [row for row in latency_summary(windows[window]) if row["stage"] == stage]
+            intent_df = pd.DataFrame(by_intent).drop(columns=["stage"]).rename(columns=columns)
+            intent_df["Intent"] = intent_df["Intent"].replace("", "(none)")
+            st.dataframe(intent_df.round(2), use_container_width=True, hide_index=True)
+            
+            st.caption("Percentiles are bucket upper bounds (within ~10%). Counts are flushed every 30 seconds.")
+        
+        st.markdown("### 🧠 LLM Response Cache")
+        from dialogue_manager.llm_cache import llm_cache
+        cache_stats = llm_cache.stats()
+        ccol1, ccol2, ccol3, ccol4 = st.columns(4)
+        ccol1.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+        ccol2.metric("Memory Hits", cache_stats["memory_hits"])
+        ccol3.metric("Database Hits", cache_stats["db_hits"])
+        ccol4.metric("Misses", cache_stats["misses"])
+        st.caption(
+            f"Cached answers: {cache_stats['memory_entries']} in memory, "
+            f"{cache_stats['db_entries'] if cache_stats['db_entries'] is not None else '–'} in the database. "
+            "Hit and miss counts are since this server started."
+        )
+        if st.button("🗑️ Clear LLM cache", key="clear_llm_cache"):
+            llm_cache.clear()
+            st.success("✅ LLM cache cleared")
+        
+        st.markdown("### 🛡️ LLM Gateway")
+        from dialogue_manager.llm_gateway import get_gateway
+        gateway_stats = get_gateway().stats()
+        state_labels = {"closed": "🟢 Closed", "half_open": "🟡 Half open", "open": "🔴 Open"}
+        gcol1, gcol2, gcol3, gcol4 = st.columns(4)
+        gcol1.metric("Circuit", state_labels[gateway_stats["state"]])
+        gcol2.metric("Calls", gateway_stats["calls"])
+        gcol3.metric("Upstream Calls", gateway_stats["upstream_calls"])
+        gcol4.metric("Fallbacks", gateway_stats["fallbacks"])
+        gcol5, gcol6, gcol7, gcol8 = st.columns(4)
+        gcol5.metric("Coalesced", gateway_stats["coalesced"])
+        gcol6.metric("Hedged", gateway_stats["hedges"])
+        gcol7.metric("Timeouts / Errors", f"{gateway_stats['timeouts']} / {gateway_stats['errors']}")
+        gcol8.metric("Short-circuited", gateway_stats["short_circuited"])
+        st.caption(
+            f"Breaker tripped {gateway_stats['trips']} times; "
+            f"recent error rate {gateway_stats['window_error_rate']:.0%} over {gateway_stats['window_calls']} calls; "
+            f"{gateway_stats['abandoned_running']} abandoned attempts still running."
+        )
+    
     bottom_navigation("❓Help", None)
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Benchmark: per-message commit vs. write-behind chat logging
+
+Logs the same messages into a fresh database two ways:
+    commit       the original save_chat: connect, insert, commit, close
+    write-behind save_chat through the chat log writer, then flush()
+
+For each, from 1 and from 8 threads, reports what the chat reply pays
+(save_chat call latency p50/p99) and overall throughput including the
+final flush. A last run with a tiny queue shows the backpressure path.
+
+Run from the project root:
+    python benchmarks/bench_chat_log.py
+    python benchmarks/bench_chat_log.py --messages 20000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.bank_crud import save_chat
+from database.chat_log_writer import ChatLogWriter, get_chat_log_writer
+from database.db import get_conn, init_db
+
+
+def legacy_save_chat(username, query, intent, confidence):
+    """save_chat as it was: one connection and one commit per message"""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO chat_history (username, query, intent, confidence, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+    """, (username, query, intent, confidence, datetime.now().isoformat()))
+    conn.commit()
+    conn.close()
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _count_rows():
+    conn = sqlite3.connect("bankbot.db")
+    count = conn.execute("SELECT COUNT(*) FROM chat_history").fetchone()[0]
+    conn.close()
+    return count
+
+
+def run(save, messages, threads, finish=None):
+    """
+    Returns:
+        dict: call latencies (ms) and throughput (messages/s) including finish()
+    """
+    per_thread = messages // threads
+    latencies = [[] for _ in range(threads)]
+
+    def worker(n):
+        for i in range(per_thread):
+            start = time.perf_counter()
+            save(f"user{n}", f"what is neft {i}", "faq", 0.9)
+            latencies[n].append((time.perf_counter() - start) * 1000)
+
+    before = _count_rows()
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    if finish is not None:
+        finish()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = [ms for thread in latencies for ms in thread]
+    written = _count_rows() - before
+    assert written == per_thread * threads, f"expected {per_thread * threads} rows, found {written}"
+    return {
+        "p50": _percentile(all_latencies, 0.50),
+        "p99": _percentile(all_latencies, 0.99),
+        "throughput": written / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat logging throughput")
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bankbot_bench_"))
+    init_db()
+
+    writer = get_chat_log_writer()
+    print(f"{args.messages} messages into {os.path.abspath('bankbot.db')}\n")
+    print(f"{'mode':<14}{'threads':>8}{'call p50 ms':>13}{'call p99 ms':>13}{'msgs/s':>10}")
+
+    results = {}
+    for threads in (1, 8):
+        for mode, save, finish in (
+            ("commit", legacy_save_chat, None),
+            ("write-behind", save_chat, writer.flush)
+        ):
+            r = run(save, args.messages, threads, finish)
+            results[(mode, threads)] = r
+            print(f"{mode:<14}{threads:>8}{r['p50']:>13.3f}{r['p99']:>13.3f}{r['throughput']:>10.0f}")
+
+    print()
+    for threads in (1, 8):
+        speedup = results[("write-behind", threads)]["throughput"] / results[("commit", threads)]["throughput"]
+        print(f"Write-behind throughput with {threads} thread(s): {speedup:.1f}x the per-message commit")
+    print(f"Writer: {writer.stats()}")
+
+    # Backpressure: a queue far smaller than the burst
+    small = ChatLogWriter(max_queue=50, put_timeout=0.001)
+    r = run(lambda *row: small.submit((*row, datetime.now().isoformat())), args.messages, 8, small.flush)
+    stats = small.stats()
+    small.close()
+    print(f"\nBackpressure (queue of 50): {r['throughput']:.0f} msgs/s, call p99 {r['p99']:.3f} ms, "
+          f"{stats['direct_writes']} rows written directly by callers, {stats['dropped']} dropped")
+
+
+if __name__ == "__main__":
+    main()
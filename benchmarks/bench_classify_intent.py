@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: per-call latency of classify_intent
+
+Compares the old behaviour (joblib.load of both pickles on every call)
+with the resident classifier shared through model_handle.
+
+Run from the project root after training a model:
+    python benchmarks/bench_classify_intent.py
+"""
+
+import os
+import statistics
+import sys
+import time
+
+import joblib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlu_engine import model_registry
+from nlu_engine.train_intent import classify_intent
+
+QUERIES = [
+    "What's my account balance?",
+    "Transfer 5000 to account 123456",
+    "My card is stolen, block it",
+    "Where is the nearest ATM?",
+    "Hi how are you",
+]
+ROUNDS = 40
+
+
+def classify_with_reload(query, model_path, vectorizer_path):
+    """The pre-registry code path: unpickle everything, then predict"""
+    model = joblib.load(model_path)
+    vectorizer = joblib.load(vectorizer_path)
+    query_vec = vectorizer.transform([query.lower()])
+    model.predict(query_vec)
+    return model.predict_proba(query_vec)[0]
+
+
+def measure(fn):
+    timings = []
+    for _ in range(ROUNDS):
+        for query in QUERIES:
+            start = time.perf_counter()
+            fn(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    intent_model = model_registry.model_handle.get()
+    if intent_model.version == model_registry.LEGACY_VERSION:
+        path = model_registry.REGISTRY_DIR
+    else:
+        path = model_registry.version_dir(intent_model.version)
+    model_path = os.path.join(path, model_registry.ARTIFACTS["model"])
+    vectorizer_path = os.path.join(path, model_registry.ARTIFACTS["vectorizer"])
+
+    before = measure(lambda q: classify_with_reload(q, model_path, vectorizer_path))
+    after = measure(classify_intent)
+
+    print(f"Model version: {intent_model.version}")
+    print(f"{'':<22}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    print(f"{'joblib.load per call':<22}{before[0]:>10.3f}{before[1]:>10.3f}")
+    print(f"{'resident classifier':<22}{after[0]:>10.3f}{after[1]:>10.3f}")
+    print(f"Speed-up (p50): {before[0] / after[0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
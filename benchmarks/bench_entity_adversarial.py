@@ -0,0 +1,97 @@
+"""
+Regression guard: entity extraction on long adversarial messages
+
+User text is untrusted. Each message shape below made at least one of the
+original entity regexes scan to the end of the input from every keyword
+occurrence, which is quadratic in the message length. Every shape is timed
+at 10 KB and 100 KB; linear extraction grows ~10x between the two. Each
+timing is the median of REPEATS runs, and growth is taken over at least
+MIN_BASELINE_MS, so one noisy millisecond at 10 KB can't fail the check.
+
+The script exits non-zero if any 100 KB message takes longer than
+BUDGET_MS, or grows more than MAX_GROWTH times over its 10 KB version.
+
+Run from the project root:
+    python benchmarks/bench_entity_adversarial.py
+"""
+
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlu_engine.entity_extractor import extract_entities
+
+SIZES = [10_000, 100_000]
+BUDGET_MS = 250.0
+MAX_GROWTH = 25.0
+REPEATS = 5
+
+# 10 KB timings below this are mostly timer and scheduler noise
+MIN_BASELINE_MS = 1.0
+
+# The original card-number pattern, timed alongside for reference
+LEGACY_CARD_CONTEXT = re.compile(r'(card|debit|credit|atm).*?(\d{3,4})', re.IGNORECASE)
+
+
+def _repeat(chunk, size, tail=""):
+    return (chunk * (size // len(chunk) + 1))[:size - len(tail)] + tail
+
+
+SHAPES = {
+    # Many card keywords, no digits: the old lazy .*? ran to the end per keyword
+    "card keywords, no digits": lambda n: _repeat("my credit card debit card atm ", n),
+    "card keywords, digits at end": lambda n: _repeat("credit card ", n, " 1234"),
+    # Lazy free-text captures after "to" and "at/in/near"
+    "repeated 'to'": lambda n: _repeat("send to a b ", n),
+    "repeated 'at' (atm query)": lambda n: _repeat("atm at that cat ", n),
+    "long digit run + letter": lambda n: _repeat("1", n, "x"),
+    "comma-separated digits": lambda n: _repeat("card 1,", n),
+    "email-like": lambda n: "a@" + _repeat("b.", n - 2),
+}
+
+
+def _time_ms(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def _median_ms(fn):
+    return statistics.median(_time_ms(fn) for _ in range(REPEATS))
+
+
+def main():
+    failures = []
+
+    print(f"{'Message':<30}" + "".join(f"{f'{size // 1000} KB (ms)':>14}" for size in SIZES) + f"{'growth':>9}")
+    print("-" * (30 + 14 * len(SIZES) + 9))
+    for name, make in SHAPES.items():
+        timings = []
+        for size in SIZES:
+            message = make(size)
+            timings.append(min(
+                _median_ms(lambda: extract_entities(message, intent)) for intent in ("transfer_money", "card_block")
+            ))
+        growth = timings[-1] / max(timings[0], MIN_BASELINE_MS)
+        print(f"{name:<30}" + "".join(f"{t:>14.2f}" for t in timings) + f"{growth:>8.1f}x")
+
+        if timings[-1] > BUDGET_MS or growth > MAX_GROWTH:
+            failures.append(name)
+
+    # Only at 10 KB: at 100 KB the original pattern takes tens of seconds
+    message = SHAPES["card keywords, no digits"](SIZES[0])
+    print(f"\nOriginal card-number regex on 'card keywords, no digits' @ {SIZES[0] // 1000} KB: "
+          f"{_time_ms(lambda: list(LEGACY_CARD_CONTEXT.finditer(message))):.1f} ms")
+
+    if failures:
+        print(f"\n❌ Over budget: {', '.join(failures)}")
+        sys.exit(1)
+    print(f"\n✅ All shapes within {BUDGET_MS:.0f} ms at 100 KB and {MAX_GROWTH:.0f}x growth")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Benchmark: single-pass entity scanner vs the original multi-regex extractor
+
+The original implementation is kept below as the reference. Every corpus
+query is run through both, the outputs are compared, and the per-query
+latency of extract_entities is reported.
+
+The reference's card-number rule is the bounded one extract_entities uses
+now: the nearest whole 3-4 digit number at most CARD_WINDOW words (and
+CARD_WINDOW_CHARS characters) after a card keyword, on the same line. The
+original lazy match reached into distant amounts and account numbers
+("card linked to account 123456" -> "1234").
+
+Run from the project root:
+    python benchmarks/bench_entity_extractor.py
+"""
+
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlu_engine.entity_extractor import CARD_WINDOW, CARD_WINDOW_CHARS, extract_entities
+
+INTENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nlu_engine", "intents.json")
+ROUNDS = 20
+
+TEMPLATES = [
+    ("Transfer {amount} to {name} account {account} via {mode}", "transfer_money"),
+    ("Please send {amount} from my {acc_type} account to account {account} {when}", "transfer_money"),
+    ("My {card} card ending {card_no} is {reason}, please block it immediately", "card_block"),
+    ("I think my {card} card {card_no} was {reason} {when}, can you help?", "card_block"),
+    ("What's the balance in my {acc_type} account {account} as of {date}?", "check_balance"),
+    ("Find an ATM near {place}", "find_atm"),
+    ("Is there a branch in {place}, I need to deposit {amount}", "find_atm"),
+    ("Transaction {txn} of {amount} on {date} failed, contact me at {email} or {phone}", "llm"),
+    ("Hi, I was charged twice for {txn} {when}. My number is {phone}", "llm"),
+    ("Can I increase the limit on my {card} card? I spend about {amount} every month", "llm"),
+]
+VALUES = {
+    "amount": ["500", "5000", "₹10,000", "$250", "1,500", "75000"],
+    "name": ["John", "priya sharma", "Rahul", "mom"],
+    "account": ["123456789", "987654321012", "4567890", "30012345"],
+    "mode": ["NEFT", "imps", "UPI", "RTGS"],
+    "acc_type": ["savings", "current", "salary", "checking"],
+    "when": ["today", "yesterday", "last week", "in the past month", ""],
+    "card": ["credit", "debit", "ATM", "visa"],
+    "card_no": ["1234", "5678", "999", "4321"],
+    "reason": ["lost", "stolen", "damaged", "compromised", "used for fraud"],
+    "date": ["12/05/2024", "1-2-24", "31/12/2023"],
+    "place": ["Jubilee Hills", "MG Road area", "Banjara Hills, Hyderabad", "koramangala?"],
+    "txn": ["TXN123456", "TXN98765", "TXN4455667788"],
+    "email": ["john.doe@example.com", "priya_s@mail.co.in"],
+    "phone": ["9876543210", "+91 9123456789", "+91-8765432109"],
+}
+
+
+# ---------------- ORIGINAL IMPLEMENTATION ----------------
+
+class LegacyEntityExtractor:
+    def __init__(self):
+        self.amount_pattern = re.compile(r'(?:₹|\$)?\b\d+(?:,\d+)?\b')
+        self.account_pattern = re.compile(r'\b\d{6,12}\b')
+        self.txn_pattern = re.compile(r'\bTXN\d+\b')
+        self.card_keyword = re.compile(r'card|debit|credit|atm', re.IGNORECASE)
+        # Dates and transaction ids are matched only so their digits are skipped
+        self.card_token = re.compile(
+            r'(\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\bTXN\d+\b)|((?:₹|\$)?\b\d+(?:,\d+)?\b|\d{3,})|\n'
+        )
+
+    def find_cards(self, text):
+        """Card numbers under the bounded window rule"""
+        keywords = list(self.card_keyword.finditer(text))
+        cards = []
+        for keyword, following in zip(keywords, keywords[1:] + [None]):
+            # A later keyword opens its own window
+            stop = following.start() if following else len(text)
+            for token in self.card_token.finditer(text, keyword.end(), stop):
+                if token.group(1):
+                    continue
+                gap = text[keyword.end():token.start()]
+                if token.group() == "\n" or len(gap) > CARD_WINDOW_CHARS or len(gap.split()) >= CARD_WINDOW:
+                    break
+                value = token.group(2)
+                if 3 <= len(value) <= 4 and value.isdigit():
+                    cards.append(value)
+                    break
+        return cards
+
+    def extract(self, text):
+        entities = []
+        card_numbers = set()
+        for value in self.find_cards(text):
+            card_numbers.add(value)
+            entities.append({"entity": "card_number", "value": value})
+        account_numbers = set(self.account_pattern.findall(text))
+        for acc in account_numbers:
+            entities.append({"entity": "account_number", "value": acc})
+        for match in self.amount_pattern.finditer(text):
+            value = match.group()
+            if value in card_numbers or value in account_numbers:
+                continue
+            entities.append({"entity": "amount", "value": value})
+        for txn in self.txn_pattern.findall(text):
+            entities.append({"entity": "transaction_id", "value": txn})
+        return entities
+
+
+def legacy_extract_entities(query, intent):
+    entities_dict = {}
+    for entity in LegacyEntityExtractor().extract(query):
+        entity_type, entity_value = entity["entity"], entity["value"]
+        if entity_type in entities_dict:
+            if isinstance(entities_dict[entity_type], list):
+                entities_dict[entity_type].append(entity_value)
+            else:
+                entities_dict[entity_type] = [entities_dict[entity_type], entity_value]
+        else:
+            entities_dict[entity_type] = entity_value
+
+    query_lower = query.lower()
+    if intent == 'card_block':
+        for reason in ['lost', 'stolen', 'fraud', 'damaged', 'compromised']:
+            if reason in query_lower:
+                entities_dict['reason'] = reason
+                break
+        for card_type in ['credit', 'debit', 'atm']:
+            if card_type in query_lower:
+                entities_dict['card_type'] = card_type
+                break
+    if intent in ['check_balance', 'transfer_money']:
+        for acc_type in ['savings', 'current', 'checking', 'salary']:
+            if acc_type in query_lower:
+                entities_dict['account_type'] = acc_type
+                break
+    if intent == 'transfer_money':
+        for transfer_type in ['neft', 'rtgs', 'imps', 'upi']:
+            if transfer_type in query_lower:
+                entities_dict['transfer_type'] = transfer_type.upper()
+                break
+        to_matches = re.findall(r'to\s+([A-Za-z\s]+?)(?:\s+account|\s+\d|\s*$)', query_lower)
+        if to_matches and len(to_matches[0].strip()) > 1:
+            entities_dict['beneficiary_name'] = to_matches[0].strip()
+    if 'atm' in query_lower or 'branch' in query_lower:
+        location_matches = re.findall(r'(?:near|at|in)\s+([A-Za-z\s]+?)(?:\s+area|\s*$|,|\?)', query, re.IGNORECASE)
+        if location_matches and len(location_matches[0].strip()) > 2:
+            entities_dict['location'] = location_matches[0].strip()
+    for pattern in [r'\b(today|yesterday|tomorrow)\b',
+                    r'\b(last|past|previous)\s+(week|month|year)\b',
+                    r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b']:
+        date_matches = re.findall(pattern, query_lower)
+        if date_matches:
+            match = date_matches[0]
+            entities_dict['date'] = ' '.join(match) if isinstance(match, tuple) else match
+            break
+    email_matches = re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', query)
+    if email_matches:
+        entities_dict['email'] = email_matches[0]
+    phone_matches = re.findall(r'(?:\+91[-\s]?)?[6-9]\d{9}', query)
+    if phone_matches:
+        entities_dict['phone'] = phone_matches[0]
+    return entities_dict
+
+
+# ---------------- BENCHMARK ----------------
+
+def build_corpus(n_templated=500):
+    with open(INTENTS_PATH, "r", encoding="utf-8") as f:
+        intents = json.load(f)["intents"]
+    corpus = [(example, intent["name"]) for intent in intents for example in intent["examples"]]
+
+    rng = random.Random(42)
+    for _ in range(n_templated):
+        template, intent = rng.choice(TEMPLATES)
+        fields = {key: rng.choice(options) for key, options in VALUES.items()}
+        corpus.append((" ".join(template.format(**fields).split()), intent))
+    return corpus
+
+
+def _comparable(entities):
+    # The original kept account numbers in a set, so their order is arbitrary
+    if isinstance(entities.get("account_number"), list):
+        entities = dict(entities, account_number=sorted(entities["account_number"]))
+    return entities
+
+
+def measure(fn, corpus):
+    timings = []
+    for _ in range(ROUNDS):
+        for query, intent in corpus:
+            start = time.perf_counter()
+            fn(query, intent)
+            timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    corpus = build_corpus()
+    mismatches = [
+        (query, intent) for query, intent in corpus
+        if _comparable(legacy_extract_entities(query, intent)) != _comparable(extract_entities(query, intent))
+    ]
+
+    before = measure(legacy_extract_entities, corpus)
+    after = measure(extract_entities, corpus)
+
+    print(f"Corpus: {len(corpus)} queries, mean length {statistics.mean(len(q) for q, _ in corpus):.0f} chars")
+    print(f"Identical output: {len(corpus) - len(mismatches)}/{len(corpus)}")
+    for query, intent in mismatches[:10]:
+        print(f"  ≠ {query!r} ({intent})")
+        print(f"     before: {legacy_extract_entities(query, intent)}")
+        print(f"     after:  {extract_entities(query, intent)}")
+
+    print(f"{'':<22}{'p50 (us)':>10}{'p99 (us)':>10}")
+    print(f"{'multi-regex':<22}{before[0]:>10.1f}{before[1]:>10.1f}")
+    print(f"{'single-pass scanner':<22}{after[0]:>10.1f}{after[1]:>10.1f}")
+    print(f"Speed-up (p50): {before[0] / after[0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
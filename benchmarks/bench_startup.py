@@ -0,0 +1,114 @@
+"""
+Startup benchmark with a regression budget
+
+Measures, each in a fresh interpreter:
+    1. python -X importtime of dialogue_manager.dialogue_handler, and which
+       heavy modules it drags in
+    2. Time for Streamlit's AppTest to run app.py once (the Home page's
+       first render); skipped if streamlit isn't installed
+
+Exits non-zero when the import or render budget is exceeded, or when one
+of LAZY_MODULES is imported before it is needed.
+
+Run from the project root:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --import-budget-ms 150 --render-budget-ms 3000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TARGET = "dialogue_manager.dialogue_handler"
+
+# Created lazily on first chat; importing the handler must not load them
+LAZY_MODULES = ["nlu_engine.nlu_router", "nlu_engine.model_registry", "sklearn", "langchain_groq", "langchain_core"]
+
+RENDER_SCRIPT = """
+import time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120).run()
+elapsed = (time.perf_counter() - start) * 1000
+if at.exception:
+    raise SystemExit(f"app.py raised: {at.exception}")
+print(elapsed)
+"""
+
+
+def measure_imports():
+    """
+    Returns:
+        tuple: (cumulative import ms of IMPORT_TARGET, {module: cumulative ms})
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {IMPORT_TARGET}"],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {IMPORT_TARGET} failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative) / 1000
+    return modules[IMPORT_TARGET], modules
+
+
+def measure_render():
+    """First-render time of app.py in ms, or None without streamlit"""
+    check = subprocess.run([sys.executable, "-c", "import streamlit"], capture_output=True)
+    if check.returncode != 0:
+        return None
+
+    result = subprocess.run(
+        [sys.executable, "-c", RENDER_SCRIPT], cwd=PROJECT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Rendering app.py failed:\n{result.stderr[-2000:]}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time regression check")
+    parser.add_argument("--import-budget-ms", type=float, default=150.0)
+    parser.add_argument("--render-budget-ms", type=float, default=3000.0)
+    args = parser.parse_args()
+
+    failures = []
+
+    import_ms, modules = measure_imports()
+    print(f"import {IMPORT_TARGET}: {import_ms:.1f} ms (budget {args.import_budget_ms:.0f} ms)")
+    print("Heaviest imports:")
+    for name, ms in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:8]:
+        print(f"  {ms:>8.1f} ms  {name}")
+    if import_ms > args.import_budget_ms:
+        failures.append("import time")
+
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print(f"Imported eagerly: {', '.join(eager)}")
+        failures.append("lazy modules")
+
+    render_ms = measure_render()
+    if render_ms is None:
+        print("app.py first render: skipped (streamlit not installed)")
+    else:
+        print(f"app.py first render: {render_ms:.0f} ms (budget {args.render_budget_ms:.0f} ms)")
+        if render_ms > args.render_budget_ms:
+            failures.append("first render")
+
+    if failures:
+        print(f"\n❌ Startup regression: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n✅ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,10 @@ def create_account(name, acc_no, acc_type, balance, password):
     conn.commit()
     conn.close()
 
+    # New holders can be named as beneficiaries straight away
+    from nlu_engine.gazetteer import add_account_holder
+    add_account_holder(name)
+
 def get_account(acc_no):
     conn = get_conn()
     cur = conn.cursor()
@@ -99,27 +103,58 @@ def update_password(acc_no, new_password):
     conn.close()
     
 def save_chat(username, query, intent, confidence):
+    """Log a chat; written to chat_history in the background (see chat_log_writer)"""
+    from database.chat_log_writer import get_chat_log_writer
+
+    get_chat_log_writer().submit(
+        (username, query, intent, confidence, datetime.now().isoformat())
+    )
+
+
+def save_chats(rows):
+    """Write (username, query, intent, confidence, timestamp) rows in one transaction"""
     conn = get_conn()
     cur = conn.cursor()
 
-    cur.execute("""
+    cur.executemany("""
         INSERT INTO chat_history (username, query, intent, confidence, timestamp)
         VALUES (?, ?, ?, ?, ?)
-    """, (username, query, intent, confidence, datetime.now().isoformat()))
+    """, rows)
 
     conn.commit()
     conn.close()
 
 
-def fetch_chat_history():
+def fetch_chat_history(label_version=None):
+    """
+    All chats, newest first
+
+    Args:
+        label_version (str): Show the intent/confidence that this model
+            version assigned (see nlu_engine.relabel_chats) instead of the
+            logged ones; rows it hasn't labelled keep their logged values
+    """
+    # Include chats this process logged in the last moments
+    from database.chat_log_writer import flush_pending
+    flush_pending()
+
     conn = get_conn()
     cur = conn.cursor()
 
-    cur.execute("""
-        SELECT id, username, query, intent, confidence, timestamp
-        FROM chat_history
-        ORDER BY id DESC
-    """)
+    if label_version is None:
+        cur.execute("""
+            SELECT id, username, query, intent, confidence, timestamp
+            FROM chat_history
+            ORDER BY id DESC
+        """)
+    else:
+        cur.execute("""
+            SELECT c.id, c.username, c.query,
+                   COALESCE(l.intent, c.intent), COALESCE(l.confidence, c.confidence), c.timestamp
+            FROM chat_history c
+            LEFT JOIN chat_labels l ON l.chat_id = c.id AND l.model_version = ?
+            ORDER BY c.id DESC
+        """, (label_version,))
     rows = cur.fetchall()
     conn.close()
     return rows
@@ -134,9 +169,13 @@ def add_faq(question, answer, category):
         "INSERT INTO knowledge_base (question, answer, category) VALUES (?, ?, ?)",
         (question, answer, category)
     )
+    faq_id = cursor.lastrowid
     conn.commit()
     conn.close()
 
+    from nlu_engine.faq_index import faq_changed
+    faq_changed(faq_id, question, answer)
+
 
 def get_all_faqs():
     """Get all FAQs from knowledge base"""
@@ -185,6 +224,9 @@ def update_faq(faq_id, question, answer, category):
     conn.commit()
     conn.close()
 
+    from nlu_engine.faq_index import faq_changed
+    faq_changed(faq_id, question, answer)
+
 
 def delete_faq(faq_id):
     """Delete FAQ from knowledge base"""
@@ -192,4 +234,7 @@ def delete_faq(faq_id):
     cursor = conn.cursor()
     cursor.execute("DELETE FROM knowledge_base WHERE id=?", (faq_id,))
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+    from nlu_engine.faq_index import faq_changed
+    faq_changed(faq_id)
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""
+Chat Log Writer
+---------------
+Write-behind logging for chat_history, so saving a chat doesn't put a
+database commit on the path of every reply.
+
+save_chat() puts the row on a bounded in-process queue and returns. A
+background thread takes rows off the queue and writes them with one
+executemany in one transaction, as soon as BATCH_SIZE rows are waiting or
+FLUSH_MS after the first row of a batch arrived.
+
+When the queue is full, save_chat waits up to PUT_TIMEOUT seconds for
+room and then writes its row directly, so a slow disk slows replies down
+instead of losing chat logs. Pending rows are written at interpreter exit
+(atexit), and flush() can be called to wait for them explicitly.
+
+Usage:
+    writer = get_chat_log_writer()
+    writer.submit(("guest", "hi", "greet", 1.0, "2026-01-01T10:00:00"))
+    writer.flush()
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+BATCH_SIZE = 200
+FLUSH_MS = 200
+MAX_QUEUE = 10000
+PUT_TIMEOUT = 1.0
+
+# Attempts per batch before its rows are given up on
+WRITE_ATTEMPTS = 3
+
+
+class _Flush:
+    """Queue marker: set once every row queued before it is written"""
+
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class ChatLogWriter:
+    def __init__(self, batch_size=BATCH_SIZE, flush_ms=FLUSH_MS, max_queue=MAX_QUEUE,
+                 put_timeout=PUT_TIMEOUT):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._counts = {"submitted": 0, "written": 0, "batches": 0, "direct_writes": 0, "dropped": 0}
+        self._thread = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+        self._thread.start()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counts[name] += n
+
+    def submit(self, row):
+        """
+        Queue a chat_history row for writing
+
+        Args:
+            row (tuple): (username, query, intent, confidence, timestamp)
+        """
+        self._count("submitted")
+        if not self._thread.is_alive():
+            self._write([row])  # Closed: nothing would drain the queue
+            return
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            # Backpressure: write it ourselves rather than drop it
+            self._count("direct_writes")
+            self._write([row])
+
+    def flush(self, timeout=None):
+        """
+        Wait until every row submitted so far is written
+
+        Returns:
+            bool: False if the timeout passed first
+        """
+        if not self._thread.is_alive():
+            return self._queue.empty()
+        marker = _Flush()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """Write pending rows and stop the background thread"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts, queued=self._queue.qsize())
+
+    def _write(self, rows):
+        from database.bank_crud import save_chats
+
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                save_chats(rows)
+                self._count("written", len(rows))
+                self._count("batches")
+                return
+            except Exception as e:
+                if attempt == WRITE_ATTEMPTS - 1:
+                    self._count("dropped", len(rows))
+                    print(f"❌ Could not write {len(rows)} chat log rows: {e}")
+                else:
+                    time.sleep(0.1 * 2 ** attempt)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, markers, stop = [], [], False
+            deadline = time.monotonic() + self.flush_seconds
+
+            # Collect until the batch is full, the flush interval is up,
+            # or someone is waiting on a flush or shutdown
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, _Flush):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+
+                if stop or markers or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if stop:
+                # Write anything that was queued after the stop marker too
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, _Flush):
+                        markers.append(item)
+                    elif item is not _STOP:
+                        batch.append(item)
+
+            if batch:
+                self._write(batch)
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_chat_log_writer():
+    """The process's writer, started on first use and flushed at exit"""
+    global _writer, _writer_pid
+    # A forked child doesn't inherit the parent's writer thread
+    if _writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer_pid != os.getpid():
+                _writer = ChatLogWriter()
+                _writer_pid = os.getpid()
+                atexit.register(_writer.close)
+    return _writer
+
+
+def flush_pending(timeout=2.0):
+    """Wait for this process's queued chat logs, if it has logged any"""
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.flush(timeout)
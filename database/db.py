@@ -59,6 +59,73 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS training_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        status TEXT NOT NULL,
+        pid INTEGER,
+        heartbeat REAL,
+        created_at TEXT,
+        started_at TEXT,
+        finished_at TEXT,
+        duration REAL,
+        n_intents INTEGER,
+        n_examples INTEGER,
+        accuracy REAL,
+        model_version TEXT,
+        log_path TEXT,
+        error TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_entities (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        entity TEXT NOT NULL,
+        value TEXT,
+        FOREIGN KEY(chat_id) REFERENCES chat_history(id)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_entities_chat ON chat_entities(chat_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_entities_entity ON chat_entities(entity, value)")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_labels (
+        chat_id INTEGER NOT NULL,
+        model_version TEXT NOT NULL,
+        intent TEXT,
+        confidence REAL,
+        PRIMARY KEY (chat_id, model_version),
+        FOREIGN KEY(chat_id) REFERENCES chat_history(id)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_labels_version ON chat_labels(model_version)")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        flushed_at TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        intent TEXT,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_metrics_flushed ON metrics(flushed_at)")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS job_checkpoints (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL,
+        updated_at TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        response TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)")
 
     conn.commit()
     conn.close()
@@ -4,29 +4,114 @@ from database.bank_crud import (
     save_chat
 )
 from database.security import verify_password
-from nlu_engine.nlu_router import NLURouter
-from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage, SystemMessage
-from dotenv import load_dotenv
-import os
+from dialogue_manager.flows import FLOW_CONFIDENCE, FLOWS_BY_NAME, SECRET_MASK, SessionState
+from dialogue_manager.llm_cache import llm_cache, make_key
+from monitoring.metrics import add_span, span, trace
+import threading
+import time
 
 # ---------------- INIT ----------------
-router = NLURouter()
-load_dotenv()
-
-llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0.3
+# The NLU router (NumPy, model registry) and the LLM backend (langchain or
+# llama.cpp, .env) are created on first use, not at import: pages that
+# never chat don't pay for them.
+_router = None
+_router_lock = threading.Lock()
+
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant for a banking application. "
+    "Answer clearly and confidently. "
+    "Do not mention knowledge cutoff dates or disclaimers."
 )
 
 
+def get_router():
+    """The shared NLURouter, created on first use"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                from nlu_engine.nlu_router import NLURouter
+                _router = NLURouter()
+    return _router
+
+
+def get_gateway():
+    """The shared LLM gateway (see dialogue_manager/llm_gateway.py)"""
+    from dialogue_manager.llm_gateway import get_gateway
+    return get_gateway()
+
+
+def _cache_key(text):
+    # From the settings: the backend itself is only built inside the gateway's
+    # guarded call, so a broken backend gets the fallback instead of an exception
+    from dialogue_manager.llm_backends import backend_identity
+
+    name, model, temperature = backend_identity()
+    return make_key(text, SYSTEM_PROMPT, f"{name}:{model}", temperature)
+
+
 class DialogueHandler:
-    def __init__(self):
-        self.context = {}
+    def __init__(self, state=None, before_action=None):
+        """
+        Args:
+            state (SessionState): Dialogue state, shared with the session
+            before_action (callable): Called with no arguments once a flow
+                has left its last step and before its action runs, to
+                persist the state; if it raises, the action doesn't run
+        """
+        self.state = state or SessionState()
+        self.before_action = before_action
+
+    def expects_secret(self):
+        """Whether the next message answers a secret step (a password)"""
+        step = self.state.current_step()
+        return step is not None and step.step.secret
 
     def handle_message(self, user_input):
-        text = user_input.strip()
+        # Every stage is timed and recorded under the message's final intent
+        with trace("chat.total") as current:
+            text = user_input.strip()
+            logged = SECRET_MASK if self.expects_secret() else text
+            intent, confidence, response = self._respond(text)
+            if response is None:
+                response = self.ask_llm(text)
+
+            current.intent = intent
+            self._save_chat(logged, intent, confidence)
+            return response
+
+    def handle_message_stream(self, user_input):
+        """
+        Like handle_message, but yields the reply in chunks
+
+        LLM answers are yielded as the model produces them; every other
+        reply is yielded whole. The message is logged when the stream ends,
+        or when it is closed early (a rerun or a disconnect): by then a flow
+        action may already have run.
+        """
+        with trace("chat.total") as current:
+            text = user_input.strip()
+            logged = SECRET_MASK if self.expects_secret() else text
+            intent, confidence, response = self._respond(text)
+            current.intent = intent
+            try:
+                if response is None:
+                    yield from self.ask_llm_stream(text)
+                else:
+                    yield response
+            finally:
+                self._save_chat(logged, intent, confidence)
+
+    def _respond(self, text):
+        """
+        Work out the reply to a message
+
+        Returns:
+            tuple: (intent, confidence, response); response is None when
+            the message should be answered by the LLM
+        """
         lower_text = text.lower()
+        step = self.state.current_step()
 
         response = None
         intent = None
@@ -44,134 +129,105 @@ class DialogueHandler:
             response = "You're welcome 😊 Happy to help you!"
 
         # ================= CONTEXT FLOWS =================
-
-        # ---- BALANCE FLOW ----
-        elif self.context.get("flow") == "balance_acc":
-            intent = "check_balance"
-            confidence = 0.95  # Fixed: Set confidence for context flow
-            self.context["acc_no"] = text
-            self.context["flow"] = "balance_pwd"
-            response = "Please enter your password."
-
-        elif self.context.get("flow") == "balance_pwd":
-            intent = "check_balance"
-            confidence = 0.95  # Fixed: Set confidence for context flow
-            acc_no = self.context.get("acc_no")
-            self.context.clear()
-            response = self.process_balance(acc_no, text)
-
-        # ---- TRANSFER FLOW ----
-        elif self.context.get("flow") == "transfer_from":
-            intent = "transfer_money"
-            confidence = 0.95  # Fixed: Set confidence for context flow
-            self.context["from_acc"] = text
-            self.context["flow"] = "transfer_to"
-            response = "Please enter receiver account number."
-
-        elif self.context.get("flow") == "transfer_to":
-            intent = "transfer_money"
-            confidence = 0.95  # Fixed: Set confidence for context flow
-            self.context["to_acc"] = text
-            self.context["flow"] = "transfer_amount"
-            response = "Please enter transfer amount."
-
-        elif self.context.get("flow") == "transfer_amount":
-            intent = "transfer_money"
-            confidence = 0.95  # Fixed: Set confidence for context flow
-            if not text.isdigit():
-                response = "Please enter a valid amount."
-            else:
-                self.context["amount"] = int(text)
-                self.context["flow"] = "transfer_pwd"
-                response = "Please enter your password."
-
-        elif self.context.get("flow") == "transfer_pwd":
-            intent = "transfer_money"
-            confidence = 0.95  # Fixed: Set confidence for context flow
-            data = self.context.copy()
-            self.context.clear()
-            response = self.process_transfer(
-                data["from_acc"],
-                data["to_acc"],
-                data["amount"],
-                text
-            )
-
-        # ---- CARD BLOCK FLOW ----
-        elif self.context.get("flow") == "card_acc":
-            intent = "card_block"
-            confidence = 0.95  # Fixed: Set confidence for context flow
-            self.context["acc_no"] = text
-            self.context["flow"] = "card_reason"
-            response = "Please mention the reason (lost / stolen / fraud)."
-
-        elif self.context.get("flow") == "card_reason":
-            intent = "card_block"
-            confidence = 0.95  # Fixed: Set confidence for context flow
-            acc_no = self.context.get("acc_no")
-            self.context.clear()
-            response = self.process_card_block(acc_no, text)
+        # One table lookup, however many flows there are
+        elif step is not None:
+            return self._continue_flow(step, text)
 
         # ================= NLU =================
         else:
-            nlu_result = router.process(text)
-            intent = nlu_result.get("top_intent", "llm")
-            confidence = nlu_result.get("confidence", 0.0)
+            with span("nlu"):
+                nlu_result = get_router().process(text)
+            intent = nlu_result.top_intent or "llm"
+            confidence = nlu_result.confidence
 
             if intent == "greetings":  # Changed from "greet"
                 response = "Hello 👋 Welcome to BankBot. How can I assist you today?"
 
             elif intent == "check_balance":
-                self.context["flow"] = "balance_acc"
-                response = "Sure 😊 Please provide your account number."
+                response = self.state.start("balance")
 
             elif intent == "transfer_money":
-                self.context["flow"] = "transfer_from"
-                response = "💸 Please enter sender account number."
+                response = self.state.start("transfer")
 
             elif "block" in lower_text and "card" in lower_text:
                 intent = "card_block"
-                confidence = 0.90  # Fixed: Set confidence for keyword match
-                self.context["flow"] = "card_acc"
-                response = "🔒 Please provide your account number to block the card."
+                confidence = FLOWS_BY_NAME["card_block"].start_confidence
+                response = self.state.start("card_block")
 
             else:
-                intent = "llm"
-                confidence = 0.85  # Fixed: Set confidence for LLM fallback
-                response = self.ask_llm(text)
-
+                # Curated knowledge base answers before the LLM
+                from nlu_engine.faq_index import get_faq_index
+
+                with span("faq"):
+                    faq = get_faq_index().search(text)
+                if faq is not None:
+                    intent = "faq"
+                    confidence = round(faq[3], 2)
+                    response = faq[2]
+                else:
+                    intent = "llm"
+                    confidence = 0.85  # Fixed: Set confidence for LLM fallback
+
+        return intent, confidence, response
+
+    def _save_chat(self, text, intent, confidence):
         # ================= SAVE CHAT (IMPORTANT) =================
-        # Get username from context, or use "guest" as default
-        username = self.context.get("username", "guest")
-
         # Save to database with proper intent and confidence
-        save_chat(
-            username=username,
-            query=text,
-            intent=intent,
-            confidence=confidence
-        )
+        with span("db.save_chat"):
+            save_chat(
+                username=self.state.username,
+                query=text,
+                intent=intent,
+                confidence=confidence
+            )
 
-        return response
+    def _continue_flow(self, compiled, text):
+        """Handle a reply to the current flow step"""
+        flow, step = compiled.flow, compiled.step
+
+        value = text
+        if step.parse is not None:
+            value = step.parse(text)
+            if value is None:
+                return flow.intent, FLOW_CONFIDENCE, step.invalid
+
+        if compiled.next_id is not None:
+            self.state.advance(value)
+            return flow.intent, FLOW_CONFIDENCE, compiled.next_prompt
+
+        # Last step: run the flow's action; its value is never stored.
+        # The reset state is persisted first, so replaying this message after
+        # an interrupted rerun can't run the action (a transfer) twice
+        values = self.state.slots + (value,)
+        self.state.reset()
+        if self.before_action is not None:
+            self.before_action()
+        return flow.intent, FLOW_CONFIDENCE, getattr(self, flow.action)(*values)
 
     # ================= PROCESS METHODS =================
 
     def process_balance(self, acc_no, password):
-        account = get_account(acc_no)
+        with span("db.get_account"):
+            account = get_account(acc_no)
         if not account:
             return "❌ Account does not exist."
 
         _, _, _, balance, pwd_hash = account
-        if not verify_password(password, pwd_hash):
+        with span("auth.verify_password"):
+            verified = verify_password(password, pwd_hash)
+        if not verified:
             return "❌ Incorrect password."
 
         return f"✅ Your available balance is ₹{balance}"
 
     def process_transfer(self, from_acc, to_acc, amount, password):
-        return transfer_money(from_acc, to_acc, amount, password)
+        # Includes the password check
+        with span("db.transfer"):
+            return transfer_money(from_acc, to_acc, amount, password)
 
     def process_card_block(self, acc_no, reason):
-        account = get_account(acc_no)
+        with span("db.get_account"):
+            account = get_account(acc_no)
         if not account:
             return "❌ Account not found."
 
@@ -182,14 +238,35 @@ class DialogueHandler:
         )
 
     def ask_llm(self, text):
-        response = llm.invoke([
-            SystemMessage(
-                content=(
-                    "You are a helpful AI assistant for a banking application. "
-                    "Answer clearly and confidently. "
-                    "Do not mention knowledge cutoff dates or disclaimers."
-                )
-            ),
-            HumanMessage(content=text)
-        ])
-        return response.content
\ No newline at end of file
+        # Repeated FAQ-style questions are answered from the cache
+        key = _cache_key(text)
+        with span("llm.cache"):
+            cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # The gateway bounds the wait and falls back when the LLM is unhealthy
+        with span("llm"):
+            response, source = get_gateway().call(key, SYSTEM_PROMPT, text)
+        if source == "llm":
+            llm_cache.put(key, response)
+        return response
+
+    def ask_llm_stream(self, text):
+        """Yield the LLM's answer in chunks as they arrive"""
+        key = _cache_key(text)
+        with span("llm.cache"):
+            cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        first = True
+        start = time.perf_counter()
+        for chunk in get_gateway().stream(key, SYSTEM_PROMPT, text,
+                                          on_complete=lambda answer: llm_cache.put(key, answer)):
+            if first:
+                add_span("llm.first_token", (time.perf_counter() - start) * 1000)
+                first = False
+            yield chunk
+        add_span("llm", (time.perf_counter() - start) * 1000)
@@ -0,0 +1,193 @@
+"""
+Dialogue Flows
+--------------
+Multi-turn flows (balance check, transfer, card block) declared as data
+and compiled into a flat step table.
+
+Each flow asks for its slots one message at a time and then calls a
+DialogueHandler method with them. Compiling numbers every step of every
+flow, so dispatching a message is one list lookup on the session's step
+id, however many flows there are.
+
+Session state is a SessionState: the current step id, the slot values
+collected so far, when the flow expires and the username. It serialises
+to a few dozen bytes of JSON with to_bytes()/from_bytes() to be persisted
+or handed to another worker. Passwords are never stored: the last step's
+value goes straight to the action. Steps marked secret are shown and
+logged as SECRET_MASK instead of what was typed.
+
+Adding a flow:
+    FLOWS.append(Flow(
+        "statement", intent="account_statement", action="process_statement",
+        steps=[Step("acc_no", "Please provide your account number.")]
+    ))
+"""
+
+import json
+import time
+
+# Seconds an unfinished flow stays active after the last message
+FLOW_TTL = 600
+
+FLOW_CONFIDENCE = 0.95
+
+# Stands in for a secret reply in chat history and logs
+SECRET_MASK = "••••••"
+
+IDLE = 0
+
+
+class Step:
+    __slots__ = ("slot", "prompt", "parse", "invalid", "secret")
+
+    def __init__(self, slot, prompt, parse=None, invalid=None, secret=False):
+        """
+        Args:
+            slot (str): Name of the value this step collects
+            prompt (str): Message asking for it
+            parse (callable): Converts the reply; returns None if it's invalid
+            invalid (str): Message sent when parse rejects the reply
+            secret (bool): Mask the reply wherever the chat is shown or stored
+        """
+        self.slot = slot
+        self.prompt = prompt
+        self.parse = parse
+        self.invalid = invalid
+        self.secret = secret
+
+
+class Flow:
+    __slots__ = ("name", "intent", "steps", "action", "start_confidence")
+
+    def __init__(self, name, intent, steps, action, start_confidence=None):
+        """
+        Args:
+            name (str): Flow name
+            intent (str): Intent recorded for every message in the flow
+            steps (list[Step]): Slots to collect, in order
+            action (str): DialogueHandler method called with the slot values
+            start_confidence (float): Confidence recorded for the message
+                that starts the flow, if it isn't the NLU's own
+        """
+        self.name = name
+        self.intent = intent
+        self.steps = tuple(steps)
+        self.action = action
+        self.start_confidence = start_confidence
+
+
+def parse_amount(text):
+    return int(text) if text.isdigit() else None
+
+
+FLOWS = [
+    Flow("balance", intent="check_balance", action="process_balance", steps=[
+        Step("acc_no", "Sure 😊 Please provide your account number."),
+        Step("password", "Please enter your password.", secret=True)
+    ]),
+    Flow("transfer", intent="transfer_money", action="process_transfer", steps=[
+        Step("from_acc", "💸 Please enter sender account number."),
+        Step("to_acc", "Please enter receiver account number."),
+        Step("amount", "Please enter transfer amount.", parse=parse_amount, invalid="Please enter a valid amount."),
+        Step("password", "Please enter your password.", secret=True)
+    ]),
+    Flow("card_block", intent="card_block", action="process_card_block", start_confidence=0.90, steps=[
+        Step("acc_no", "🔒 Please provide your account number to block the card."),
+        Step("reason", "Please mention the reason (lost / stolen / fraud).")
+    ])
+]
+
+
+class CompiledStep:
+    """A step with everything needed to handle it resolved up front"""
+
+    __slots__ = ("id", "flow", "index", "step", "next_id", "next_prompt")
+
+    def __init__(self, step_id, flow, index, next_id):
+        self.id = step_id
+        self.flow = flow
+        self.index = index
+        self.step = flow.steps[index]
+        self.next_id = next_id
+        self.next_prompt = flow.steps[index + 1].prompt if next_id else None
+
+
+def compile_flows(flows):
+    """
+    Number every step of every flow
+
+    Returns:
+        tuple: (steps, starts) where steps[step_id] is a CompiledStep
+        (steps[IDLE] is None) and starts maps flow names to their first step id
+    """
+    steps = [None]
+    starts = {}
+    for flow in flows:
+        if flow.name in starts:
+            raise ValueError(f"Duplicate flow name: {flow.name}")
+        first = len(steps)
+        starts[flow.name] = first
+        for index in range(len(flow.steps)):
+            last = index == len(flow.steps) - 1
+            steps.append(CompiledStep(first + index, flow, index, None if last else first + index + 1))
+    return steps, starts
+
+
+STEPS, STARTS = compile_flows(FLOWS)
+FLOWS_BY_NAME = {flow.name: flow for flow in FLOWS}
+
+
+class SessionState:
+    __slots__ = ("step", "slots", "expires_at", "username")
+
+    def __init__(self, step=IDLE, slots=(), expires_at=0.0, username="guest"):
+        self.step = step
+        self.slots = tuple(slots)
+        self.expires_at = expires_at
+        self.username = username
+
+    def reset(self):
+        """Leave the current flow; the username is kept"""
+        self.step = IDLE
+        self.slots = ()
+        self.expires_at = 0.0
+
+    def current_step(self, now=None):
+        """The CompiledStep waiting for a reply, or None when idle or expired"""
+        if self.step == IDLE:
+            return None
+        if (now or time.time()) >= self.expires_at:
+            self.reset()
+            return None
+        return STEPS[self.step]
+
+    def start(self, flow_name):
+        """Enter a flow; returns the prompt for its first slot"""
+        self.step = STARTS[flow_name]
+        self.slots = ()
+        self.expires_at = time.time() + FLOW_TTL
+        return STEPS[self.step].step.prompt
+
+    def advance(self, value):
+        """Store the current step's value and move to the next step"""
+        compiled = STEPS[self.step]
+        self.slots += (value,)
+        self.step = compiled.next_id
+        self.expires_at = time.time() + FLOW_TTL
+
+    def to_bytes(self):
+        # The step is stored as (flow name, step index): step ids change when flows are added
+        compiled = STEPS[self.step]
+        flow, index = (compiled.flow.name, compiled.index) if compiled else ("", 0)
+        return json.dumps(
+            [flow, index, self.slots, round(self.expires_at, 1), self.username],
+            separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data):
+        flow, index, slots, expires_at, username = json.loads(data)
+        if flow in STARTS and index == len(slots) < len(FLOWS_BY_NAME[flow].steps):
+            return cls(STARTS[flow] + index, slots, expires_at, username)
+        # Idle, or a flow that no longer exists in this shape
+        return cls(username=username)
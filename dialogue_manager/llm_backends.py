@@ -0,0 +1,305 @@
+"""
+LLM Backends
+------------
+Interchangeable chat models for the LLM fallback, selected with the
+BANKBOT_LLM_BACKEND environment variable (or .env):
+
+    groq       Groq API through langchain-groq (default)
+    llama_cpp  Local GGUF model through llama-cpp-python
+    stub       Deterministic canned answers, for tests and benchmarks
+
+Every backend has the same interface:
+
+    backend = get_backend()
+    backend.invoke(system_prompt, text)        # -> str
+    backend.stream(system_prompt, text)        # -> iterator of str chunks
+    backend.name, backend.model, backend.temperature
+
+backend_identity() gives the same (name, model, temperature) from the
+settings alone, without building a client or loading a model, so callers
+can key caches on it even when the backend can't be created.
+
+The llama.cpp backend runs generations on its own worker threads, one
+Llama instance per worker. At most LLAMA_QUEUE_SIZE requests wait for a
+worker; beyond that LLMBusy is raised straight away instead of letting
+requests pile up. Every local generation also holds a slot of the
+process-wide CPU semaphore, so workers * threads never exceeds the cores.
+
+Settings:
+    BANKBOT_GROQ_MODEL       Groq model name
+    BANKBOT_LLAMA_MODEL      Path to the .gguf file (required for llama_cpp)
+    BANKBOT_LLAMA_THREADS    CPU threads per generation
+    BANKBOT_LLAMA_CTX        Context window in tokens
+    BANKBOT_STUB_DELAY_MS    Simulated latency per stub answer
+"""
+
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BACKEND = "groq"
+TEMPERATURE = 0.3
+MAX_TOKENS = 512
+
+GROQ_MODEL = "llama-3.1-8b-instant"
+# No request outlives the gateway's deadline, and the gateway does the retrying (hedges)
+GROQ_MAX_RETRIES = 0
+
+LLAMA_THREADS = 4
+LLAMA_CTX = 2048
+LLAMA_QUEUE_SIZE = 8
+
+# Process-wide: concurrent local generations that fit on this machine's
+# cores, sized by the first local backend created
+_cpu_semaphore = None
+_cpu_lock = threading.Lock()
+
+_STREAM_END = object()
+
+
+class LLMBusy(Exception):
+    """Raised when the local model's queue is full"""
+    pass
+
+
+class _StreamClosed(Exception):
+    pass
+
+
+def cpu_semaphore(threads):
+    """The process-wide semaphore bounding concurrent local generations"""
+    global _cpu_semaphore
+    with _cpu_lock:
+        if _cpu_semaphore is None:
+            _cpu_semaphore = threading.BoundedSemaphore(max(1, (os.cpu_count() or 1) // threads))
+    return _cpu_semaphore
+
+
+# ---------------- GROQ ----------------
+
+class GroqBackend:
+    name = "groq"
+
+    def __init__(self, model=None, temperature=TEMPERATURE):
+        from langchain_groq import ChatGroq
+
+        self.model = model or os.environ.get("BANKBOT_GROQ_MODEL", GROQ_MODEL)
+        self.temperature = temperature
+        from dialogue_manager.llm_gateway import DEADLINE_SECONDS
+
+        self._llm = ChatGroq(model=self.model, temperature=temperature,
+                             timeout=DEADLINE_SECONDS, max_retries=GROQ_MAX_RETRIES)
+
+    def _messages(self, system_prompt, text):
+        from langchain_core.messages import HumanMessage, SystemMessage
+
+        return [SystemMessage(content=system_prompt), HumanMessage(content=text)]
+
+    def invoke(self, system_prompt, text):
+        return self._llm.invoke(self._messages(system_prompt, text)).content
+
+    def stream(self, system_prompt, text):
+        for chunk in self._llm.stream(self._messages(system_prompt, text)):
+            if chunk.content:
+                yield chunk.content
+
+
+# ---------------- LLAMA.CPP ----------------
+
+class LlamaCppBackend:
+    name = "llama_cpp"
+
+    def __init__(self, model_path=None, threads=None, n_ctx=None,
+                 temperature=TEMPERATURE, queue_size=LLAMA_QUEUE_SIZE):
+        self.model_path = model_path or os.environ.get("BANKBOT_LLAMA_MODEL")
+        if not self.model_path or not os.path.exists(self.model_path):
+            raise FileNotFoundError(
+                f"GGUF model not found: {self.model_path!r}. Set BANKBOT_LLAMA_MODEL to its path."
+            )
+
+        self.threads = threads or int(os.environ.get("BANKBOT_LLAMA_THREADS", LLAMA_THREADS))
+        self.n_ctx = n_ctx or int(os.environ.get("BANKBOT_LLAMA_CTX", LLAMA_CTX))
+        self.temperature = temperature
+        self.model = os.path.basename(self.model_path)
+
+        self._cpu = cpu_semaphore(self.threads)
+        workers = max(1, (os.cpu_count() or 1) // self.threads)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llama")
+        # Running plus waiting requests
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._local = threading.local()
+
+    def _llama(self):
+        # Llama instances aren't thread-safe; each worker loads its own
+        llama = getattr(self._local, "llama", None)
+        if llama is None:
+            from llama_cpp import Llama
+
+            llama = Llama(model_path=self.model_path, n_ctx=self.n_ctx,
+                          n_threads=self.threads, verbose=False)
+            self._local.llama = llama
+        return llama
+
+    def _generate(self, system_prompt, text, on_chunk):
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text}
+        ]
+        with self._cpu:
+            for part in self._llama().create_chat_completion(
+                messages, temperature=self.temperature, max_tokens=MAX_TOKENS, stream=True
+            ):
+                content = part["choices"][0]["delta"].get("content")
+                if content:
+                    on_chunk(content)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise LLMBusy("Local model queue is full")
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def invoke(self, system_prompt, text):
+        chunks = []
+        self._submit(self._generate, system_prompt, text, chunks.append).result()
+        return "".join(chunks)
+
+    def stream(self, system_prompt, text):
+        chunks = queue.Queue()
+        closed = threading.Event()
+
+        def on_chunk(chunk):
+            # Stop generating once the reader has gone away
+            if closed.is_set():
+                raise _StreamClosed()
+            chunks.put(chunk)
+
+        def run():
+            try:
+                self._generate(system_prompt, text, on_chunk)
+            except _StreamClosed:
+                pass
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(_STREAM_END)
+
+        self._submit(run)
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _STREAM_END:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            closed.set()
+
+
+# ---------------- STUB ----------------
+
+STUB_ANSWERS = [
+    "I can help with accounts, balances, transfers and cards. Could you tell me more?",
+    "For detailed information please visit your nearest branch or contact customer support.",
+    "You can find this under the Services section of the BankBot app.",
+    "Our support team is available 24/7 at the customer care number on your card."
+]
+
+
+class StubBackend:
+    """Same answer for the same question, after an optional fixed delay"""
+
+    name = "stub"
+
+    def __init__(self, delay_ms=None):
+        self.delay = (delay_ms if delay_ms is not None
+                      else float(os.environ.get("BANKBOT_STUB_DELAY_MS", 0))) / 1000
+        self.model = "stub"
+        self.temperature = 0.0
+
+    def invoke(self, system_prompt, text):
+        if self.delay:
+            time.sleep(self.delay)
+        digest = hashlib.sha256(text.strip().lower().encode("utf-8")).digest()
+        return STUB_ANSWERS[digest[0] % len(STUB_ANSWERS)]
+
+    def stream(self, system_prompt, text):
+        words = self.invoke(system_prompt, text).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+
+# ---------------- SELECTION ----------------
+
+BACKENDS = {
+    GroqBackend.name: GroqBackend,
+    LlamaCppBackend.name: LlamaCppBackend,
+    StubBackend.name: StubBackend
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+_env_loaded = False
+
+
+def _load_env():
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _env_loaded = True
+
+
+def _configured_name(name=None):
+    return (name or os.environ.get("BANKBOT_LLM_BACKEND") or DEFAULT_BACKEND).strip().lower()
+
+
+def backend_identity():
+    """
+    (name, model, temperature) of the configured backend, from the settings
+
+    Never creates the backend, so it doesn't fail on a missing API key,
+    GGUF file or unknown backend name.
+    """
+    _load_env()
+    name = _configured_name()
+    if name == StubBackend.name:
+        return name, "stub", 0.0
+    if name == LlamaCppBackend.name:
+        return name, os.path.basename(os.environ.get("BANKBOT_LLAMA_MODEL") or ""), TEMPERATURE
+    if name == GroqBackend.name:
+        return name, os.environ.get("BANKBOT_GROQ_MODEL", GROQ_MODEL), TEMPERATURE
+    return name, "", TEMPERATURE
+
+
+def create_backend(name=None):
+    """
+    Build a backend
+
+    Args:
+        name (str): One of BACKENDS; defaults to BANKBOT_LLM_BACKEND
+
+    Returns:
+        The backend instance
+    """
+    name = _configured_name(name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def get_backend():
+    """The configured backend, created on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _load_env()
+                _backend = create_backend()
+    return _backend
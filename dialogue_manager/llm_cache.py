@@ -0,0 +1,189 @@
+"""
+LLM Response Cache
+------------------
+Two-tier cache for answers from the LLM fallback.
+
+    key = make_key(query, system_prompt, model, temperature)
+    answer = llm_cache.get(key)
+    if answer is None:
+        answer = ask_the_llm(...)
+        llm_cache.put(key, answer)
+
+The key is a SHA-256 of the normalised query (lowercased, whitespace
+collapsed, trailing punctuation dropped) together with the system prompt,
+model name and temperature, so changing any of those never serves an old
+answer.
+
+Tier 1 is an in-process LRU of MEMORY_SIZE entries. Tier 2 is the
+llm_cache table, shared by every process using the database. Entries
+expire TTL_SECONDS after they were created. The table is kept to MAX_ROWS
+by evicting the least recently used rows; last_used is only updated when a
+row is read from the table, so entries served from memory age there.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MEMORY_SIZE = 256
+MAX_ROWS = 5000
+TTL_SECONDS = 7 * 24 * 3600
+
+# Expired and excess rows are evicted every this many writes
+EVICT_EVERY = 50
+
+_SPACES = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s?!.]+$")
+
+
+def normalize_query(query):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return _TRAILING.sub("", _SPACES.sub(" ", query.strip().lower()))
+
+
+def make_key(query, system_prompt, model, temperature):
+    """Cache key for an LLM call"""
+    parts = [normalize_query(query), system_prompt, model, repr(float(temperature))]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, memory_size=MEMORY_SIZE, max_rows=MAX_ROWS, ttl=TTL_SECONDS):
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._memory = OrderedDict()  # key -> (response, created_at)
+        self._lock = threading.Lock()
+        self._db_ready = False
+        self._writes = 0
+        self._counts = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    def _conn(self):
+        from database.db import get_conn, init_db
+
+        if not self._db_ready:
+            init_db()
+            self._db_ready = True
+        return get_conn()
+
+    def _remember(self, key, response, created_at):
+        with self._lock:
+            self._memory[key] = (response, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, key):
+        """
+        Look up a cached response
+
+        Returns:
+            str: The response, or None on a miss
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self._counts["memory_hits"] += 1
+                    return entry[0]
+                del self._memory[key]
+
+        try:
+            conn = self._conn()
+            try:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ? AND created_at > ?",
+                    (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+                    conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"❌ LLM cache read failed: {e}")
+            row = None
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        self._count("db_hits")
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key, response):
+        """Store a response in both tiers"""
+        now = time.time()
+        self._remember(key, response, now)
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+
+        try:
+            conn = self._conn()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now)
+                )
+                if evict:
+                    self._evict(conn, now)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"❌ LLM cache write failed: {e}")
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,))
+        conn.execute(
+            """
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_rows,)
+        )
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._memory.clear()
+        conn = self._conn()
+        conn.execute("DELETE FROM llm_cache")
+        conn.commit()
+        conn.close()
+
+    def stats(self):
+        """Hit/miss counters since startup and current tier sizes"""
+        with self._lock:
+            stats = dict(self._counts, memory_entries=len(self._memory))
+
+        try:
+            conn = self._conn()
+            try:
+                stats["db_entries"] = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            stats["db_entries"] = None
+
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["lookups"] = lookups
+        stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+llm_cache = LLMCache()
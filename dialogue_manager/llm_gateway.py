@@ -0,0 +1,457 @@
+"""
+LLM Gateway
+-----------
+Protects the chat pipeline from a slow or failing LLM backend.
+
+    gateway = get_gateway()
+    answer, source = gateway.call(key, system_prompt, text)
+    # source: "llm", "coalesced" or "fallback"
+
+Three layers:
+1. Single-flight: concurrent calls with the same cache key share one
+   upstream call; followers wait for the leader's answer.
+2. Deadlines and hedging: each call gets DEADLINE_SECONDS in total. If the
+   backend hasn't answered after HEDGE_AFTER_SECONDS (or the attempt
+   failed), one more attempt is started and whichever finishes first wins.
+3. Circuit breaker: over the last WINDOW calls, if at least MIN_CALLS were
+   made and the share of errors/timeouts or of slow answers crosses its
+   threshold, the breaker opens and calls fail fast for OPEN_SECONDS. Then
+   a single probe call is let through; success closes it again.
+
+Attempts the gateway stopped waiting for (timed out, or lost a hedge) keep
+a worker until the backend gives up on them; the Groq backend's request
+timeout is DEADLINE_SECONDS. While MAX_ABANDONED of them are still
+running, new calls fail fast and no hedges are started, so hung requests
+can't take every worker and a half-open probe always finds one free.
+
+Whenever the LLM can't answer in time, the fallback (an FAQ answer, or a
+canned message) is returned instead of an error.
+
+Streams are coalesced and guarded by the breaker and by one deadline for
+the whole stream, the same one coalesced followers wait for. They are not
+hedged: a second stream would duplicate text already shown to the user. A
+stream its reader closes early is not counted by the breaker either way.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEADLINE_SECONDS = 12.0
+HEDGE_AFTER_SECONDS = 4.0
+MAX_ATTEMPTS = 2
+WORKERS = 16
+MAX_ABANDONED = WORKERS // 2
+
+WINDOW = 20
+MIN_CALLS = 5
+ERROR_RATE = 0.5
+SLOW_CALL_SECONDS = 6.0
+SLOW_RATE = 0.8
+OPEN_SECONDS = 30.0
+
+CANNED_ANSWER = (
+    "⚠️ I'm having trouble answering that right now. "
+    "Please try again in a moment, or ask about your balance, transfers or cards."
+)
+
+# A looser FAQ match than the handler's is better than no answer when the LLM is down
+FALLBACK_THRESHOLD = 0.3
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STREAM_END = object()
+
+
+def faq_fallback(text):
+    """The closest knowledge base answer, if any is close enough to stand in for the LLM"""
+    from nlu_engine.faq_index import get_faq_index
+
+    faq = get_faq_index().search(text, threshold=FALLBACK_THRESHOLD)
+    return faq[2] if faq is not None else None
+
+
+class LLMTimeout(Exception):
+    """Raised when no attempt answered before the deadline"""
+    pass
+
+
+class CircuitOpen(Exception):
+    """Raised when the breaker is failing calls fast"""
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, window=WINDOW, min_calls=MIN_CALLS, error_rate=ERROR_RATE,
+                 slow_call_seconds=SLOW_CALL_SECONDS, slow_rate=SLOW_RATE, open_seconds=OPEN_SECONDS):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)  # (ok, seconds)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Whether a call may go upstream now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._state = HALF_OPEN
+            # Half open: a single probe at a time
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record(self, ok, seconds):
+        """Record the outcome of a call that allow() let through"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if ok and seconds < self.slow_call_seconds:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append((ok, seconds))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            errors = sum(1 for ok, _ in self._outcomes if not ok)
+            slow = sum(1 for ok, s in self._outcomes if ok and s >= self.slow_call_seconds)
+            if errors / calls >= self.error_rate or slow / calls >= self.slow_rate:
+                self._open()
+
+    def cancel(self):
+        """Forget a call that allow() let through, without judging it"""
+        with self._lock:
+            # Frees the half-open probe slot; the next call probes instead
+            self._probing = False
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.trips += 1
+
+    def window_stats(self):
+        with self._lock:
+            outcomes = list(self._outcomes)
+        calls = len(outcomes)
+        return {
+            "window_calls": calls,
+            "window_error_rate": sum(1 for ok, _ in outcomes if not ok) / calls if calls else 0.0
+        }
+
+
+class _Flight:
+    __slots__ = ("done", "result", "ok")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.ok = False
+
+
+class LLMGateway:
+    def __init__(self, get_backend, fallback=None, deadline=DEADLINE_SECONDS,
+                 hedge_after=HEDGE_AFTER_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 breaker=None, workers=WORKERS, max_abandoned=MAX_ABANDONED):
+        """
+        Args:
+            get_backend (callable): Returns the LLM backend to call
+            fallback (callable): fallback(text) -> answer used when the LLM
+                can't answer; returns CANNED_ANSWER when omitted or None
+            deadline (float): Seconds a caller waits in total
+            hedge_after (float): Seconds before a second attempt is started
+            max_attempts (int): Upstream attempts per call, hedges included
+            max_abandoned (int): Abandoned attempts allowed to run at once
+                before calls fail fast
+        """
+        self.get_backend = get_backend
+        self.fallback = fallback
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.max_abandoned = max_abandoned
+        self.breaker = breaker or CircuitBreaker()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-gateway")
+        self._flights = {}
+        self._abandoned = 0
+        self._lock = threading.Lock()
+        self._counts = {
+            "calls": 0, "upstream_calls": 0, "coalesced": 0, "hedges": 0,
+            "errors": 0, "timeouts": 0, "short_circuited": 0, "fallbacks": 0, "abandoned": 0
+        }
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counts[name] += n
+
+    def _saturated(self):
+        """Whether too many abandoned attempts are still holding workers"""
+        with self._lock:
+            return self._abandoned >= self.max_abandoned
+
+    def _abandon(self, futures):
+        """Track attempts nobody is waiting for any more until they finish"""
+        for future in futures:
+            if future.done():
+                continue
+            with self._lock:
+                self._abandoned += 1
+                self._counts["abandoned"] += 1
+            future.add_done_callback(self._abandoned_done)
+
+    def _abandoned_done(self, future):
+        with self._lock:
+            self._abandoned -= 1
+
+    def _fallback_answer(self, text):
+        self._count("fallbacks")
+        answer = None
+        if self.fallback is not None:
+            try:
+                answer = self.fallback(text)
+            except Exception as e:
+                print(f"❌ LLM fallback failed: {e}")
+        return answer or CANNED_ANSWER
+
+    def _join(self, key):
+        """Returns (flight, is_leader)"""
+        with self._lock:
+            self._counts["calls"] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._counts["coalesced"] += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _land(self, key, flight, result, ok):
+        flight.result, flight.ok = result, ok
+        with self._lock:
+            del self._flights[key]
+        flight.done.set()
+
+    def _follow(self, flight, text):
+        if flight.done.wait(self.deadline) and flight.ok:
+            return flight.result, "coalesced"
+        return self._fallback_answer(text), "fallback"
+
+    # ---------------- BLOCKING CALLS ----------------
+
+    def call(self, key, system_prompt, text):
+        """
+        Answer a prompt through the gateway
+
+        Args:
+            key (str): Identifies identical prompts (the LLM cache key)
+
+        Returns:
+            tuple: (answer, source) with source "llm", "coalesced" or "fallback"
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            return self._follow(flight, text)
+
+        answer, ok = None, False
+        try:
+            answer, ok = self._call_upstream(system_prompt, text), True
+        except CircuitOpen:
+            self._count("short_circuited")
+        except LLMTimeout:
+            self._count("timeouts")
+        except Exception as e:
+            self._count("errors")
+            print(f"❌ LLM call failed: {e}")
+        finally:
+            self._land(key, flight, answer, ok)
+
+        if ok:
+            return answer, "llm"
+        return self._fallback_answer(text), "fallback"
+
+    def _call_upstream(self, system_prompt, text):
+        # Checked first, so a saturated gateway never takes the half-open probe slot
+        if self._saturated() or not self.breaker.allow():
+            raise CircuitOpen()
+
+        start = time.monotonic()
+        deadline = start + self.deadline
+        attempts = 1
+        error = None
+        pending = set()
+        try:
+            backend = self.get_backend()
+
+            def attempt():
+                self._count("upstream_calls")
+                return backend.invoke(system_prompt, text)
+
+            pending = {self._pool.submit(attempt)}
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                can_hedge = attempts < self.max_attempts and not self._saturated()
+                done, pending = wait(pending, timeout=min(remaining, self.hedge_after) if can_hedge else remaining,
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        self.breaker.record(True, time.monotonic() - start)
+                        return future.result()
+                    error = future.exception()
+
+                # Hedge a slow attempt, or retry a failed one, while there's time left
+                if can_hedge and (not done or not pending) and time.monotonic() < deadline:
+                    pending.add(self._pool.submit(attempt))
+                    attempts += 1
+                    self._count("hedges")
+        except BaseException:
+            self.breaker.record(False, time.monotonic() - start)
+            raise
+        finally:
+            # A hedge that lost, or attempts still running at the deadline
+            self._abandon(pending)
+
+        self.breaker.record(False, time.monotonic() - start)
+        if error is not None and not pending:
+            raise error
+        raise LLMTimeout(f"No answer within {self.deadline:.0f}s")
+
+    # ---------------- STREAMS ----------------
+
+    def stream(self, key, system_prompt, text, on_complete=None):
+        """
+        Yield an answer in chunks through the gateway
+
+        Identical concurrent prompts, an open breaker and a missed deadline
+        all yield a single complete chunk (the leader's answer or the fallback).
+
+        Args:
+            on_complete (callable): Called with the full answer when this
+                call streamed it from the LLM to the end
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            yield self._follow(flight, text)[0]
+            return
+
+        if self._saturated() or not self.breaker.allow():
+            self._count("short_circuited")
+            answer = self._fallback_answer(text)
+            self._land(key, flight, None, False)
+            yield answer
+            return
+
+        chunks = queue.Queue()
+        closed = threading.Event()
+
+        def produce():
+            self._count("upstream_calls")
+            try:
+                stream = self.get_backend().stream(system_prompt, text)
+                for chunk in stream:
+                    if closed.is_set():
+                        break
+                    chunks.put(chunk)
+                if hasattr(stream, "close"):
+                    stream.close()
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(_STREAM_END)
+
+        start = time.monotonic()
+        deadline = start + self.deadline
+        first_chunk_at = None
+        parts = []
+        ok = abandoned = False
+        producer = None
+        try:
+            producer = self._pool.submit(produce)
+            while True:
+                try:
+                    chunk = chunks.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self._count("timeouts")
+                    break
+                if chunk is _STREAM_END:
+                    ok = True
+                    break
+                if isinstance(chunk, Exception):
+                    self._count("errors")
+                    print(f"❌ LLM stream failed: {chunk}")
+                    break
+                if first_chunk_at is None:
+                    first_chunk_at = time.monotonic()
+                parts.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # The reader went away before the stream ended: we don't know
+            # whether it would have finished in time, so it isn't judged
+            abandoned = True
+            raise
+        finally:
+            closed.set()
+            if producer is not None:
+                self._abandon([producer])
+            if abandoned:
+                self.breaker.cancel()
+            else:
+                # Finished streams are judged on time to first chunk
+                self.breaker.record(ok, (first_chunk_at or time.monotonic()) - start)
+            self._land(key, flight, "".join(parts), ok)
+
+        if ok and on_complete is not None:
+            on_complete("".join(parts))
+        elif not ok and not parts:
+            yield self._fallback_answer(text)
+
+    # ---------------- DASHBOARD ----------------
+
+    def stats(self):
+        """Breaker state and counters since startup"""
+        with self._lock:
+            stats = dict(self._counts, in_flight=len(self._flights), abandoned_running=self._abandoned)
+        stats["state"] = self.breaker.state
+        stats["trips"] = self.breaker.trips
+        stats.update(self.breaker.window_stats())
+        return stats
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """The shared gateway for the configured backend, created on first use"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                from dialogue_manager.llm_backends import get_backend
+                _gateway = LLMGateway(get_backend, faq_fallback)
+    return _gateway
@@ -0,0 +1,301 @@
+"""
+Session Store
+-------------
+Dialogue state and recent chat history per browser session, kept outside
+the Streamlit process so any worker can serve any session and a restart
+doesn't drop a half-finished transfer.
+
+    store = get_session_store()
+    session = store.load(sid)
+    handler = DialogueHandler(session.state)
+    ...
+    save_messages(store, session, [("You", text), ("Bot", reply)])
+
+Two stores, picked with BANKBOT_SESSION_STORE:
+    sqlite  (default) sessions.db in WAL mode, shared by every process on
+            the machine; the path can be changed with BANKBOT_SESSION_DB
+    memory  this process only, for tests and single-process runs
+
+Sessions expire SESSION_TTL seconds after they were last saved; a
+background thread deletes expired ones every SWEEP_INTERVAL seconds.
+
+Every save bumps the session's version and only succeeds if the stored
+version is still the one that was loaded, so two workers can't silently
+overwrite each other; the loser gets SessionConflict. save_messages()
+handles that for a message that has already been answered: it reloads the
+session and adds the messages to the latest history instead.
+
+A session belongs to the user whose name is in its state (owner). Before
+anyone has logged in it belongs to the browser that started it: claim()
+stores a hash of a per-browser secret and allows() checks it, so a copied
+URL alone never opens someone else's session.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from dialogue_manager.flows import SessionState
+
+GUEST = "guest"
+
+SESSION_TTL = 2 * 3600
+SWEEP_INTERVAL = 300.0
+
+# Messages kept per session (user and bot messages both count)
+HISTORY_LIMIT = 100
+
+SESSION_DB = "sessions.db"
+BUSY_TIMEOUT_MS = 5000
+
+# Reload-and-merge rounds in save_messages before giving up
+SAVE_ATTEMPTS = 3
+
+
+class SessionConflict(Exception):
+    """Raised when a session was saved by someone else since it was loaded"""
+    pass
+
+
+def _secret_hash(secret):
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+class Session:
+    __slots__ = ("sid", "state", "history", "version", "secret_hash")
+
+    def __init__(self, sid, state=None, history=None, version=0, secret_hash=None):
+        self.sid = sid
+        self.state = state or SessionState()
+        self.history = history if history is not None else []
+        self.version = version
+        self.secret_hash = secret_hash
+
+    @property
+    def owner(self):
+        """Username the session belongs to, or None until a logged-in user uses it"""
+        username = self.state.username
+        return None if username == GUEST else username
+
+    def allows(self, username, secret):
+        """
+        Whether a browser may use this session
+
+        Args:
+            username (str): The logged-in user, or None
+            secret (str): The browser's own secret
+        """
+        if self.owner is not None:
+            return self.owner == username
+        return self.secret_hash is None or hmac.compare_digest(self.secret_hash, _secret_hash(secret))
+
+    def claim(self, secret):
+        """Bind an unclaimed session to a browser's secret (saved with the session)"""
+        if self.secret_hash is None:
+            self.secret_hash = _secret_hash(secret)
+
+
+def save_messages(store, session, messages, attempts=SAVE_ATTEMPTS):
+    """
+    Add messages to a session's history and save it
+
+    If someone else saved the session since it was loaded, the stored
+    session is reloaded and the messages are added to its history, keeping
+    this session's dialogue state: the message has already been handled
+    (and any transfer made), so it must not be handled again.
+
+    Raises:
+        SessionConflict: If every attempt lost to another save
+    """
+    history = session.history
+    for _ in range(attempts):
+        session.history = history + list(messages)
+        try:
+            store.save(session)
+            return
+        except SessionConflict:
+            latest = store.load(session.sid)
+            history, session.version = latest.history, latest.version
+    raise SessionConflict(session.sid)
+
+
+class _Sweeper:
+    def _start_sweeper(self, interval):
+        thread = threading.Thread(target=self._sweep_forever, args=(interval,), daemon=True)
+        thread.start()
+
+    def _sweep_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"❌ Session sweep failed: {e}")
+
+
+class MemorySessionStore(_Sweeper):
+    def __init__(self, ttl=SESSION_TTL, sweep_interval=SWEEP_INTERVAL):
+        self.ttl = ttl
+        self._sessions = {}  # sid -> (state bytes, history, expires_at, version, secret hash)
+        self._lock = threading.Lock()
+        self._start_sweeper(sweep_interval)
+
+    def load(self, sid):
+        """The stored session, or a new one if it's missing or expired"""
+        with self._lock:
+            row = self._sessions.get(sid)
+        if row is None:
+            return Session(sid)
+        state, history, expires_at, version, secret_hash = row
+        if expires_at <= time.time():
+            return Session(sid, version=version)
+        return Session(sid, SessionState.from_bytes(state), list(history), version, secret_hash)
+
+    def save(self, session):
+        """Store a session; raises SessionConflict if it changed since it was loaded"""
+        history = session.history[-HISTORY_LIMIT:]
+        with self._lock:
+            row = self._sessions.get(session.sid)
+            if (row[3] if row else 0) != session.version:
+                raise SessionConflict(session.sid)
+            session.version += 1
+            self._sessions[session.sid] = (
+                session.state.to_bytes(), tuple(history), time.time() + self.ttl, session.version,
+                session.secret_hash
+            )
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def sweep(self):
+        """Delete expired sessions; returns how many"""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, row in self._sessions.items() if row[2] <= now]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+
+class SQLiteSessionStore(_Sweeper):
+    def __init__(self, path=None, ttl=SESSION_TTL, sweep_interval=SWEEP_INTERVAL):
+        self.path = path or os.environ.get("BANKBOT_SESSION_DB", SESSION_DB)
+        self.ttl = ttl
+
+        conn = self._conn()
+        # WAL lets readers in other processes carry on while one writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            sid TEXT PRIMARY KEY,
+            state BLOB NOT NULL,
+            history TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            version INTEGER NOT NULL,
+            secret_hash TEXT
+        )
+        """)
+        # sessions.db files from before sessions were bound to a browser
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+        if "secret_hash" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN secret_hash TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)")
+        conn.commit()
+        conn.close()
+
+        self._start_sweeper(sweep_interval)
+
+    def _conn(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self, sid):
+        """The stored session, or a new one if it's missing or expired"""
+        conn = self._conn()
+        try:
+            row = conn.execute(
+                "SELECT state, history, expires_at, version, secret_hash FROM sessions WHERE sid = ?", (sid,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            return Session(sid)
+        state, history, expires_at, version, secret_hash = row
+        if expires_at <= time.time():
+            return Session(sid, version=version)
+        return Session(sid, SessionState.from_bytes(state), [tuple(m) for m in json.loads(history)],
+                       version, secret_hash)
+
+    def save(self, session):
+        """Store a session; raises SessionConflict if it changed since it was loaded"""
+        history = json.dumps(session.history[-HISTORY_LIMIT:], ensure_ascii=False)
+        conn = self._conn()
+        try:
+            cur = conn.execute(
+                """
+                INSERT INTO sessions (sid, state, history, expires_at, version, secret_hash)
+                VALUES (?, ?, ?, ?, 1, ?)
+                ON CONFLICT(sid) DO UPDATE SET
+                    state = excluded.state,
+                    history = excluded.history,
+                    expires_at = excluded.expires_at,
+                    version = sessions.version + 1,
+                    secret_hash = excluded.secret_hash
+                WHERE sessions.version = ?
+                """,
+                (session.sid, session.state.to_bytes(), history, time.time() + self.ttl,
+                 session.secret_hash, session.version)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        if cur.rowcount == 0:
+            raise SessionConflict(session.sid)
+        session.version += 1
+
+    def delete(self, sid):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        conn.commit()
+        conn.close()
+
+    def sweep(self):
+        """Delete expired sessions; returns how many"""
+        conn = self._conn()
+        try:
+            cur = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+            return cur.rowcount
+        finally:
+            conn.close()
+
+
+STORES = {
+    "sqlite": SQLiteSessionStore,
+    "memory": MemorySessionStore
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """The configured session store, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                name = os.environ.get("BANKBOT_SESSION_STORE", "sqlite").strip().lower()
+                if name not in STORES:
+                    raise ValueError(f"Unknown session store {name!r}; choose from {', '.join(STORES)}")
+                _store = STORES[name]()
+    return _store
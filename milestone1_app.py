@@ -1,11 +1,13 @@
 import streamlit as st
 import json
 import os
-import subprocess
 from pathlib import Path
 
 from nlu_engine.infer_intent import predict_intents
 from nlu_engine.entity_extractor import EntityExtractor
+from nlu_engine.training_jobs import (
+    JobAlreadyRunning, cancel_job, latest_job, read_log, submit_job
+)
 
 INTENTS_PATH = "nlu_engine/intents.json"
 MODEL_DIR = "models/intent_model"
@@ -192,20 +194,34 @@ else:
 st.divider()
 st.subheader("Train Model")
 
-epochs = st.number_input("Epochs", 1, 50, 3)
-batch = st.number_input("Batch size", 8, 64, 8)
-lr = st.number_input("Learning rate", value=0.00002, format="%.5f")
-
 if model_exists():
     st.success("Trained model found")
 else:
     st.warning(" No trained model")
 
 if st.button("Start Training"):
-    subprocess.Popen([
-        "python", "nlu_engine/train_intent.py",
-        "--epochs", str(epochs),
-        "--batch_size", str(batch),
-        "--lr", str(lr)
-    ])
-    st.success(" Training started!")
+    try:
+        submit_job()
+        st.success(" Training started!")
+    except JobAlreadyRunning as e:
+        st.warning(str(e))
+
+# Training runs in a worker process; poll its state instead of blocking
+job = latest_job()
+if job:
+    st.write(f"Job #{job['id']}: **{job['status']}**")
+    if job["accuracy"] is not None:
+        st.write(f"Cross-validated accuracy: {job['accuracy']:.2f} on {job['n_examples']} examples in {job['duration']:.1f}s")
+    if job["error"]:
+        st.error(job["error"])
+
+    log_text, _ = read_log(job["id"])
+    if log_text:
+        st.code(log_text[-3000:])
+
+    if job["status"] in ("queued", "running"):
+        if st.button("Refresh"):
+            st.rerun()
+        if st.button("Cancel Training"):
+            cancel_job(job["id"])
+            st.rerun()
@@ -0,0 +1,257 @@
+"""
+Latency Metrics
+---------------
+Lightweight per-stage timing for the chat pipeline.
+
+    with span("nlu.intent"):
+        ...
+
+Durations are measured with the monotonic perf_counter and aggregated in
+process into log-bucket histograms (each bucket ~10% wider than the last),
+so recording is a dict increment and memory stays constant. A background
+thread flushes the bucket counts accumulated since the last flush into the
+metrics table every FLUSH_INTERVAL seconds and at exit. Counts from a flush
+that fails are kept for the next one, and each flush deletes rows older
+than RETENTION_DAYS.
+
+Spans recorded inside a trace() are held until the trace ends, then
+recorded under the trace's intent, which is usually only known at the
+end of handling a message. Spans outside a trace get no intent.
+
+Percentiles are read back from the merged bucket counts, so they combine
+across processes and flushes; a percentile is reported as its bucket's
+upper bound.
+"""
+
+import atexit
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+FLUSH_INTERVAL = 30.0
+
+# Days of flushed counts kept in the metrics table
+RETENTION_DAYS = 7
+
+# Bucket i holds durations in (BASE**(i-1), BASE**i] milliseconds
+BASE = 1.1
+MIN_MS = 0.001
+
+ALL_INTENTS = "*"
+
+_histograms = {}
+_lock = threading.Lock()
+_local = threading.local()
+_flusher = None
+_tables_ready = False
+
+
+def _bucket(ms):
+    return math.ceil(math.log(max(ms, MIN_MS), BASE))
+
+
+def bucket_upper_ms(bucket):
+    return BASE ** bucket
+
+
+def record(stage, ms, intent=""):
+    """Add one duration (milliseconds) to a stage's histogram"""
+    key = (stage, intent or "")
+    bucket = _bucket(ms)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {}
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+    _start_flusher()
+
+
+class Trace:
+    """Spans of one request, recorded under its intent when it ends"""
+
+    __slots__ = ("intent", "spans")
+
+    def __init__(self):
+        self.intent = ""
+        self.spans = []
+
+
+@contextmanager
+def trace(total_stage=None):
+    """
+    Group the spans of one request
+
+    Args:
+        total_stage (str): Also record the whole trace under this stage
+
+    Yields:
+        Trace: set .intent before the block ends
+    """
+    current = Trace()
+    outer = getattr(_local, "trace", None)
+    _local.trace = current
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        _local.trace = outer
+        for stage, ms in current.spans:
+            record(stage, ms, current.intent)
+        if total_stage:
+            record(total_stage, elapsed, current.intent)
+
+
+def add_span(stage, ms):
+    """Record a duration measured by the caller, like a finished span()"""
+    current = getattr(_local, "trace", None)
+    if current is not None:
+        current.spans.append((stage, ms))
+    else:
+        record(stage, ms)
+
+
+@contextmanager
+def span(stage):
+    """Time a block as one stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_span(stage, (time.perf_counter() - start) * 1000)
+
+
+# ---------------- STORAGE ----------------
+
+def _conn():
+    global _tables_ready
+
+    from database.db import get_conn, init_db
+
+    if not _tables_ready:
+        init_db()
+        _tables_ready = True
+    return get_conn()
+
+
+def _merge(histograms):
+    """Put counts back into the in-process histograms (caller holds _lock)"""
+    for key, histogram in histograms.items():
+        current = _histograms.setdefault(key, {})
+        for bucket, count in histogram.items():
+            current[bucket] = current.get(bucket, 0) + count
+
+
+def flush():
+    """Write the counts recorded since the last flush to the metrics table"""
+    global _histograms
+
+    with _lock:
+        pending, _histograms = _histograms, {}
+    if not pending:
+        return
+
+    now = datetime.now()
+    rows = [
+        (now.isoformat(), stage, intent, bucket, count)
+        for (stage, intent), histogram in pending.items()
+        for bucket, count in histogram.items()
+    ]
+    try:
+        conn = _conn()
+        try:
+            conn.executemany(
+                "INSERT INTO metrics (flushed_at, stage, intent, bucket, count) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            conn.execute(
+                "DELETE FROM metrics WHERE flushed_at < ?",
+                ((now - timedelta(days=RETENTION_DAYS)).isoformat(),)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception:
+        # Nothing was committed; keep the counts for the next flush
+        with _lock:
+            _merge(pending)
+        raise
+
+
+def _flush_forever():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            print(f"❌ Could not flush metrics: {e}")
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_forever, daemon=True)
+            _flusher.start()
+            atexit.register(flush)
+
+
+def _percentile(histogram, total, q):
+    """Upper bound of the bucket holding the q-quantile"""
+    target = q * total
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= target:
+            return bucket_upper_ms(bucket)
+    return bucket_upper_ms(max(histogram))
+
+
+def latency_summary(since_minutes=None, by_intent=True):
+    """
+    p50/p95/p99 per stage (and intent) from the metrics table
+
+    Flushes this process's pending counts first.
+
+    Args:
+        since_minutes (float): Only count flushes from the last N minutes
+        by_intent (bool): Break stages down by intent; otherwise every
+            intent is merged under ALL_INTENTS
+
+    Returns:
+        list[dict]: stage, intent, count, p50_ms, p95_ms, p99_ms
+    """
+    flush()
+
+    query = "SELECT stage, intent, bucket, SUM(count) FROM metrics"
+    params = ()
+    if since_minutes is not None:
+        query += " WHERE flushed_at >= ?"
+        params = ((datetime.now() - timedelta(minutes=since_minutes)).isoformat(),)
+    query += " GROUP BY stage, intent, bucket"
+
+    conn = _conn()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+
+    histograms = {}
+    for stage, intent, bucket, count in rows:
+        key = (stage, intent if by_intent else ALL_INTENTS)
+        histogram = histograms.setdefault(key, {})
+        histogram[bucket] = histogram.get(bucket, 0) + count
+
+    summary = []
+    for (stage, intent), histogram in sorted(histograms.items()):
+        total = sum(histogram.values())
+        summary.append({
+            "stage": stage,
+            "intent": intent,
+            "count": total,
+            "p50_ms": _percentile(histogram, total, 0.50),
+            "p95_ms": _percentile(histogram, total, 0.95),
+            "p99_ms": _percentile(histogram, total, 0.99),
+        })
+    return summary
@@ -0,0 +1,192 @@
+"""
+Chat History Backfill
+---------------------
+Batch jobs over every row of chat_history, e.g. extracting structured
+entities into chat_entities for analytics.
+
+Rows are read in keyset-paginated chunks (WHERE id > last ORDER BY id), so
+each read is an index range scan however far the job has got. Chunks are
+processed on a process pool with a bounded number in flight, and written
+back in id order with executemany. Each chunk's results are committed in
+the same transaction as the job's checkpoint in job_checkpoints, so an
+interrupted job resumes after the last committed chunk without duplicates.
+
+Usage:
+    python -m nlu_engine.chat_backfill                 # extract entities, resuming
+    python -m nlu_engine.chat_backfill --restart       # start over from the first row
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BASE_DIR)
+
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from database.db import get_conn, init_db
+
+CHUNK_SIZE = 2000
+ENTITY_JOB = "chat_entities"
+
+
+def get_checkpoint(cur, name):
+    """Last chat_history id a job has committed, or 0"""
+    cur.execute("SELECT last_id FROM job_checkpoints WHERE name = ?", (name,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def save_checkpoint(cur, name, last_id):
+    cur.execute(
+        "INSERT OR REPLACE INTO job_checkpoints (name, last_id, updated_at) VALUES (?, ?, ?)",
+        (name, last_id, datetime.now().isoformat())
+    )
+
+
+def iter_chunks(cur, after_id, chunk_size=CHUNK_SIZE, columns="id, query, intent", where=None, params=()):
+    """Yield lists of chat_history rows with id > after_id (and `where`, if given), in id order"""
+    condition = f"id > ? AND ({where})" if where else "id > ?"
+    while True:
+        cur.execute(
+            f"SELECT {columns} FROM chat_history WHERE {condition} ORDER BY id LIMIT ?",
+            (after_id, *params, chunk_size)
+        )
+        rows = cur.fetchall()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+
+def run_chunked(name, process_chunk, write_results, chunk_size=CHUNK_SIZE, workers=None,
+                initializer=None, initargs=(), log_every=10, where=None, params=()):
+    """
+    Stream chat_history through a process pool, resuming from the checkpoint
+
+    Args:
+        name (str): Checkpoint name in job_checkpoints
+        process_chunk: Module-level function run in the pool; takes a list
+            of (id, query, intent) rows and returns picklable results
+        write_results: Called as write_results(cursor, results) in the
+            parent process, inside the chunk's transaction
+        chunk_size (int): Rows per chunk
+        workers (int): Pool size (default: CPU count)
+        initializer: Optional pool initializer, e.g. to load a model once
+            per worker, called with initargs
+        log_every (int): Print progress every this many chunks
+        where (str): Optional SQL condition on chat_history rows, e.g. to
+            skip rows that already have results, with `params` for its
+            placeholders
+
+    Returns:
+        dict: rows processed, seconds taken and rows per second
+    """
+    init_db()
+    conn = get_conn()
+    read_cur = conn.cursor()
+    write_cur = conn.cursor()
+
+    after_id = get_checkpoint(read_cur, name)
+    if after_id:
+        print(f"↩️ Resuming {name} after chat id {after_id}")
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    in_flight = deque()
+    processed = 0
+    chunks = 0
+    started = time.perf_counter()
+
+    def drain_one():
+        nonlocal processed, chunks
+        last_id, n_rows, future = in_flight.popleft()
+        write_results(write_cur, future.result())
+        save_checkpoint(write_cur, name, last_id)
+        conn.commit()
+
+        processed += n_rows
+        chunks += 1
+        if chunks % log_every == 0:
+            rate = processed / (time.perf_counter() - started)
+            print(f"⏳ {name}: {processed} rows (up to id {last_id}), {rate:,.0f} rows/s")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+            for rows in iter_chunks(read_cur, after_id, chunk_size, where=where, params=params):
+                # Keep the pool busy without reading the whole table ahead
+                if len(in_flight) >= max_in_flight:
+                    drain_one()
+                in_flight.append((rows[-1][0], len(rows), pool.submit(process_chunk, rows)))
+
+            while in_flight:
+                drain_one()
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - started
+    stats = {"rows": processed, "seconds": seconds, "rows_per_second": processed / seconds if seconds else 0.0}
+    print(f"✅ {name}: {processed} rows in {seconds:.1f}s ({stats['rows_per_second']:,.0f} rows/s)")
+    return stats
+
+
+def reset_job(name, table=None):
+    """Forget a job's checkpoint, and optionally clear its output table"""
+    init_db()
+    conn = get_conn()
+    cur = conn.cursor()
+    if table:
+        cur.execute(f"DELETE FROM {table}")
+    cur.execute("DELETE FROM job_checkpoints WHERE name = ?", (name,))
+    conn.commit()
+    conn.close()
+
+
+# ---------------- ENTITY BACKFILL ----------------
+
+def extract_chunk(rows):
+    """Pool worker: (chat_id, entity, value) rows for a chunk of chats"""
+    from nlu_engine.entity_extractor import extract_entities
+
+    results = []
+    for chat_id, query, intent in rows:
+        for entity, value in extract_entities(query or "", intent or "").items():
+            for item in value if isinstance(value, list) else [value]:
+                results.append((chat_id, entity, str(item)))
+    return results
+
+
+def write_entities(cur, results):
+    cur.executemany("INSERT INTO chat_entities (chat_id, entity, value) VALUES (?, ?, ?)", results)
+
+
+def backfill_entities(chunk_size=CHUNK_SIZE, workers=None, restart=False):
+    """
+    Extract entities for every chat_history row not yet processed
+
+    Returns:
+        dict: rows processed, seconds taken and rows per second
+    """
+    if restart:
+        reset_job(ENTITY_JOB, "chat_entities")
+    return run_chunked(ENTITY_JOB, extract_chunk, write_entities, chunk_size, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill chat_entities from chat_history")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--restart", action="store_true", help="Clear chat_entities and start from the first row")
+    args = parser.parse_args()
+
+    backfill_entities(args.chunk_size, args.workers, args.restart)
+
+
+if __name__ == "__main__":
+    main()
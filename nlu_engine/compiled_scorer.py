@@ -0,0 +1,196 @@
+"""
+Compiled Scorer
+---------------
+Pure-NumPy replacement for TfidfVectorizer + LogisticRegression at
+inference time. Nothing here imports sklearn.
+
+export_compiled() turns a fitted word n-gram TfidfVectorizer and a
+LogisticRegression into plain arrays:
+
+    compiled/
+        config.json         <- analyzer settings, number of classes
+        vocab_hashes.npy    <- uint64, sorted 64-bit hashes of the n-grams
+        vocab_columns.npy   <- int32, feature column for each hash
+        idf.npy             <- float32 (n_features,)
+        coef.npy            <- float32 (n_features, n_classes), row per feature
+        intercept.npy       <- float32 (n_classes,)
+
+load_compiled() memory-maps the arrays read-only, so every worker process
+shares the same weights through the page cache.
+
+Usage:
+    scorer = load_compiled("models/intent_model/versions/<v>/compiled", labels)
+    probs = scorer.predict_proba(["check my balance"])
+"""
+
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+CONFIG_NAME = "config.json"
+ARRAYS = ("vocab_hashes", "vocab_columns", "idf", "coef", "intercept")
+
+
+def term_hash(term):
+    """Stable 64-bit hash of an n-gram, identical across processes"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def export_compiled(vectorizer, model, path):
+    """
+    Write the compiled arrays for a fitted vectorizer/model pair
+
+    Raises:
+        ValueError: If the pair is not a word-analyzer TF-IDF vectorizer
+            with a LogisticRegression on top
+    """
+    if type(model).__name__ != "LogisticRegression":
+        raise ValueError(f"Cannot compile {type(model).__name__}")
+    if getattr(vectorizer, "analyzer", None) != "word" or not hasattr(vectorizer, "vocabulary_"):
+        raise ValueError(f"Cannot compile {type(vectorizer).__name__}")
+    if vectorizer.stop_words is not None or vectorizer.strip_accents is not None \
+            or vectorizer.preprocessor is not None or vectorizer.tokenizer is not None:
+        raise ValueError("Cannot compile a vectorizer with custom preprocessing")
+
+    terms = list(vectorizer.vocabulary_)
+    hashes = np.array([term_hash(term) for term in terms], dtype=np.uint64)
+    columns = np.array([vectorizer.vocabulary_[term] for term in terms], dtype=np.int32)
+    order = np.argsort(hashes)
+    hashes, columns = hashes[order], columns[order]
+    if len(np.unique(hashes)) != len(hashes):
+        raise ValueError("Vocabulary hash collision")
+
+    n_features = len(terms)
+    idf = vectorizer.idf_ if vectorizer.use_idf else np.ones(n_features)
+
+    config = {
+        "lowercase": vectorizer.lowercase,
+        "token_pattern": vectorizer.token_pattern,
+        "ngram_range": list(vectorizer.ngram_range),
+        "binary": vectorizer.binary,
+        "sublinear_tf": vectorizer.sublinear_tf,
+        "norm": vectorizer.norm,
+        # Binary LogisticRegression keeps a single row of coefficients
+        "binary_model": model.coef_.shape[0] == 1,
+        "ovr": getattr(model, "multi_class", "auto") == "ovr",
+    }
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "vocab_hashes.npy"), hashes)
+    np.save(os.path.join(path, "vocab_columns.npy"), columns)
+    np.save(os.path.join(path, "idf.npy"), idf.astype(np.float32))
+    np.save(os.path.join(path, "coef.npy"), np.ascontiguousarray(model.coef_.T, dtype=np.float32))
+    np.save(os.path.join(path, "intercept.npy"), model.intercept_.astype(np.float32))
+
+    with open(os.path.join(path, CONFIG_NAME), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=4)
+
+
+class CompiledScorer:
+    """TF-IDF featurizer and linear softmax scorer over memory-mapped arrays"""
+
+    def __init__(self, config, arrays, class_names):
+        self.lowercase = config["lowercase"]
+        self.token_re = re.compile(config["token_pattern"])
+        self.min_n, self.max_n = config["ngram_range"]
+        self.binary = config["binary"]
+        self.sublinear_tf = config["sublinear_tf"]
+        self.norm = config["norm"]
+        self.binary_model = config["binary_model"]
+        self.ovr = config["ovr"]
+
+        self.vocab_hashes = arrays["vocab_hashes"]
+        self.vocab_columns = arrays["vocab_columns"]
+        self.idf = arrays["idf"]
+        self.coef = arrays["coef"]
+        self.intercept = arrays["intercept"]
+        self.class_names = class_names
+
+    def analyze(self, text):
+        """Word n-grams, matching sklearn's default word analyzer"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_re.findall(text)
+        if self.max_n == 1:
+            return tokens
+
+        ngrams = list(tokens) if self.min_n == 1 else []
+        for n in range(max(self.min_n, 2), min(self.max_n, len(tokens)) + 1):
+            for i in range(len(tokens) - n + 1):
+                ngrams.append(" ".join(tokens[i:i + n]))
+        return ngrams
+
+    def _features(self, texts):
+        """Sparse TF-IDF rows as flat (row, column, value) arrays"""
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            for term in self.analyze(text):
+                rows.append(row)
+                hashes.append(term_hash(term))
+
+        rows = np.asarray(rows, dtype=np.intp)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+
+        # Hash-table lookup: binary search into the sorted vocabulary hashes
+        pos = np.searchsorted(self.vocab_hashes, hashes)
+        pos[pos == len(self.vocab_hashes)] = 0
+        known = self.vocab_hashes[pos] == hashes
+        rows, columns = rows[known], self.vocab_columns[pos[known]]
+
+        # Term counts per (row, column)
+        keys = rows.astype(np.int64) * len(self.idf) + columns
+        keys, counts = np.unique(keys, return_counts=True)
+        rows, columns = keys // len(self.idf), keys % len(self.idf)
+
+        tf = np.ones(len(counts)) if self.binary else counts.astype(np.float64)
+        if self.sublinear_tf:
+            tf = 1.0 + np.log(tf)
+        values = tf * self.idf[columns]
+
+        if self.norm is not None:
+            norms = np.zeros(len(texts))
+            if self.norm == "l2":
+                np.add.at(norms, rows, values * values)
+                norms = np.sqrt(norms)
+            else:
+                np.add.at(norms, rows, np.abs(values))
+            norms[norms == 0] = 1.0
+            values = values / norms[rows]
+
+        return rows, columns, values
+
+    def decision_function(self, texts):
+        rows, columns, values = self._features(texts)
+        scores = np.zeros((len(texts), self.coef.shape[1]))
+        np.add.at(scores, rows, self.coef[columns] * values[:, None])
+        return scores + self.intercept
+
+    def predict_proba(self, texts):
+        scores = self.decision_function(texts)
+
+        if self.binary_model:
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+
+        if self.ovr:
+            probs = 1.0 / (1.0 + np.exp(-scores))
+            return probs / probs.sum(axis=1, keepdims=True)
+
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+def load_compiled(path, class_names, mmap_mode="r"):
+    """Load a compiled scorer, memory-mapping its arrays read-only"""
+    with open(os.path.join(path, CONFIG_NAME), "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in ARRAYS
+    }
+    return CompiledScorer(config, arrays, class_names)
@@ -1,61 +1,258 @@
+import os
 import re
+import sys
 
-class EntityExtractor:
-    def __init__(self):
-        self.amount_pattern = re.compile(r'(?:₹|\$)?\b\d+(?:,\d+)?\b')
-        self.account_pattern = re.compile(r'\b\d{6,12}\b')
-        self.txn_pattern = re.compile(r'\bTXN\d+\b')
+# Allow running as a script: python nlu_engine/entity_extractor.py
+if os.path.dirname(os.path.dirname(os.path.abspath(__file__))) not in sys.path:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlu_engine.gazetteer import ACCOUNT_HOLDER, LOCATION, get_gazetteer
+from nlu_engine.results import Entity
+
+# ---------------- SINGLE-PASS SCANNER ----------------
+# One alternation regex finds every token an entity can come from; the
+# keyword table below then tells what each keyword means. Card numbers are
+# resolved by a small state machine over the same token stream.
+#
+# User text is untrusted, so every pattern here is linear in the input
+# length: repetitions are bounded and nothing scans to the end of the text
+# from each match.
+
+# Keyword lists are in priority order: when several appear in a query, the
+# first one listed wins
+KEYWORDS = {
+    "reason": ["lost", "stolen", "fraud", "damaged", "compromised"],
+    "card_type": ["credit", "debit", "atm"],
+    "account_type": ["savings", "current", "checking", "salary"],
+    "transfer_type": ["neft", "rtgs", "imps", "upi"],
+    "location_hint": ["atm", "branch"],
+}
+
+# Keywords that open a card-number context: a 3-4 digit number at most
+# CARD_WINDOW words (and CARD_WINDOW_CHARS characters) after one is taken
+# as the card number
+CARD_KEYWORDS = {"card", "debit", "credit", "atm"}
+CARD_WINDOW = 5
+CARD_WINDOW_CHARS = 48
+
+# Date words only count as whole words
+RELATIVE_DATES = {"today", "yesterday", "tomorrow"}
+PERIOD_STARTS = {"last", "past", "previous"}
+PERIOD_UNITS = {"week", "month", "year"}
+_DATE_WORDS = RELATIVE_DATES | PERIOD_STARTS | PERIOD_UNITS
+
+_KEYWORD_TYPES = {word: [] for word in CARD_KEYWORDS | _DATE_WORDS}
+for _entity_type, _words in KEYWORDS.items():
+    for _word in _words:
+        _KEYWORD_TYPES.setdefault(_word, []).append(_entity_type)
+
+
+def _keyword_pattern(words):
+    """
+    Case-insensitive regex for a set of keywords, compiled as a prefix trie
+
+    A flat "a|b|c" alternation makes the regex engine try every keyword at
+    every position; the trie plus a first-character guard rejects most
+    positions with a single character-class test.
+    """
+    tree = {}
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    first = "".join(sorted({word[0] for word in words}))
+    return f"(?=[{first}{first.upper()}])(?i:{emit(tree)})"
+
+
+# Alternatives are tried in order at each position; numeric tokens sit
+# behind a one-character guard so letters skip straight to the keywords
+SCANNER = re.compile(
+    r"(?P<email>\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,24}\b)"
+    r"|(?=[\d₹$])(?:"
+    r"(?P<date>\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b)"
+    r"|(?P<number>(?:₹|\$)?\b\d+(?:,\d+)?\b)"
+    r"|(?P<digits>\d{3,})"
+    r")"
+    r"|(?P<keyword>" + _keyword_pattern(_KEYWORD_TYPES) + ")"
+    r"|(?P<txn>\bTXN\d+\b)"
+    r"|(?P<newline>\n)"
+)
+
+_DIGIT_GROUP = re.compile(r"\d+")
+_PHONE = re.compile(r"(?:\+91[-\s]?)?[6-9]\d{9}")
+
+# Free-text guesses, only used while the gazetteer knows no account holders
+# or locations. The captures are length bounded so a long message can't
+# make every "to"/"at" scan to its end
+BENEFICIARY_PATTERN = re.compile(r"to\s+([A-Za-z\s]{1,60}?)(?:\s+account|\s+\d|\s*$)")
+LOCATION_PATTERN = re.compile(r"(?:near|at|in)\s+([A-Za-z\s]{1,60}?)(?:\s+area|\s*$|,|\?)", re.IGNORECASE)
+
+
+def _bounded(text, start, end):
+    """True if text[start:end] is a whole word (like \\b...\\b)"""
+    return (start == 0 or not (text[start - 1].isalnum() or text[start - 1] == "_")) and \
+        (end == len(text) or not (text[end].isalnum() or text[end] == "_"))
+
+
+def _scan(text):
+    """
+    Run the scanner over a text
+
+    Returns:
+        tuple: (core, keywords, dates, emails, phones)
+            core: (entity, value, start, end) card, account, amount and
+                transaction entities in the order EntityExtractor reports them
+            keywords: keyword entity type -> list of (word, start, end)
+            dates: (relative dates, relative periods, specific dates), each
+                a list of (value, start, end)
+            emails, phones: lists of (value, start, end)
+    """
+    cards, accounts, amounts, txns = [], [], [], []
+    emails, phones = [], []
+    relative, periods, specific = [], [], []
+    keywords = {}
+    account_values = set()
+    card_keyword_end = None
+    period_start = None
+
+    for match in SCANNER.finditer(text):
+        kind = match.lastgroup
+        start, end = match.span()
+
+        if kind == "keyword":
+            word = match.group().lower()
+            if word in CARD_KEYWORDS:
+                card_keyword_end = end
+            for entity_type in _KEYWORD_TYPES[word]:
+                keywords.setdefault(entity_type, []).append((word, start, end))
+
+            if word in _DATE_WORDS and _bounded(text, start, end):
+                if word in PERIOD_STARTS:
+                    period_start = (word, start, end)
+                    continue
+                if word in RELATIVE_DATES:
+                    relative.append((word, start, end))
+                elif period_start and text[period_start[2]:start].isspace():
+                    periods.append((f"{period_start[0]} {word}", period_start[1], end))
+            period_start = None
+            continue
+
+        period_start = None
+        if kind == "newline":
+            card_keyword_end = None
+            continue
+
+        value = match.group()
 
-        # Card context: card / debit / credit / atm ... ending XXXX
-        self.card_context = re.compile(
-            r'(card|debit|credit|atm).*?(\d{3,4})',
-            re.IGNORECASE
-        )
+        # Card context: the nearest 3-4 digit number shortly after a card keyword
+        if card_keyword_end is not None and (kind == "number" or kind == "digits"):
+            gap = text[card_keyword_end:start]
+            if len(gap) > CARD_WINDOW_CHARS or len(gap.split()) >= CARD_WINDOW:
+                card_keyword_end = None
+            elif 3 <= len(value) <= 4 and value.isdigit():
+                card_keyword_end = None
+                cards.append(("card_number", value, start, end))
 
+        if kind == "number":
+            amounts.append(("amount", value, start, end))
+            if value.isdigit():
+                if 6 <= len(value) <= 12 and value not in account_values:
+                    account_values.add(value)
+                    accounts.append(("account_number", value, start, end))
+            else:
+                for group in _DIGIT_GROUP.finditer(value):
+                    digits = group.group()
+                    if 6 <= len(digits) <= 12 and digits not in account_values:
+                        account_values.add(digits)
+                        accounts.append(("account_number", digits, start + group.start(), start + group.end()))
+
+        elif kind == "date":
+            specific.append((value, start, end))
+            # Each part of a date is also a bare number
+            for group in _DIGIT_GROUP.finditer(value):
+                amounts.append(("amount", group.group(), start + group.start(), start + group.end()))
+            continue
+
+        elif kind == "txn":
+            txns.append(("transaction_id", value, start, end))
+
+        elif kind == "email":
+            emails.append((value, start, end))
+            continue
+
+        # A phone number needs ten digits in a row
+        if not phones and end - start >= 10:
+            phone = _PHONE.search(text, max(0, start - 4), end)
+            if phone:
+                phones.append((phone.group(), phone.start(), phone.end()))
+
+    # Card and account numbers are never reported as amounts
+    if cards or account_values:
+        excluded = account_values.union(card[1] for card in cards)
+        amounts = [amount for amount in amounts if amount[1] not in excluded]
+
+    return cards + accounts + amounts + txns, keywords, (relative, periods, specific), emails, phones
+
+
+def _entity(entity_type, value, start, end):
+    return {"entity": entity_type, "value": value, "start": start, "end": end}
+
+
+def scan_entities(text):
+    """
+    Find every entity in a text in a single pass
+
+    Card, account, amount and transaction entities are final. Keyword
+    entities (reason, card_type, account_type, transfer_type,
+    location_hint), dates, emails and phones report every occurrence for
+    the caller to pick from.
+
+    Returns:
+        list[dict]: {"entity", "value", "start", "end"} dicts
+    """
+    core, keywords, dates, emails, phones = _scan(text)
+
+    entities = [_entity(*entity) for entity in core]
+    for entity_type, hits in keywords.items():
+        entities.extend(_entity(entity_type, *hit) for hit in hits)
+    for entity_type, hits in zip(("date", "date", "specific_date"), dates):
+        entities.extend(_entity(entity_type, *hit) for hit in hits)
+    entities.extend(_entity("email", *hit) for hit in emails)
+    entities.extend(_entity("phone", *hit) for hit in phones)
+    return entities
+
+
+class EntityExtractor:
     def extract(self, text):
-        entities = []
-
-        # ---- CARD NUMBER ----
-        card_numbers = set()
-        for match in self.card_context.finditer(text):
-            card_num = match.group(2)
-            card_numbers.add(card_num)
-            entities.append({
-                "entity": "card_number",
-                "value": card_num
-            })
-
-        # ---- ACCOUNT NUMBERS ----
-        account_numbers = set(self.account_pattern.findall(text))
-        for acc in account_numbers:
-            entities.append({
-                "entity": "account_number",
-                "value": acc
-            })
-
-        # ---- AMOUNT ----
-        for match in self.amount_pattern.finditer(text):
-            value = match.group()
-
-            # Skip if it's card or account number
-            if value in card_numbers:
-                continue
-            if value in account_numbers:
-                continue
+        """Card, account, amount and transaction entities with their spans"""
+        return [_entity(*entity) for entity in _scan(text)[0]]
 
-            entities.append({
-                "entity": "amount",
-                "value": value
-            })
+    def extract_spans(self, text):
+        """Same entities as extract(), as Entity objects"""
+        return [Entity(*entity) for entity in _scan(text)[0]]
 
-        # ---- TRANSACTION ID ----
-        for txn in self.txn_pattern.findall(text):
-            entities.append({
-                "entity": "transaction_id",
-                "value": txn
-            })
 
-        return entities
+_extractor = EntityExtractor()
+
+
+def _first_by_priority(keywords, entity_type):
+    hits = keywords.get(entity_type)
+    if not hits:
+        return None
+    found = {word for word, _, _ in hits}
+    for word in KEYWORDS[entity_type]:
+        if word in found:
+            return word
+    return None
 
 
 def extract_entities(query, intent):
@@ -70,16 +267,12 @@ def extract_entities(query, intent):
     Returns:
         dict: Dictionary of extracted entities with entity types as keys
     """
-    extractor = EntityExtractor()
-    entities_list = extractor.extract(query)
+    core, keywords, dates, emails, phones = _scan(query)
     
     # Convert list format to dict format for compatibility
     entities_dict = {}
     
-    for entity in entities_list:
-        entity_type = entity["entity"]
-        entity_value = entity["value"]
-        
+    for entity_type, entity_value, _, _ in core:
         # If entity type already exists, append with index
         if entity_type in entities_dict:
             # Handle multiple entities of same type
@@ -92,83 +285,72 @@ def extract_entities(query, intent):
             entities_dict[entity_type] = entity_value
     
     # Intent-specific entity enrichment
-    query_lower = query.lower()
     
-    # Extract card blocking reason
+    # Extract card blocking reason and card type
     if intent == 'card_block':
-        block_reasons = ['lost', 'stolen', 'fraud', 'damaged', 'compromised']
-        for reason in block_reasons:
-            if reason in query_lower:
-                entities_dict['reason'] = reason
-                break
-        
-        # Card type
-        card_types = ['credit', 'debit', 'atm']
-        for card_type in card_types:
-            if card_type in query_lower:
-                entities_dict['card_type'] = card_type
-                break
+        for entity_type in ("reason", "card_type"):
+            word = _first_by_priority(keywords, entity_type)
+            if word:
+                entities_dict[entity_type] = word
     
     # Extract account type
     if intent in ['check_balance', 'transfer_money']:
-        account_types = ['savings', 'current', 'checking', 'salary']
-        for acc_type in account_types:
-            if acc_type in query_lower:
-                entities_dict['account_type'] = acc_type
-                break
+        word = _first_by_priority(keywords, "account_type")
+        if word:
+            entities_dict['account_type'] = word
+    
+    # Known account holders and places mentioned in the query
+    known = {}
+    if intent == 'transfer_money' or "location_hint" in keywords:
+        gazetteer = get_gazetteer()
+        query_lower = query.lower()
+        for entity_type, value, start, _ in gazetteer.match(query):
+            # A name right after "to" is the payee, not the sender
+            after_to = query_lower[:start].rstrip().endswith(" to") or query_lower[:start].rstrip() == "to"
+            if entity_type not in known or (after_to and not known[entity_type][1]):
+                known[entity_type] = (value, after_to)
     
     # Extract transfer type
     if intent == 'transfer_money':
-        transfer_types = ['neft', 'rtgs', 'imps', 'upi']
-        for transfer_type in transfer_types:
-            if transfer_type in query_lower:
-                entities_dict['transfer_type'] = transfer_type.upper()
-                break
+        word = _first_by_priority(keywords, "transfer_type")
+        if word:
+            entities_dict['transfer_type'] = word.upper()
         
-        # Beneficiary name pattern (after "to" keyword)
-        to_pattern = r'to\s+([A-Za-z\s]+?)(?:\s+account|\s+\d|\s*$)'
-        to_matches = re.findall(to_pattern, query_lower)
-        if to_matches:
-            beneficiary = to_matches[0].strip()
-            if len(beneficiary) > 1:  # Avoid single characters
-                entities_dict['beneficiary_name'] = beneficiary
+        # Beneficiary: a real account holder when account holders are known
+        if ACCOUNT_HOLDER in known:
+            entities_dict['beneficiary_name'] = known[ACCOUNT_HOLDER][0]
+        elif not gazetteer.count(ACCOUNT_HOLDER):
+            # Beneficiary name pattern (after "to" keyword)
+            to_match = BENEFICIARY_PATTERN.search(query_lower)
+            if to_match:
+                beneficiary = to_match.group(1).strip()
+                if len(beneficiary) > 1:  # Avoid single characters
+                    entities_dict['beneficiary_name'] = beneficiary
     
     # Extract location for ATM/branch queries
-    if 'atm' in query_lower or 'branch' in query_lower:
-        location_pattern = r'(?:near|at|in)\s+([A-Za-z\s]+?)(?:\s+area|\s*$|,|\?)'
-        location_matches = re.findall(location_pattern, query, re.IGNORECASE)
-        if location_matches:
-            location = location_matches[0].strip()
-            if len(location) > 2:  # Avoid very short matches
-                entities_dict['location'] = location
-    
-    # Extract date/time entities
-    date_patterns = [
-        (r'\b(today|yesterday|tomorrow)\b', 'relative_date'),
-        (r'\b(last|past|previous)\s+(week|month|year)\b', 'relative_period'),
-        (r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b', 'specific_date')
-    ]
+    if "location_hint" in keywords:
+        if LOCATION in known:
+            entities_dict['location'] = known[LOCATION][0]
+        elif not gazetteer.count(LOCATION):
+            location_match = LOCATION_PATTERN.search(query)
+            if location_match:
+                location = location_match.group(1).strip()
+                if len(location) > 2:  # Avoid very short matches
+                    entities_dict['location'] = location
     
-    for pattern, date_type in date_patterns:
-        date_matches = re.findall(pattern, query_lower)
-        if date_matches:
-            if isinstance(date_matches[0], tuple):
-                entities_dict['date'] = ' '.join(date_matches[0])
-            else:
-                entities_dict['date'] = date_matches[0]
+    # Extract date/time entities: relative dates, then periods, then dates
+    for candidates in dates:
+        if candidates:
+            entities_dict['date'] = candidates[0][0]
             break
     
     # Extract email
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    email_matches = re.findall(email_pattern, query)
-    if email_matches:
-        entities_dict['email'] = email_matches[0]
+    if emails:
+        entities_dict['email'] = emails[0][0]
     
     # Extract phone number
-    phone_pattern = r'(?:\+91[-\s]?)?[6-9]\d{9}'
-    phone_matches = re.findall(phone_pattern, query)
-    if phone_matches:
-        entities_dict['phone'] = phone_matches[0]
+    if phones:
+        entities_dict['phone'] = phones[0][0]
     
     return entities_dict
 
@@ -176,8 +358,7 @@ def extract_entities(query, intent):
 # Helper functions for backward compatibility
 def extract_amount(query):
     """Extract monetary amount from query"""
-    extractor = EntityExtractor()
-    entities = extractor.extract(query)
+    entities = _extractor.extract(query)
     for entity in entities:
         if entity["entity"] == "amount":
             amount_str = entity["value"].replace('₹', '').replace('$', '').replace(',', '').strip()
@@ -190,8 +371,7 @@ def extract_amount(query):
 
 def extract_account_number(query):
     """Extract account number from query"""
-    extractor = EntityExtractor()
-    entities = extractor.extract(query)
+    entities = _extractor.extract(query)
     for entity in entities:
         if entity["entity"] == "account_number":
             return entity["value"]
@@ -200,8 +380,7 @@ def extract_account_number(query):
 
 def extract_card_number(query):
     """Extract card number from query"""
-    extractor = EntityExtractor()
-    entities = extractor.extract(query)
+    entities = _extractor.extract(query)
     for entity in entities:
         if entity["entity"] == "card_number":
             return entity["value"]
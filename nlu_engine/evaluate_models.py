@@ -0,0 +1,263 @@
+"""
+Intent Model Evaluation Harness
+-------------------------------
+Compares featurizer/classifier combinations on intents.json with
+stratified k-fold cross-validation.
+
+For every candidate it reports:
+    - macro-F1 and a confusion matrix over the out-of-fold predictions
+    - size on disk of the pickled vectorizer + classifier
+    - p50/p99 latency of a single-query predict_proba, through the
+      CompiledScorer for models the registry can compile (as they are
+      served) and through sklearn for the rest
+
+Cross-validation runs across a process pool. Size and latency are measured
+once the pool has shut down, in this process, one candidate at a time, so
+the timings aren't skewed by the other workers.
+
+Intents with fewer than two examples can't be stratified and are left out
+of the evaluation. Among equally accurate candidates, compilable ones win.
+
+Usage:
+    python -m nlu_engine.evaluate_models                 # print the report
+    python -m nlu_engine.evaluate_models --emit          # also make the winner the training default
+    python -m nlu_engine.evaluate_models --max-p99-ms 2  # winner must meet a latency budget
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.metrics import confusion_matrix, f1_score
+from sklearn.model_selection import StratifiedKFold
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+if os.path.dirname(BASE_DIR) not in sys.path:
+    sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+from nlu_engine.compiled_scorer import export_compiled, load_compiled
+from nlu_engine.train_intent import (
+    TRAINING_CONFIG_PATH, build_classifier, build_vectorizer, load_training_examples
+)
+
+FEATURIZERS = {
+    "tfidf_word_1_2": {"type": "tfidf", "params": {"ngram_range": [1, 2], "sublinear_tf": True}},
+    "tfidf_word_1_3": {"type": "tfidf", "params": {"ngram_range": [1, 3], "max_features": 5000, "sublinear_tf": True}},
+    "tfidf_char_wb_2_5": {"type": "tfidf", "params": {"analyzer": "char_wb", "ngram_range": [2, 5], "sublinear_tf": True}},
+    "hashing_word_1_3": {"type": "hashing", "params": {"ngram_range": [1, 3], "n_features": 65536, "alternate_sign": False}},
+}
+
+CLASSIFIERS = {
+    "logreg_C1": {"type": "logreg", "params": {"C": 1.0, "max_iter": 2000, "random_state": 42}},
+    "logreg_C10": {"type": "logreg", "params": {"C": 10.0, "max_iter": 2000, "random_state": 42}},
+    "svc_linear": {"type": "svc", "params": {"kernel": "linear", "C": 1.0, "probability": True, "random_state": 42}},
+    "sgd_log": {"type": "sgd", "params": {"loss": "log_loss", "alpha": 1e-4, "random_state": 42}},
+    "complement_nb": {"type": "complement_nb", "params": {"alpha": 0.3}},
+}
+
+LATENCY_QUERIES = 200
+
+
+def candidates():
+    """Every featurizer x classifier combination as a named training config"""
+    for (vec_name, vec_spec), (clf_name, clf_spec) in itertools.product(FEATURIZERS.items(), CLASSIFIERS.items()):
+        yield f"{vec_name}+{clf_name}", {"vectorizer": vec_spec, "classifier": clf_spec}
+
+
+def _fit(config, texts, labels):
+    vectorizer = build_vectorizer(config["vectorizer"])
+    model = build_classifier(config["classifier"])
+    model.fit(vectorizer.fit_transform(texts), labels)
+    return vectorizer, model
+
+
+def cross_validate(name, config, texts, labels, n_splits):
+    """Out-of-fold predictions for one candidate (runs in a pool worker)"""
+    texts = np.asarray(texts, dtype=object)
+    labels = np.asarray(labels, dtype=object)
+    predictions = np.empty(len(labels), dtype=object)
+
+    folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+    for train_idx, test_idx in folds.split(texts, labels):
+        vectorizer, model = _fit(config, list(texts[train_idx]), list(labels[train_idx]))
+        probs = model.predict_proba(vectorizer.transform(list(texts[test_idx])))
+        predictions[test_idx] = model.classes_[probs.argmax(axis=1)]
+
+    return name, list(predictions)
+
+
+def stratifiable(examples, n_splits):
+    """
+    The (intent, text) examples that stratified k-fold can use
+
+    Args:
+        examples (list): (intent, text) pairs
+        n_splits (int): Requested number of folds
+
+    Returns:
+        tuple: (texts, labels, class labels, number of folds to use)
+    """
+    counts = {}
+    for name, _ in examples:
+        counts[name] = counts.get(name, 0) + 1
+
+    # StratifiedKFold needs at least two examples of every intent
+    skipped = sorted(name for name, count in counts.items() if count < 2)
+    if skipped:
+        print(f"⚠️ Skipping intents with fewer than 2 examples: {', '.join(skipped)}")
+    examples = [(name, text) for name, text in examples if counts[name] >= 2]
+
+    texts = [text for _, text in examples]
+    labels = [name for name, _ in examples]
+    classes = sorted(set(labels))
+    if len(classes) < 2:
+        raise ValueError("Need at least two intents with two or more examples each")
+
+    # Every fold needs at least one example of each intent
+    n_splits = max(2, min(n_splits, min(counts[c] for c in classes)))
+    return texts, labels, classes, n_splits
+
+
+def measure_serving(config, texts, labels):
+    """
+    Size on disk and single-query latency of the model fitted on all data,
+    timed the way the registry would serve it
+    """
+    vectorizer, model = _fit(config, texts, labels)
+
+    buffer = io.BytesIO()
+    joblib.dump((vectorizer, model), buffer)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            export_compiled(vectorizer, model, tmp_dir)
+            # Loaded into memory, so nothing refers to tmp_dir once it's gone
+            scorer = load_compiled(tmp_dir, tuple(str(c) for c in model.classes_), mmap_mode=None)
+            compiled = True
+        except ValueError:
+            compiled = False
+
+    if compiled:
+        predict = lambda text: scorer.predict_proba([text])
+    else:
+        predict = lambda text: model.predict_proba(vectorizer.transform([text]))
+
+    timings = []
+    for text in itertools.islice(itertools.cycle(texts), LATENCY_QUERIES):
+        start = time.perf_counter()
+        predict(text)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    return {
+        "size_kb": len(buffer.getvalue()) / 1024,
+        "p50_ms": statistics.median(timings),
+        "p99_ms": timings[int(len(timings) * 0.99) - 1],
+        "compiled": compiled,
+    }
+
+
+def evaluate(n_splits=5, max_workers=None):
+    """
+    Evaluate every candidate
+
+    Returns:
+        tuple: (class labels, list of result dicts sorted best first)
+    """
+    texts, labels, classes, n_splits = stratifiable(load_training_examples(), n_splits)
+
+    configs = dict(candidates())
+    results = []
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(cross_validate, name, config, texts, labels, n_splits)
+            for name, config in configs.items()
+        ]
+        for future in futures:
+            name, predictions = future.result()
+            results.append({
+                "name": name,
+                "config": configs[name],
+                "macro_f1": f1_score(labels, predictions, average="macro"),
+                "confusion_matrix": confusion_matrix(labels, predictions, labels=classes).tolist(),
+            })
+
+    # Measured only now, with the pool gone, so the timings are taken on an idle machine
+    for result in results:
+        result.update(measure_serving(result["config"], texts, labels))
+
+    # Best macro-F1 first; a tie goes to a compilable model, then to the faster one
+    results.sort(key=lambda r: (-round(r["macro_f1"], 4), not r["compiled"], r["p99_ms"]))
+    return classes, results
+
+
+def pick_winner(results, max_p99_ms=None):
+    for result in results:
+        if max_p99_ms is None or result["p99_ms"] <= max_p99_ms:
+            return result
+    return None
+
+
+def print_report(classes, results):
+    print(f"{'Candidate':<36}{'macro-F1':>10}{'size KB':>10}{'p50 ms':>9}{'p99 ms':>9}{'timed via':>11}")
+    print("-" * 85)
+    for r in results:
+        print(f"{r['name']:<36}{r['macro_f1']:>10.3f}{r['size_kb']:>10.1f}{r['p50_ms']:>9.3f}{r['p99_ms']:>9.3f}"
+              f"{'compiled' if r['compiled'] else 'sklearn':>11}")
+    print("Latency is the CompiledScorer's for compilable models, sklearn's for the rest")
+
+    best = results[0]
+    print(f"\nConfusion matrix for {best['name']} (rows = true, columns = predicted):")
+    width = max(len(c) for c in classes) + 2
+    print(" " * width + "".join(f"{c[:10]:>12}" for c in classes))
+    for cls, row in zip(classes, best["confusion_matrix"]):
+        print(f"{cls:<{width}}" + "".join(f"{n:>12}" for n in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validate intent classifier candidates")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-p99-ms", type=float, default=None,
+                        help="Only candidates within this latency budget can win")
+    parser.add_argument("--emit", action="store_true",
+                        help=f"Write the winning config to {TRAINING_CONFIG_PATH}")
+    parser.add_argument("--report", help="Also write the full results as JSON to this path")
+    args = parser.parse_args()
+
+    classes, results = evaluate(args.folds, args.workers)
+    print_report(classes, results)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"classes": classes, "results": results}, f, indent=4)
+
+    winner = pick_winner(results, args.max_p99_ms)
+    if winner is None:
+        print("\n❌ No candidate meets the latency budget")
+        return
+
+    print(f"\n🏆 Winner: {winner['name']} (macro-F1 {winner['macro_f1']:.3f}, p99 {winner['p99_ms']:.3f} ms)")
+    if not winner["compiled"]:
+        print("⚠️ The winner can't be compiled; it will be served from the pickles, not the CompiledScorer "
+              "(its latency above is sklearn's)")
+
+    if args.emit:
+        with open(TRAINING_CONFIG_PATH, "w", encoding="utf-8") as f:
+            json.dump(winner["config"], f, indent=4)
+        print(f"✅ Training default written to {TRAINING_CONFIG_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Exact-Match Index
+-----------------
+Hash index from normalised training examples to their intent. Queries
+that are (near-)verbatim copies of a training example are answered with
+confidence 1.0 without running the classifier.
+
+Each model version ships the examples it was trained on, so the index
+always agrees with the model it is served next to. Versions without that
+snapshot fall back to intents.json, limited to the intents the model knows.
+"""
+
+import re
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_query(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+class ExactMatchIndex:
+    def __init__(self, examples, intents=None):
+        """
+        Args:
+            examples: Iterable of (intent, example) pairs
+            intents: Only index examples of these intents (default: all)
+        """
+        known = None if intents is None else set(intents)
+        index = {}
+        ambiguous = set()
+        for intent, example in examples:
+            if known is not None and intent not in known:
+                continue
+            key = normalize_query(example)
+            if not key:
+                continue
+            if index.get(key, intent) != intent:
+                ambiguous.add(key)
+            index[key] = intent
+
+        # Examples listed under several intents are left to the classifier
+        for key in ambiguous:
+            del index[key]
+
+        self._index = index
+
+    def __len__(self):
+        return len(self._index)
+
+    def lookup(self, text):
+        """Intent for a known example, or None"""
+        return self._index.get(normalize_query(text))
@@ -0,0 +1,189 @@
+"""
+FAQ Index
+---------
+TF-IDF retrieval over the knowledge_base questions, so FAQ-style messages
+are answered without a round-trip to the LLM.
+
+Questions are turned into term counts with the same stateless
+HashingVectorizer approach as incremental training (English stop words
+removed, unigrams and bigrams), so adding a question never refits a
+vocabulary. Each FAQ keeps its own sparse count row and the document
+frequencies are adjusted as FAQs come and go; the IDF-weighted,
+L2-normalised matrix is rebuilt from those on the next search after a
+change. It is kept column-major, so a search only touches the columns of
+the query's own terms.
+
+add_faq, update_faq and delete_faq update the index straight away. Every
+REFRESH_INTERVAL seconds it is also compared with the table and brought up
+to date, for changes made by other processes.
+
+Usage:
+    index = get_faq_index()
+    index.search("how do I open an FD")
+    # (faq_id, question, answer, score) or None
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+# Cosine similarity needed to answer from the knowledge base
+THRESHOLD = 0.6
+
+# Seconds between comparisons with the knowledge_base table
+REFRESH_INTERVAL = 60.0
+
+N_FEATURES = 2 ** 18
+
+
+def make_vectorizer():
+    return HashingVectorizer(
+        ngram_range=(1, 2),
+        n_features=N_FEATURES,
+        stop_words="english",
+        alternate_sign=False,
+        norm=None
+    )
+
+
+class FAQIndex:
+    def __init__(self):
+        self._vectorizer = make_vectorizer()
+        self._faqs = {}  # faq_id -> (question, answer, count row)
+        self._df = np.zeros(N_FEATURES, dtype=np.int32)
+        self._lock = threading.Lock()
+        self._snapshot = None  # (ids, matrix, idf), rebuilt after changes
+
+    def __len__(self):
+        return len(self._faqs)
+
+    def _remove(self, faq_id):
+        entry = self._faqs.pop(faq_id, None)
+        if entry is not None:
+            self._df[entry[2].indices] -= 1
+
+    def upsert(self, faq_id, question, answer):
+        """Add an FAQ, or replace it if the id is already indexed"""
+        row = self._vectorizer.transform([question]).tocsr()
+        with self._lock:
+            self._remove(faq_id)
+            self._faqs[faq_id] = (question, answer, row)
+            self._df[row.indices] += 1
+            self._snapshot = None
+
+    def remove(self, faq_id):
+        """Drop an FAQ from the index"""
+        with self._lock:
+            self._remove(faq_id)
+            self._snapshot = None
+
+    def sync(self, faqs):
+        """
+        Bring the index in line with the table
+
+        Args:
+            faqs (list[tuple]): (id, question, answer) for every FAQ
+        """
+        current = {faq_id: (question, answer) for faq_id, question, answer in faqs}
+        with self._lock:
+            indexed = {faq_id: entry[:2] for faq_id, entry in self._faqs.items()}
+
+        for faq_id in set(indexed) - set(current):
+            self.remove(faq_id)
+        for faq_id, entry in current.items():
+            if indexed.get(faq_id) != entry:
+                self.upsert(faq_id, *entry)
+
+    def _build(self):
+        with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+
+            from scipy.sparse import vstack
+
+            ids = list(self._faqs)
+            n_docs = len(ids)
+            # Smoothed IDF, as TfidfVectorizer computes it
+            idf = np.log((1 + n_docs) / (1 + self._df)) + 1
+            if ids:
+                counts = vstack([self._faqs[faq_id][2] for faq_id in ids]).tocsr()
+                matrix = normalize(counts.multiply(idf).tocsr()).tocsc()
+            else:
+                matrix = None
+            self._snapshot = (ids, matrix, idf)
+            return self._snapshot
+
+    def search(self, text, threshold=THRESHOLD):
+        """
+        Find the FAQ whose question is most similar to the text
+
+        Returns:
+            tuple: (faq_id, question, answer, score), or None if no question
+            scores at least the threshold
+        """
+        ids, matrix, idf = self._snapshot or self._build()
+        if matrix is None:
+            return None
+
+        query = self._vectorizer.transform([text])
+        if query.nnz == 0:
+            return None
+        weights = query.data * idf[query.indices]
+        weights /= np.linalg.norm(weights)
+
+        scores = matrix[:, query.indices] @ weights
+        best = int(scores.argmax())
+        if scores[best] < threshold:
+            return None
+
+        faq_id = ids[best]
+        entry = self._faqs.get(faq_id)
+        if entry is None:
+            return None  # Removed since the snapshot was taken
+        return faq_id, entry[0], entry[1], float(scores[best])
+
+
+_index = FAQIndex()
+_checked_at = None
+_refresh_lock = threading.Lock()
+
+
+def refresh():
+    """Re-read the knowledge_base table and apply any differences"""
+    global _checked_at
+
+    from database.db import DB_NAME, get_conn
+
+    with _refresh_lock:
+        _checked_at = time.monotonic()
+        if not os.path.exists(DB_NAME):
+            return
+
+        conn = get_conn()
+        try:
+            faqs = conn.execute("SELECT id, question, answer FROM knowledge_base").fetchall()
+        except sqlite3.OperationalError:
+            faqs = []  # No knowledge_base table yet
+        finally:
+            conn.close()
+        _index.sync(faqs)
+
+
+def faq_changed(faq_id, question=None, answer=None):
+    """Apply an FAQ change (called by add_faq, update_faq and delete_faq)"""
+    if question is None:
+        _index.remove(faq_id)
+    else:
+        _index.upsert(faq_id, question, answer)
+
+
+def get_faq_index():
+    """The shared FAQ index, compared with the table every REFRESH_INTERVAL seconds"""
+    if _checked_at is None or time.monotonic() - _checked_at >= REFRESH_INTERVAL:
+        refresh()
+    return _index
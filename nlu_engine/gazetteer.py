@@ -0,0 +1,172 @@
+"""
+Gazetteer
+---------
+Known names (account holders, branch/ATM locations) matched against a
+query in a single pass over its words.
+
+Names are stored in a word trie, so matching walks each query word at
+most as deep as the longest name: the cost depends on the query length,
+not on how many names are known.
+
+Account holders come from accounts.user_name. The gazetteer remembers the
+highest accounts rowid it has seen and only reads newer rows when it
+refreshes; create_account also adds the new holder straight away.
+Locations are read from the optional nlu_engine/locations.json, a JSON
+list of place names:
+
+    ["Jubilee Hills", "MG Road", "Whitefield"]
+
+Usage:
+    gazetteer = get_gazetteer()
+    gazetteer.match("send 500 to Priya Sharma")
+    # [("beneficiary_name", "Priya Sharma", 11, 23)]
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCATIONS_PATH = os.path.join(BASE_DIR, "locations.json")
+
+ACCOUNT_HOLDER = "beneficiary_name"
+LOCATION = "location"
+
+# Seconds between checks of the accounts table for rows added by other processes
+REFRESH_INTERVAL = 30.0
+
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+class Gazetteer:
+    def __init__(self):
+        self._root = {}
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def add(self, phrase, entity_type, value=None):
+        """
+        Add a name
+
+        Args:
+            phrase (str): The name as it appears in queries (case-insensitive)
+            entity_type (str): Entity type reported for it
+            value (str): Value reported for it; defaults to the phrase
+        """
+        words = [word.lower() for word in _WORD.findall(phrase)]
+        if not words:
+            return
+
+        # Readers never take the lock: they only look keys up, and a node
+        # is fully built before it becomes reachable
+        with self._lock:
+            node = self._root
+            for word in words:
+                child = node.get(word)
+                if child is None:
+                    child = {}
+                    node[word] = child
+                node = child
+
+            # Several holders can share a name; the first one added is reported
+            entries = node.get(None, {})
+            if entity_type in entries:
+                return
+            self._counts[entity_type] = self._counts.get(entity_type, 0) + 1
+            node[None] = dict(entries, **{entity_type: value or phrase.strip()})
+
+    def count(self, entity_type):
+        """Number of distinct names of a type"""
+        return self._counts.get(entity_type, 0)
+
+    def match(self, text):
+        """
+        Find known names in a text, longest match first, left to right
+
+        Returns:
+            list[tuple]: (entity_type, value, start, end) per match
+        """
+        words = [(m.group().lower(), m.start(), m.end()) for m in _WORD.finditer(text)]
+        matches = []
+
+        i = 0
+        while i < len(words):
+            node = self._root
+            found, found_end = None, i
+            for j in range(i, len(words)):
+                node = node.get(words[j][0])
+                if node is None:
+                    break
+                if None in node:
+                    found, found_end = node[None], j
+
+            if found is None:
+                i += 1
+                continue
+
+            start, end = words[i][1], words[found_end][2]
+            for entity_type, value in found.items():
+                matches.append((entity_type, value, start, end))
+            i = found_end + 1
+
+        return matches
+
+
+_gazetteer = Gazetteer()
+_watermark = 0
+_checked_at = None
+_refresh_lock = threading.Lock()
+
+
+def _load_locations():
+    if not os.path.exists(LOCATIONS_PATH):
+        return
+    with open(LOCATIONS_PATH, "r", encoding="utf-8") as f:
+        for location in json.load(f):
+            _gazetteer.add(location, LOCATION)
+
+
+def refresh():
+    """Add account holders created since the last refresh"""
+    global _watermark, _checked_at
+
+    from database.db import DB_NAME, get_conn
+
+    with _refresh_lock:
+        if _checked_at is None:
+            _load_locations()
+        _checked_at = time.monotonic()
+
+        # Don't create an empty database just to find no accounts
+        if not os.path.exists(DB_NAME):
+            return
+
+        conn = get_conn()
+        try:
+            rows = conn.execute(
+                "SELECT rowid, user_name FROM accounts WHERE rowid > ? ORDER BY rowid", (_watermark,)
+            ).fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # No accounts table yet
+        finally:
+            conn.close()
+
+        for rowid, name in rows:
+            if name:
+                _gazetteer.add(name, ACCOUNT_HOLDER)
+            _watermark = rowid
+
+
+def add_account_holder(name):
+    """Make a new account holder matchable immediately (called by create_account)"""
+    _gazetteer.add(name, ACCOUNT_HOLDER)
+
+
+def get_gazetteer():
+    """The shared gazetteer, refreshed from the accounts table every REFRESH_INTERVAL seconds"""
+    if _checked_at is None or time.monotonic() - _checked_at >= REFRESH_INTERVAL:
+        refresh()
+    return _gazetteer
@@ -0,0 +1,190 @@
+"""
+Incremental Intent Training
+---------------------------
+Fast model updates for examples added from the Admin dashboard.
+
+Uses a stateless HashingVectorizer (no vocabulary to refit) with an
+SGDClassifier trained through partial_fit. New examples for an existing
+intent update the live model in milliseconds; a new intent changes the
+class set, so the SGD model is rebuilt, which is still fast on this data
+size. Every update is published to the model registry, so predict_intents
+and classify_intent pick it up like any other version.
+
+The full TF-IDF + LogisticRegression refit is submitted to the training
+job manager shortly after the last incremental update.
+
+Usage:
+    add_examples("check_balance", ["how much money is left"])
+"""
+
+import copy
+import random
+import threading
+
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from .model_registry import model_handle, publish
+from .train_intent import load_intents
+from .training_jobs import JobAlreadyRunning, submit_job
+
+MODEL_KIND = "hashing_sgd"
+
+# Examples replayed from the existing data per new example, so an update
+# doesn't drag the model towards the new intent only
+REPLAY_RATIO = 4
+FULL_FIT_EPOCHS = 10
+UPDATE_EPOCHS = 3
+
+# Seconds to wait after the last update before refitting from scratch
+FULL_REFIT_DELAY = 30.0
+
+_refit_timer = None
+_refit_lock = threading.Lock()
+
+
+def make_vectorizer():
+    return HashingVectorizer(
+        ngram_range=(1, 3),
+        n_features=2 ** 16,
+        alternate_sign=False,
+        norm="l2"
+    )
+
+
+def make_classifier():
+    return SGDClassifier(
+        loss="log_loss",
+        alpha=1e-4,
+        random_state=42
+    )
+
+
+def _examples(intents_dict):
+    texts, labels = [], []
+    for intent, examples in intents_dict.items():
+        for example in examples:
+            texts.append(example.lower())
+            labels.append(intent)
+    return texts, labels
+
+
+def _publish(model, vectorizer, classes, texts, labels):
+    encoder = LabelEncoder().fit(classes)
+    version = publish(model, vectorizer, encoder, {"kind": MODEL_KIND, "n_examples": len(texts)},
+                      list(zip(labels, texts)))
+    model_handle.refresh()
+    return version
+
+
+def fit_incremental(intents_dict, epochs=FULL_FIT_EPOCHS):
+    """
+    Build the hashing + SGD model from scratch and publish it
+
+    Args:
+        intents_dict (dict): Dictionary mapping intent names to lists of examples
+        epochs (int): Passes of partial_fit over the shuffled data
+
+    Returns:
+        str: Published version
+    """
+    texts, labels = _examples(intents_dict)
+    classes = sorted(intents_dict)
+    vectorizer = make_vectorizer()
+    model = make_classifier()
+
+    order = list(range(len(texts)))
+    rng = random.Random(42)
+    X = vectorizer.transform(texts)
+    for _ in range(epochs):
+        rng.shuffle(order)
+        model.partial_fit(X[order], [labels[i] for i in order], classes=classes)
+
+    return _publish(model, vectorizer, classes, texts, labels)
+
+
+def add_examples(intent, examples, intents_dict=None):
+    """
+    Update the live model with new examples and publish the result
+
+    Args:
+        intent (str): Intent the examples belong to
+        examples (list[str]): New training examples
+        intents_dict (dict): Full training data including the new examples;
+            loaded from intents.json when omitted
+
+    Returns:
+        str: Published version
+
+    The full refit is scheduled even if the update fails, so examples
+    already saved to intents.json are trained on either way.
+    """
+    if intents_dict is None:
+        intents_dict = load_intents()
+
+    try:
+        return _add_examples(intent, examples, intents_dict)
+    finally:
+        schedule_full_refit()
+
+
+def _add_examples(intent, examples, intents_dict):
+    try:
+        live = model_handle.get()
+    except FileNotFoundError:
+        live = None
+
+    incremental = (
+        live is not None
+        and live.manifest.get("kind") == MODEL_KIND
+        and intent in live.class_names
+        and sorted(live.class_names) == sorted(intents_dict)
+    )
+
+    if not incremental:
+        version = fit_incremental(intents_dict)
+    else:
+        # Never mutate the model other threads are predicting with
+        model = copy.deepcopy(live.model)
+        new_texts = [example.lower() for example in examples]
+
+        texts, labels = _examples(intents_dict)
+        rng = random.Random()
+        replay = rng.sample(range(len(texts)), min(len(texts), REPLAY_RATIO * len(new_texts)))
+        batch_texts = new_texts + [texts[i] for i in replay]
+        batch_labels = [intent] * len(new_texts) + [labels[i] for i in replay]
+
+        X = live.vectorizer.transform(batch_texts)
+        for _ in range(UPDATE_EPOCHS):
+            model.partial_fit(X, batch_labels)
+
+        version = _publish(model, live.vectorizer, list(live.class_names), texts, labels)
+
+    return version
+
+
+def schedule_full_refit(delay=FULL_REFIT_DELAY):
+    """
+    Submit a full TF-IDF + LogisticRegression training job after a delay
+
+    Repeated calls within the delay collapse into a single job.
+    """
+    global _refit_timer
+
+    with _refit_lock:
+        if _refit_timer is not None:
+            _refit_timer.cancel()
+        _refit_timer = threading.Timer(delay, _full_refit)
+        _refit_timer.daemon = True
+        _refit_timer.start()
+
+
+def _full_refit():
+    try:
+        submit_job()
+    except JobAlreadyRunning:
+        # The running job may have started before the latest examples
+        schedule_full_refit()
+    except Exception as e:
+        print(f"❌ Could not submit refit job: {e}")
@@ -1,57 +1,89 @@
-import joblib
-import os
 import re
 import numpy as np
 
-MODEL_DIR = "models/intent_model"
+from .model_registry import model_handle
 
-model = joblib.load(os.path.join(MODEL_DIR, "intent_model.pkl"))
-vectorizer = joblib.load(os.path.join(MODEL_DIR, "vectorizer.pkl"))
-encoder = joblib.load(os.path.join(MODEL_DIR, "label_encoder.pkl"))
+SPLIT_PATTERN = re.compile(r'\band\b|\?|\.|,')
 
-def predict_intents(text, top_n=3):
-    # Split combined queries
-    parts = re.split(r'\band\b|\?|\.|,', text.lower())
-    parts = [p.strip() for p in parts if p.strip()]
 
-    intent_scores = {intent: 0.0 for intent in encoder.classes_}
+def split_query(text):
+    """Split a combined query into its non-empty, lowercased segments"""
+    parts = SPLIT_PATTERN.split(text.lower())
+    return [p.strip() for p in parts if p.strip()]
+
+
+def score_intents_batch(texts, intent_model=None):
+    """
+    Score many queries with a single model call
+
+    Every query is split into segments, all segments are vectorized and
+    scored together, and the per-query aggregation is done with NumPy.
+
+    Args:
+        texts (list[str]): User queries
+        intent_model: Model to score with; defaults to the live model
+
+    Returns:
+        tuple: (scores, class_names) where scores[i, j] is the rounded
+        confidence of class_names[j] for texts[i]
+    """
+    segments = []
+    segment_query = []
+    for query_idx, text in enumerate(texts):
+        parts = split_query(text)
+        segments.extend(parts)
+        segment_query.extend([query_idx] * len(parts))
 
-    # Accumulate probabilities per intent
-    for part in parts:
-        X = vectorizer.transform([part])
-        probs = model.predict_proba(X)[0]
+    # One snapshot per call, so a hot-swap mid-batch can't mix versions
+    if intent_model is None:
+        intent_model = model_handle.get()
+    class_names = intent_model.class_names
 
-        for i, p in enumerate(probs):
-            intent = encoder.inverse_transform([i])[0]
-            intent_scores[intent] += float(p)
+    n_queries = len(texts)
+    n_classes = len(class_names)
+    scores = np.zeros((n_queries, n_classes))
 
-    
-    detected_intents = set()
-    for part in parts:
-        X = vectorizer.transform([part])
-        probs = model.predict_proba(X)[0]
-        best_idx = int(probs.argmax())
-        detected_intents.add(encoder.inverse_transform([best_idx])[0])
+    if segments:
+        segment_query = np.asarray(segment_query, dtype=np.intp)
+        probs = intent_model.predict_proba(segments)
 
-    # Zero out non-detected intents
-    for intent in intent_scores:
-        if intent not in detected_intents:
-            intent_scores[intent] = 0.0
+        # Accumulate probabilities per query, keep only intents that won a segment
+        np.add.at(scores, segment_query, probs)
+        detected = np.zeros((n_queries, n_classes), dtype=bool)
+        detected[segment_query, probs.argmax(axis=1)] = True
+        scores[~detected] = 0.0
 
-    scores = np.array(list(intent_scores.values()))
+    # Normalize
+    totals = scores.sum(axis=1, keepdims=True)
+    np.divide(scores, totals, out=scores, where=totals > 0)
+    return np.round(scores, 2), class_names
 
-    # Normalize 
-    if scores.sum() > 0:
-        scores = scores / scores.sum()
+
+def predict_intents_batch(texts, intent_model=None):
+    """
+    Predict intents for many queries with a single model call
+
+    Args:
+        texts (list[str]): User queries
+        intent_model: Model to score with; defaults to the live model
+
+    Returns:
+        list[list[dict]]: One ranked list of {"intent", "confidence"} per query
+    """
+    scores, class_names = score_intents_batch(texts, intent_model)
+
+    # Sort by confidence (stable, so ties keep class order)
+    order = np.argsort(-scores, axis=1, kind="stable")
 
     results = []
-    for intent, score in zip(intent_scores.keys(), scores):
-        results.append({
-            "intent": intent,
-            "confidence": round(float(score), 2)
-        })
+    for row, ranked in zip(scores, order):
+        results.append([
+            {"intent": class_names[i], "confidence": float(row[i])}
+            for i in ranked
+        ])
+
+    return results
 
-    # Sort by confidence
-    results = sorted(results, key=lambda x: x["confidence"], reverse=True)
 
-    return results
\ No newline at end of file
+def predict_intents(text, top_n=3):
+    return predict_intents_batch([text])[0]
@@ -0,0 +1,439 @@
+"""
+Model Registry
+--------------
+Versioned storage for the intent classifier plus a handle that hot-swaps
+the live model when a new version is published.
+
+Layout:
+    models/intent_model/
+        CURRENT                     <- name of the live version
+        versions/<version>/
+            manifest.json           <- version, labels, checksums, metadata
+            intent_model.pkl
+            vectorizer.pkl
+            label_encoder.pkl
+            examples.json           <- training examples, for the exact-match index
+            compiled/               <- NumPy scorer, see compiled_scorer.py
+
+publish() keeps the live version plus the newest KEEP_VERSIONS and deletes
+the rest.
+
+Versions with a compiled/ directory are served by the memory-mapped
+CompiledScorer, which never imports sklearn or joblib. Set
+BANKBOT_COMPILED_SCORER=0 to always load the pickles instead.
+
+Usage:
+    version = publish(model, vectorizer, encoder, {"n_examples": 120})
+    intent_model = model_handle.get()
+    probs = intent_model.predict_proba(["check my balance"])
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from .compiled_scorer import CONFIG_NAME, export_compiled, load_compiled
+from .exact_index import ExactMatchIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.path.join(os.path.dirname(BASE_DIR), "models", "intent_model")
+VERSIONS_DIR = os.path.join(REGISTRY_DIR, "versions")
+CURRENT_PATH = os.path.join(REGISTRY_DIR, "CURRENT")
+MANIFEST_NAME = "manifest.json"
+EXAMPLES_NAME = "examples.json"
+INTENTS_PATH = os.path.join(BASE_DIR, "intents.json")
+
+ARTIFACTS = {
+    "model": "intent_model.pkl",
+    "vectorizer": "vectorizer.pkl",
+    "encoder": "label_encoder.pkl",
+}
+COMPILED_DIR = "compiled"
+
+USE_COMPILED = os.environ.get("BANKBOT_COMPILED_SCORER", "1") != "0"
+
+# Published versions kept besides the live one; older ones are pruned on publish
+KEEP_VERSIONS = 10
+
+# Artifacts written straight into REGISTRY_DIR before versioning existed
+LEGACY_VERSION = "legacy"
+
+
+class IntentModel:
+    """One fully loaded, immutable model version"""
+
+    __slots__ = ("version", "model", "vectorizer", "encoder", "class_names", "manifest", "exact_index")
+
+    def __init__(self, version, model, vectorizer, encoder, manifest, exact_index):
+        self.version = version
+        self.model = model
+        self.vectorizer = vectorizer
+        self.encoder = encoder
+        self.manifest = manifest
+        self.exact_index = exact_index
+        # Column i of predict_proba is encoder class i; decode them all once.
+        # A tuple of str, shared by every result scored with this model
+        self.class_names = tuple(
+            str(name) for name in encoder.inverse_transform(list(range(len(encoder.classes_))))
+        )
+
+    def predict_proba(self, texts):
+        """Class probabilities for a list of (lowercased) texts"""
+        return self.model.predict_proba(self.vectorizer.transform(texts))
+
+
+class CompiledIntentModel:
+    """A model version served by the sklearn-free CompiledScorer"""
+
+    __slots__ = ("version", "scorer", "class_names", "manifest", "exact_index")
+
+    def __init__(self, version, scorer, manifest, exact_index):
+        self.version = version
+        self.scorer = scorer
+        self.class_names = scorer.class_names
+        self.manifest = manifest
+        self.exact_index = exact_index
+
+    def predict_proba(self, texts):
+        """Class probabilities for a list of (lowercased) texts"""
+        return self.scorer.predict_proba(texts)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _new_version():
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+
+def version_dir(version):
+    return os.path.join(VERSIONS_DIR, version)
+
+
+def publish(model, vectorizer, encoder, metadata=None, examples=None):
+    """
+    Write a new version bundle and make it the live version
+
+    The bundle is written to a temporary directory and renamed into place,
+    then CURRENT is replaced atomically, so readers only ever see complete
+    versions.
+
+    Args:
+        model: Fitted classifier
+        vectorizer: Fitted vectorizer
+        encoder: Fitted LabelEncoder
+        metadata (dict): Extra fields stored in the manifest
+        examples (list): (intent, example) pairs the model was trained on
+
+    Returns:
+        str: The new version name
+    """
+    import joblib
+
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    version = _new_version()
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=VERSIONS_DIR)
+
+    try:
+        files = {}
+        for key, obj in (("model", model), ("vectorizer", vectorizer), ("encoder", encoder)):
+            path = os.path.join(tmp_dir, ARTIFACTS[key])
+            joblib.dump(obj, path)
+            files[ARTIFACTS[key]] = _sha256(path)
+
+        if examples is not None:
+            path = os.path.join(tmp_dir, EXAMPLES_NAME)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump([list(pair) for pair in examples], f, ensure_ascii=False)
+            files[EXAMPLES_NAME] = _sha256(path)
+
+        # Models that aren't TF-IDF + LogisticRegression are served from the pickles only
+        try:
+            export_compiled(vectorizer, model, os.path.join(tmp_dir, COMPILED_DIR))
+            for filename in sorted(os.listdir(os.path.join(tmp_dir, COMPILED_DIR))):
+                files[f"{COMPILED_DIR}/{filename}"] = _sha256(os.path.join(tmp_dir, COMPILED_DIR, filename))
+        except ValueError:
+            shutil.rmtree(os.path.join(tmp_dir, COMPILED_DIR), ignore_errors=True)
+
+        manifest = {
+            "version": version,
+            "created_at": datetime.now().isoformat(),
+            "labels": [str(label) for label in encoder.classes_],
+            "files": files,
+            "compiled": f"{COMPILED_DIR}/{CONFIG_NAME}" in files,
+        }
+        manifest.update(metadata or {})
+
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4)
+
+        os.rename(tmp_dir, version_dir(version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    set_current(version)
+    try:
+        prune_versions()
+    except OSError as e:
+        print(f"❌ Could not prune old model versions: {e}")
+
+    # Chat labels of deleted versions could never be shown again
+    try:
+        from .relabel_chats import prune_labels
+        prune_labels()
+    except sqlite3.Error as e:
+        print(f"❌ Could not delete chat labels of pruned versions: {e}")
+    return version
+
+
+def prune_versions(keep=KEEP_VERSIONS):
+    """
+    Delete all but the newest `keep` versions; the live version is always kept
+
+    Returns:
+        list[str]: Deleted versions
+    """
+    live = current_version()
+    versions = list_versions()
+    older = versions[:-keep] if keep else versions
+    doomed = [version for version in older if version != live]
+
+    for version in doomed:
+        # Renamed first so readers never see a half-deleted bundle
+        tmp_dir = os.path.join(VERSIONS_DIR, f".del-{version}-{os.getpid()}")
+        os.rename(version_dir(version), tmp_dir)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return doomed
+
+
+def set_current(version):
+    """Atomically point CURRENT at an existing version"""
+    if not os.path.exists(os.path.join(version_dir(version), MANIFEST_NAME)):
+        raise ValueError(f"Unknown model version: {version}")
+
+    tmp_path = f"{CURRENT_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, CURRENT_PATH)
+
+
+def current_version():
+    """Name of the live version, or None if nothing has been published"""
+    try:
+        with open(CURRENT_PATH, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions():
+    """All published versions, oldest first"""
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(VERSIONS_DIR)
+        if not name.startswith(".") and os.path.exists(os.path.join(VERSIONS_DIR, name, MANIFEST_NAME))
+    )
+
+
+def read_manifest(version):
+    with open(os.path.join(version_dir(version), MANIFEST_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _intents_examples():
+    """(intent, example) pairs from intents.json, for versions without a snapshot"""
+    try:
+        with open(INTENTS_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return []
+    return [(intent["name"], example) for intent in data["intents"] for example in intent["examples"]]
+
+
+def _load_exact_index(path, labels):
+    """The version's own examples, or intents.json limited to the labels it can score"""
+    examples_path = os.path.join(path, EXAMPLES_NAME)
+    if not os.path.exists(examples_path):
+        return ExactMatchIndex(_intents_examples(), labels)
+    with open(examples_path, "r", encoding="utf-8") as f:
+        return ExactMatchIndex(json.load(f), labels)
+
+
+def load_version(version, compiled=None):
+    """
+    Load and verify a published version
+
+    Args:
+        version (str): Version name
+        compiled (bool): Use the compiled scorer when the version has one;
+            defaults to USE_COMPILED
+
+    Raises:
+        ValueError: If an artifact does not match its manifest checksum
+    """
+    manifest = read_manifest(version)
+    path = version_dir(version)
+    if compiled is None:
+        compiled = USE_COMPILED
+    compiled = compiled and manifest.get("compiled", False)
+
+    for filename, checksum in manifest["files"].items():
+        if filename.startswith(f"{COMPILED_DIR}/") and not compiled:
+            continue
+        if filename.endswith(".pkl") and compiled:
+            continue
+        if _sha256(os.path.join(path, filename)) != checksum:
+            raise ValueError(f"Checksum mismatch for {filename} in model version {version}")
+
+    if compiled:
+        scorer = load_compiled(os.path.join(path, COMPILED_DIR), tuple(manifest["labels"]))
+        return CompiledIntentModel(version, scorer, manifest, _load_exact_index(path, manifest["labels"]))
+
+    import joblib
+
+    return IntentModel(
+        version,
+        joblib.load(os.path.join(path, ARTIFACTS["model"])),
+        joblib.load(os.path.join(path, ARTIFACTS["vectorizer"])),
+        joblib.load(os.path.join(path, ARTIFACTS["encoder"])),
+        manifest,
+        _load_exact_index(path, manifest["labels"]),
+    )
+
+
+def load_legacy():
+    """Load the unversioned pickles from REGISTRY_DIR"""
+    import joblib
+
+    encoder = joblib.load(os.path.join(REGISTRY_DIR, ARTIFACTS["encoder"]))
+    labels = [str(label) for label in encoder.classes_]
+    return IntentModel(
+        LEGACY_VERSION,
+        joblib.load(os.path.join(REGISTRY_DIR, ARTIFACTS["model"])),
+        joblib.load(os.path.join(REGISTRY_DIR, ARTIFACTS["vectorizer"])),
+        encoder,
+        {"version": LEGACY_VERSION, "labels": labels},
+        ExactMatchIndex(_intents_examples(), labels),
+    )
+
+
+def artifact_stamp():
+    """
+    Cheap change marker for the live artifacts
+
+    The mtime of CURRENT when the registry is in use, otherwise the
+    mtimes of the legacy pickles. None when no model exists.
+    """
+    paths = [CURRENT_PATH] if os.path.exists(CURRENT_PATH) else [
+        os.path.join(REGISTRY_DIR, filename) for filename in ARTIFACTS.values()
+    ]
+    try:
+        return tuple(os.stat(path).st_mtime_ns for path in paths)
+    except FileNotFoundError:
+        return None
+
+
+class ModelHandle:
+    """
+    Process-wide, lazily initialised pointer to the live IntentModel
+
+    The first get() loads the model; after that get() never blocks. At most
+    every poll_interval seconds it stats the artifacts, and only when their
+    mtime changed does it load the new version in a background thread. The
+    new model replaces the old one with a single reference assignment, so
+    callers holding a snapshot keep using a complete model until they
+    finish.
+
+    Only one background load runs at a time, and get() never waits for it.
+    After a failed load the next attempt is delayed, doubling up to
+    max_backoff seconds, until a load succeeds.
+    """
+
+    def __init__(self, poll_interval=2.0, max_backoff=60.0):
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self._model = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        # Held by the background load; get() only ever tries it without waiting
+        self._swap_lock = threading.Lock()
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def get(self):
+        model = self._model
+        if model is None:
+            return self.refresh()
+
+        now = time.monotonic()
+        if now - self._checked_at >= self.poll_interval and now >= self._retry_at:
+            self._checked_at = now
+            if artifact_stamp() != self._stamp:
+                self._refresh_in_background()
+
+        return model
+
+    def refresh(self):
+        """
+        Reload if the artifacts changed and swap the new model in
+
+        A CURRENT rewrite that names the loaded version (e.g. re-pointing
+        to the same bundle) only updates the stamp.
+
+        Raises:
+            FileNotFoundError: If no model has been trained yet
+        """
+        with self._lock:
+            stamp = artifact_stamp()
+            model = self._model
+
+            if model is None or stamp != self._stamp:
+                version = current_version()
+                if model is None or version != model.version or version is None:
+                    model = load_version(version) if version else load_legacy()
+                    self._model = model
+                self._stamp = stamp
+
+            self._checked_at = time.monotonic()
+            return model
+
+    def _refresh_in_background(self):
+        # A load is already running: leave it to finish
+        if not self._swap_lock.acquire(blocking=False):
+            return
+        try:
+            threading.Thread(target=self._background_refresh, daemon=True).start()
+        except Exception:
+            self._swap_lock.release()
+            raise
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+            self._failures = 0
+            self._retry_at = 0.0
+        except Exception as e:
+            self._failures += 1
+            delay = min(self.max_backoff, self.poll_interval * 2 ** self._failures)
+            self._retry_at = time.monotonic() + delay
+            print(f"❌ Model hot-swap failed, keeping version {self._model.version}; "
+                  f"retrying in {delay:.1f}s: {e}")
+        finally:
+            self._swap_lock.release()
+
+
+model_handle = ModelHandle()
@@ -2,16 +2,58 @@
 NLU Router
 ----------
 Central router that combines:
-1. Intent classification
-2. Entity extraction
+1. Exact-match lookup of known training examples
+2. Intent classification
+3. Entity extraction
 
 Usage:
     router = NLURouter()
     result = router.process("Transfer ₹5000 to account 123456 TXN9876")
+    result.top_intent, result.confidence, result.top_k(3), result.to_dict()
 """
 
+import threading
+
+import numpy as np
+
 from .entity_extractor import EntityExtractor
-from .infer_intent import predict_intents
+from .infer_intent import score_intents_batch
+from .model_registry import model_handle
+from .results import NLUResult
+from monitoring.metrics import span
+
+
+def route_intents_batch(texts, intent_model):
+    """
+    Score queries the way NLURouter serves them: known training examples
+    from the model's exact-match index, only the rest with the classifier
+
+    Args:
+        texts (list[str]): User queries
+        intent_model: Model version to route with
+
+    Returns:
+        tuple: (scores, class_names, sources) where sources[i] is
+        "exact_match" or "classifier"
+    """
+    class_names = intent_model.class_names
+    # A hit the model can't score (an intent added since it was trained) goes to the classifier
+    hits = [intent_model.exact_index.lookup(text) for text in texts]
+    hits = [hit if hit in class_names else None for hit in hits]
+
+    scores = np.zeros((len(texts), len(class_names)))
+    misses = [i for i, hit in enumerate(hits) if hit is None]
+    if misses:
+        scores[misses] = score_intents_batch([texts[i] for i in misses], intent_model)[0]
+
+    sources = []
+    for i, hit in enumerate(hits):
+        if hit is None:
+            sources.append("classifier")
+        else:
+            scores[i, class_names.index(hit)] = 1.0
+            sources.append("exact_match")
+    return scores, class_names, sources
 
 
 class NLURouter:
@@ -20,37 +62,58 @@ class NLURouter:
         Initialize all NLU components
         """
         self.entity_extractor = EntityExtractor()
+        self._stats_lock = threading.Lock()
+        self._index_lookups = 0
+        self._index_hits = 0
 
     def process(self, user_text):
         """
         Complete NLU pipeline
 
         Steps:
-        1. Predict intents
-        2. Extract entities
-        3. Return structured output
+        1. Look the query up in the exact-match index
+        2. Predict intents if it's not a known example
+        3. Extract entities
+        4. Return structured output
+
+        Returns:
+            NLUResult
         """
 
-        # Step 1: Intent prediction
-        intents = predict_intents(user_text)
+        # Steps 1 and 2: exact-match fast path, then intent prediction for
+        # unknown queries, both with one snapshot of the live model
+        intent_model = model_handle.get()
+        with span("nlu.intent"):
+            scores, class_names, sources = route_intents_batch([user_text], intent_model)
+        source = sources[0]
 
-        # Step 2: Entity extraction
-        entities = self.entity_extractor.extract(user_text)
+        with self._stats_lock:
+            self._index_lookups += 1
+            if source == "exact_match":
+                self._index_hits += 1
 
-        # Step 3: Pick top intent
-        top_intent = intents[0]["intent"] if intents else None
-        confidence = intents[0]["confidence"] if intents else 0.0
+        # Step 3: Entity extraction
+        with span("nlu.entities"):
+            entities = self.entity_extractor.extract_spans(user_text)
 
         # Step 4: Final response
-        nlu_output = {
-            "text": user_text,
-            "top_intent": top_intent,
-            "confidence": confidence,
-            "intents": intents,
-            "entities": entities
-        }
+        return NLUResult(
+            user_text,
+            scores[0],
+            class_names,
+            entities,
+            source
+        )
 
-        return nlu_output
+    def index_stats(self):
+        """Exact-match index lookups, hits and hit rate since startup"""
+        with self._stats_lock:
+            lookups, hits = self._index_lookups, self._index_hits
+        return {
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
 
 
 # -------------------------------
@@ -63,7 +126,8 @@ if __name__ == "__main__":
     result = router.process(test_text)
 
     from pprint import pprint
-    pprint(result)
+    pprint(result.to_dict())
+    pprint(router.index_stats())
     
     def detect_intent_and_entities(text):
         text = text.lower()
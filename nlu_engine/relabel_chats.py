@@ -0,0 +1,163 @@
+"""
+Chat History Re-labelling
+-------------------------
+Re-scores every chat_history query with a given model version and stores
+the labels in chat_labels, keyed by (chat_id, model_version). The intent
+and confidence logged at chat time are left untouched, so the Admin
+dashboard can show either the logged labels or any relabelled version.
+
+Queries are labelled with NLURouter's own routing (route_intents_batch):
+known training examples from the model's exact-match index, only the rest
+through the classifier. Runs on the chat_backfill chunk runner, so it is pooled,
+reports rows per second and resumes per version; rows that already have a
+label for the version are skipped. Labels of versions that prune_versions
+has deleted are dropped by prune_labels, so the table holds at most one
+copy of the history per retained version.
+
+Usage:
+    python -m nlu_engine.relabel_chats                  # current model version
+    python -m nlu_engine.relabel_chats --version <v>    # a specific version
+"""
+
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BASE_DIR)
+
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from database.db import get_conn, init_db
+from nlu_engine.chat_backfill import CHUNK_SIZE, reset_job, run_chunked
+from nlu_engine.model_registry import LEGACY_VERSION, current_version, list_versions, load_legacy, load_version
+
+# Only chat_history rows without a label for the version being relabelled
+UNLABELLED = """NOT EXISTS (
+    SELECT 1 FROM chat_labels l WHERE l.chat_id = chat_history.id AND l.model_version = ?
+)"""
+
+# Model loaded once per pool worker
+_worker_model = None
+
+
+def _load_model(version):
+    return load_legacy() if version == LEGACY_VERSION else load_version(version)
+
+
+def _init_worker(version):
+    global _worker_model
+    _worker_model = _load_model(version)
+
+
+def checkpoint_name(version):
+    return f"chat_labels:{version}"
+
+
+def relabel_chunk(rows):
+    """Pool worker: (chat_id, version, intent, confidence) for a chunk of chats"""
+    from nlu_engine.nlu_router import route_intents_batch
+
+    model = _worker_model
+    queries = [query or "" for _, query, _ in rows]
+    scores, class_names, _ = route_intents_batch(queries, model)
+
+    best = scores.argmax(axis=1)
+    return [
+        (chat_id, model.version, class_names[i], float(row[i]))
+        for (chat_id, _, _), row, i in zip(rows, scores, best)
+    ]
+
+
+def write_labels(cur, results):
+    cur.executemany(
+        "INSERT OR REPLACE INTO chat_labels (chat_id, model_version, intent, confidence) VALUES (?, ?, ?, ?)",
+        results
+    )
+
+
+def relabel(version=None, chunk_size=CHUNK_SIZE, workers=None, restart=False):
+    """
+    Label every chat_history row not yet labelled with a model version
+
+    Args:
+        version (str): Model version; defaults to the current one
+        chunk_size (int): Rows per chunk
+        workers (int): Pool size (default: CPU count)
+        restart (bool): Relabel from the first row instead of resuming
+
+    Returns:
+        dict: rows processed, seconds taken and rows per second
+    """
+    version = version or current_version() or LEGACY_VERSION
+    _load_model(version)  # Fail here, not in every worker, if it can't load
+
+    if restart:
+        reset_job(checkpoint_name(version))
+
+    print(f"🏷️ Relabelling chat history with model version {version}")
+    return run_chunked(checkpoint_name(version), relabel_chunk, write_labels, chunk_size, workers,
+                       initializer=_init_worker, initargs=(version,),
+                       where=UNLABELLED, params=(version,))
+
+
+def prune_labels():
+    """
+    Delete the labels and checkpoints of model versions that no longer exist
+
+    Returns:
+        list[str]: Versions whose labels were deleted
+    """
+    retained = set(list_versions()) | {LEGACY_VERSION}
+    prefix = checkpoint_name("")
+
+    init_db()
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT model_version FROM chat_labels")
+    versions = {row[0] for row in cur.fetchall()}
+    cur.execute("SELECT name FROM job_checkpoints WHERE name LIKE ?", (prefix + "%",))
+    versions |= {row[0][len(prefix):] for row in cur.fetchall()}
+
+    doomed = sorted(versions - retained)
+    for version in doomed:
+        cur.execute("DELETE FROM chat_labels WHERE model_version = ?", (version,))
+        cur.execute("DELETE FROM job_checkpoints WHERE name = ?", (checkpoint_name(version),))
+    conn.commit()
+    conn.close()
+    return doomed
+
+
+def list_label_versions():
+    """
+    Model versions that chat history has been labelled with
+
+    Returns:
+        list[tuple]: (model_version, labelled rows), newest version first
+    """
+    init_db()
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT model_version, COUNT(*) FROM chat_labels
+        GROUP BY model_version ORDER BY model_version DESC
+    """)
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relabel chat_history with an intent model version")
+    parser.add_argument("--version", default=None, help="Model version (default: current)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--restart", action="store_true", help="Relabel from the first row")
+    args = parser.parse_args()
+
+    relabel(args.version, args.chunk_size, args.workers, args.restart)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+NLU Result Types
+----------------
+Compact result objects returned by NLURouter.process.
+
+An NLUResult keeps the intent scores as one NumPy row next to the model's
+class-name tuple, which every result scored by that model shares. The
+ranked per-intent view is only built when something asks for it, so the
+common case (DialogueHandler reading top_intent and confidence) allocates
+no per-class objects.
+
+to_dict() gives the nested-dict shape the Streamlit visualisers use.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass(slots=True)
+class IntentScore:
+    intent: str
+    confidence: float
+
+    def to_dict(self):
+        return {"intent": self.intent, "confidence": self.confidence}
+
+
+@dataclass(slots=True)
+class Entity:
+    """An extracted entity and its character span in the query"""
+
+    entity: str
+    value: object
+    start: int
+    end: int
+
+    def to_dict(self):
+        return {"entity": self.entity, "value": self.value, "start": self.start, "end": self.end}
+
+
+@dataclass(slots=True)
+class NLUResult:
+    """
+    Args:
+        text (str): The user's query
+        scores (np.ndarray): One confidence per class
+        class_names (tuple): Intent name per score column
+        entities (list[Entity]): Extracted entities
+        source (str): "classifier" or "exact_match"
+    """
+
+    text: str
+    scores: np.ndarray
+    class_names: tuple
+    entities: tuple = ()
+    source: str = "classifier"
+    # Ranking cache for top_k, built on first use
+    _order: np.ndarray = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def top_intent(self):
+        if not len(self.class_names):
+            return None
+        return self.class_names[int(self.scores.argmax())]
+
+    @property
+    def confidence(self):
+        if not len(self.class_names):
+            return 0.0
+        return float(self.scores.max())
+
+    def top_k(self, k=None):
+        """
+        Ranked intents, highest confidence first
+
+        Args:
+            k (int): Number of intents; all of them when None
+
+        Returns:
+            list[IntentScore]
+        """
+        if self._order is None:
+            # Stable, so ties keep class order (the same order argmax picks)
+            self._order = np.argsort(-self.scores, kind="stable")
+        return [IntentScore(self.class_names[i], float(self.scores[i])) for i in self._order[:k]]
+
+    @property
+    def intents(self):
+        return self.top_k()
+
+    def __eq__(self, other):
+        # The generated __eq__ would compare the score arrays element-wise
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (
+            (self.text, self.class_names, list(self.entities), self.source)
+            == (other.text, other.class_names, list(other.entities), other.source)
+            and np.array_equal(self.scores, other.scores)
+        )
+
+    def __repr__(self):
+        return f"NLUResult({self.text!r}, top_intent={self.top_intent!r}, confidence={self.confidence})"
+
+    def to_dict(self):
+        return {
+            "text": self.text,
+            "top_intent": self.top_intent,
+            "confidence": self.confidence,
+            "intents": [score.to_dict() for score in self.top_k()],
+            "entities": [entity.to_dict() for entity in self.entities],
+            "source": self.source,
+        }
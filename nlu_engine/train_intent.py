@@ -1,63 +1,271 @@
+import hashlib
 import json
 import joblib
 import numpy as np
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+import sys
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.naive_bayes import ComplementNB
+from sklearn.preprocessing import LabelEncoder
 from sklearn.svm import SVC
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Allow running as a script: python nlu_engine/train_intent.py
+if os.path.dirname(BASE_DIR) not in sys.path:
+    sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+from nlu_engine.model_registry import (
+    REGISTRY_DIR, current_version, list_versions, model_handle, publish,
+    read_manifest, set_current
+)
+
 INTENTS_PATH = os.path.join(BASE_DIR, "intents.json")
-MODEL_PATH = os.path.join(BASE_DIR, "intent_model.pkl")
-VECTORIZER_PATH = os.path.join(BASE_DIR, "vectorizer.pkl")
+VECTORIZER_CACHE_DIR = os.path.join(REGISTRY_DIR, "cache", "vectorizers")
+TRAINING_CONFIG_PATH = os.path.join(BASE_DIR, "training_config.json")
 
+# Cached vectorizers kept besides those of retained model versions, most recently used first
+VECTORIZER_CACHE_SIZE = 5
 
-def train_model():
-    """Train the intent classification model with high confidence"""
+# Use TF-IDF with more features for better discrimination
+VECTORIZER_PARAMS = {
+    "ngram_range": (1, 3),  # Increased to capture more context
+    "max_features": 5000,
+    "min_df": 1,
+    "sublinear_tf": True,
+}
+
+# Use Logistic Regression with high confidence (low regularization)
+CLASSIFIER_PARAMS = {
+    "C": 10.0,  # Lower regularization = more confident predictions
+    "max_iter": 2000,
+    "multi_class": "multinomial",
+    "solver": "lbfgs",
+    "random_state": 42,
+}
+
+DEFAULT_TRAINING_CONFIG = {
+    "vectorizer": {"type": "tfidf", "params": VECTORIZER_PARAMS},
+    "classifier": {"type": "logreg", "params": CLASSIFIER_PARAMS},
+}
+
+VECTORIZER_TYPES = {
+    "tfidf": TfidfVectorizer,
+    "hashing": HashingVectorizer,
+}
+
+# Every classifier here must support predict_proba
+CLASSIFIER_TYPES = {
+    "logreg": LogisticRegression,
+    "svc": SVC,
+    "sgd": SGDClassifier,
+    "complement_nb": ComplementNB,
+}
+
+
+def load_training_config():
+    """
+    Featurizer and classifier used by train_model
+
+    Returns:
+        dict: The winner written by evaluate_models.py --emit if present,
+        otherwise DEFAULT_TRAINING_CONFIG
+    """
+    if os.path.exists(TRAINING_CONFIG_PATH):
+        with open(TRAINING_CONFIG_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return DEFAULT_TRAINING_CONFIG
+
+
+def build_vectorizer(spec):
+    params = dict(spec["params"])
+    if "ngram_range" in params:
+        params["ngram_range"] = tuple(params["ngram_range"])
+    return VECTORIZER_TYPES[spec["type"]](**params)
+
+
+def build_classifier(spec):
+    return CLASSIFIER_TYPES[spec["type"]](**spec["params"])
+
+
+def model_kind(config):
+    """Manifest kind for a training config, e.g. tfidf_logreg"""
+    return f"{config['vectorizer']['type']}_{config['classifier']['type']}"
+
+
+def normalize_example(text):
+    """Lowercase and collapse whitespace, the form examples are trained on"""
+    return " ".join(text.lower().split())
+
+
+def load_training_examples():
+    """
+    Normalised, deduplicated training set from intents.json
+
+    Returns:
+        list[tuple]: Sorted (intent, example) pairs
+    """
     with open(INTENTS_PATH, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-    texts = []
-    labels = []
-
-    for intent in data["intents"]:
-        for example in intent["examples"]:
-            texts.append(example.lower())
-            labels.append(intent["name"])
-
-    # Use TF-IDF with more features for better discrimination
-    vectorizer = TfidfVectorizer(
-        ngram_range=(1, 3),  # Increased to capture more context
-        max_features=5000,
-        min_df=1,
-        sublinear_tf=True
-    )
+    return sorted({
+        (intent["name"], normalize_example(example))
+        for intent in data["intents"]
+        for example in intent["examples"]
+        if example.strip()
+    })
+
+
+def _fingerprint(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def training_fingerprints(examples, config):
+    """
+    Content hashes for a deduplicated (intent, example) set
+
+    Returns:
+        tuple: (dataset_hash, vocab_hash). dataset_hash covers everything the
+        fitted model depends on; vocab_hash only what the fitted vectorizer
+        depends on (the example texts and the vectorizer settings).
+    """
+    dataset_hash = _fingerprint({
+        "examples": examples,
+        "vectorizer": config["vectorizer"],
+        "classifier": config["classifier"],
+    })
+    vocab_hash = _fingerprint({
+        # Sorted on their own: a relabelled text moves in (intent, text) order
+        # but the fitted vocabulary and IDF don't depend on order
+        "texts": sorted(text for _, text in examples),
+        "vectorizer": config["vectorizer"],
+    })
+    return dataset_hash, vocab_hash
+
+
+def _find_version(dataset_hash):
+    """Newest published version trained on exactly this dataset, if any"""
+    for version in reversed(list_versions()):
+        if read_manifest(version).get("dataset_hash") == dataset_hash:
+            return version
+    return None
+
+
+def _fit_vectorizer(texts, vocab_hash, spec):
+    """Fit the vectorizer, or reuse the cached one fitted on the same texts"""
+    cache_path = os.path.join(VECTORIZER_CACHE_DIR, f"{vocab_hash}.pkl")
+
+    if os.path.exists(cache_path):
+        vectorizer = joblib.load(cache_path)
+        os.utime(cache_path)  # Most recently used, for prune_vectorizer_cache
+        return vectorizer, vectorizer.transform(texts)
+
+    vectorizer = build_vectorizer(spec)
     X = vectorizer.fit_transform(texts)
 
-    # Use Logistic Regression with high confidence (low regularization)
-    model = LogisticRegression(
-        C=10.0,  # Lower regularization = more confident predictions
-        max_iter=2000,
-        multi_class='multinomial',
-        solver='lbfgs',
-        random_state=42
-    )
+    os.makedirs(VECTORIZER_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    joblib.dump(vectorizer, tmp_path)
+    os.replace(tmp_path, cache_path)
+    return vectorizer, X
+
+
+def prune_vectorizer_cache(keep=VECTORIZER_CACHE_SIZE):
+    """
+    Delete cached vectorizers no retained model version was fitted with,
+    except the `keep` most recently used
+
+    Returns:
+        int: Number of cache entries deleted
+    """
+    if not os.path.isdir(VECTORIZER_CACHE_DIR):
+        return 0
+
+    referenced = set()
+    for version in list_versions():
+        try:
+            referenced.add(read_manifest(version).get("vocab_hash"))
+        except (OSError, ValueError):
+            pass  # Pruned or being written meanwhile
+
+    unreferenced = []
+    for filename in os.listdir(VECTORIZER_CACHE_DIR):
+        path = os.path.join(VECTORIZER_CACHE_DIR, filename)
+        if filename.endswith(".pkl") and filename[:-len(".pkl")] not in referenced:
+            unreferenced.append((os.path.getmtime(path), path))
+
+    unreferenced.sort(reverse=True)
+    for _, path in unreferenced[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return max(0, len(unreferenced) - keep)
+
+
+def train_model():
+    """
+    Train the intent classification model with high confidence
+
+    The featurizer and classifier come from load_training_config().
+    Training is keyed on a hash of the normalised, deduplicated examples
+    plus that config. An unchanged dataset re-activates the version
+    already trained on it instead of refitting, and a fitted vectorizer is
+    reused whenever the example texts are unchanged.
+
+    Returns:
+        str: The live model version
+    """
+    config = load_training_config()
+    examples = load_training_examples()
+    texts = [text for _, text in examples]
+    labels = [name for name, _ in examples]
+
+    dataset_hash, vocab_hash = training_fingerprints(examples, config)
+
+    version = _find_version(dataset_hash)
+    if version is not None:
+        if version != current_version():
+            set_current(version)
+        model_handle.refresh()
+        print(f"♻️ Training data unchanged, reusing model version {version}")
+        return version
+
+    vectorizer, X = _fit_vectorizer(texts, vocab_hash, config["vectorizer"])
+
+    model = build_classifier(config["classifier"])
     model.fit(X, labels)
 
-    joblib.dump(model, MODEL_PATH)
-    joblib.dump(vectorizer, VECTORIZER_PATH)
+    # LabelEncoder sorts like model.classes_, so column i is encoder class i
+    encoder = LabelEncoder().fit(labels)
+
+    # Publish a versioned bundle and swap it into this process right away;
+    # other processes pick it up on their next poll of CURRENT
+    version = publish(model, vectorizer, encoder, {
+        "kind": model_kind(config),
+        "n_examples": len(texts),
+        "dataset_hash": dataset_hash,
+        "vocab_hash": vocab_hash,
+    }, examples)
+    model_handle.refresh()
+
+    # publish() pruned old versions; drop the vectorizers only they used
+    try:
+        prune_vectorizer_cache()
+    except OSError as e:
+        print(f"❌ Could not prune the vectorizer cache: {e}")
     
-    print(f"✅ Model trained successfully with {len(texts)} examples")
+    print(f"✅ Model trained successfully with {len(texts)} examples (version {version})")
+    return version
 
 
 def predict_intents(user_text, top_n=4):
     """Predict intents for user text with confidence scores"""
-    model = joblib.load(MODEL_PATH)
-    vectorizer = joblib.load(VECTORIZER_PATH)
+    intent_model = model_handle.get()
 
-    X = vectorizer.transform([user_text.lower()])
-    probs = model.predict_proba(X)[0]
-    classes = model.classes_
+    probs = intent_model.predict_proba([user_text.lower()])[0]
+    classes = intent_model.class_names
 
     best_idx = int(np.argmax(probs))
 
@@ -82,8 +290,11 @@ def classify_intent(query):
         dict: Dictionary with 'intent', 'confidence', and 'all_intents'
     """
     try:
-        # Check if model files exist
-        if not os.path.exists(MODEL_PATH) or not os.path.exists(VECTORIZER_PATH):
+        # Shared, resident model: loaded once per process, reloaded only
+        # when the published artifacts change
+        try:
+            intent_model = model_handle.get()
+        except FileNotFoundError:
             return {
                 "intent": "unknown", 
                 "confidence": 0.0,
@@ -91,59 +302,50 @@ def classify_intent(query):
                 "error": "Model not trained. Please train the model first."
             }
         
-        # Load the trained model and vectorizer using joblib
-        model = joblib.load(MODEL_PATH)
-        vectorizer = joblib.load(VECTORIZER_PATH)
-        
         # Transform query and predict
-        query_vec = vectorizer.transform([query.lower()])
-        intent = model.predict(query_vec)[0]
+        probabilities = intent_model.predict_proba([query.lower()])[0]
+        classes = intent_model.class_names
+        intent = classes[int(np.argmax(probabilities))]
         
         # Get all confidence scores
         all_intents = {}
-        if hasattr(model, "predict_proba"):
-            probabilities = model.predict_proba(query_vec)[0]
-            classes = model.classes_
+        
+        # Find max probability
+        max_prob = float(max(probabilities))
+        
+       
+        if max_prob > 0.80:
+            for cls, prob in zip(classes, probabilities):
+                if cls == intent:
+                    all_intents[cls] = 1.00
+                else:
+                    all_intents[cls] = 0.00
+            confidence = 1.00
+        else:
+            
+            significant_intents = []
+            for cls, prob in zip(classes, probabilities):
+                if prob > 0.10:
+                    significant_intents.append((cls, float(prob)))
             
-            # Find max probability
-            max_prob = float(max(probabilities))
             
-           
-            if max_prob > 0.80:
-                for cls, prob in zip(classes, probabilities):
-                    if cls == intent:
-                        all_intents[cls] = 1.00
-                    else:
+            if significant_intents:
+                total_prob = sum(p for _, p in significant_intents)
+                for cls in classes:
+                    found = False
+                    for sig_cls, sig_prob in significant_intents:
+                        if cls == sig_cls:
+                            all_intents[cls] = round(sig_prob / total_prob, 2)
+                            found = True
+                            break
+                    if not found:
                         all_intents[cls] = 0.00
-                confidence = 1.00
             else:
-                
-                significant_intents = []
-                for cls, prob in zip(classes, probabilities):
-                    if prob > 0.10:
-                        significant_intents.append((cls, float(prob)))
-                
-                
-                if significant_intents:
-                    total_prob = sum(p for _, p in significant_intents)
-                    for cls in classes:
-                        found = False
-                        for sig_cls, sig_prob in significant_intents:
-                            if cls == sig_cls:
-                                all_intents[cls] = round(sig_prob / total_prob, 2)
-                                found = True
-                                break
-                        if not found:
-                            all_intents[cls] = 0.00
-                else:
-                   
-                    for cls in classes:
-                        all_intents[cls] = 1.00 if cls == intent else 0.00
-                
-                confidence = all_intents[intent]
-        else:
-            confidence = 1.00
-            all_intents = {intent: 1.00}
+               
+                for cls in classes:
+                    all_intents[cls] = 1.00 if cls == intent else 0.00
+            
+            confidence = all_intents[intent]
         
         return {
             "intent": intent,
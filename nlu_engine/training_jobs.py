@@ -0,0 +1,337 @@
+"""
+Training Job Manager
+--------------------
+Runs intent model training in a separate worker process and tracks it in
+the training_jobs table, so the Streamlit UIs can start a job, poll its
+status and logs, and cancel it without blocking a rerun.
+
+Only one job is queued or running at a time. The worker writes a heartbeat
+every few seconds; a running job whose heartbeat goes stale (crashed or
+killed worker) is marked failed the next time anyone looks.
+
+Once the new model is published the job is marked done, which frees the
+slot for the next job. The worker process then goes on to relabel chat
+history with the new version (see relabel_chats) so the Admin dashboard
+can show its labels; that run is checkpointed per version, so if it is cut
+short the next relabel of that version resumes it.
+
+Usage:
+    job_id = submit_job()
+    job = get_job(job_id)            # dict with status, timings, accuracy...
+    text, offset = read_log(job_id)  # call again with offset to stream
+    cancel_job(job_id)
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BASE_DIR)
+
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from database.db import get_conn, init_db
+from nlu_engine.model_registry import REGISTRY_DIR
+
+JOBS_DIR = os.path.join(REGISTRY_DIR, "jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+HEARTBEAT_INTERVAL = 2.0
+# A worker that hasn't reported for this long is considered dead
+STALE_AFTER = 30.0
+# Pool size for the post-training relabel, which shares the host with the app
+RELABEL_WORKERS = 2
+
+JOB_COLUMNS = [
+    "id", "status", "pid", "heartbeat", "created_at", "started_at", "finished_at",
+    "duration", "n_intents", "n_examples", "accuracy", "model_version", "log_path", "error"
+]
+
+
+class JobAlreadyRunning(Exception):
+    """Raised by submit_job when another training job is active"""
+
+    def __init__(self, job_id):
+        super().__init__(f"Training job {job_id} is already running")
+        self.job_id = job_id
+
+
+class JobCancelled(Exception):
+    pass
+
+
+_tables_ready = False
+
+
+def _conn():
+    global _tables_ready
+    if not _tables_ready:
+        init_db()
+        _tables_ready = True
+    return get_conn()
+
+
+def _row_to_job(row):
+    return dict(zip(JOB_COLUMNS, row)) if row else None
+
+
+def _expire_stale(cur):
+    """Fail active jobs whose worker stopped sending heartbeats"""
+    cur.execute(
+        f"""
+        UPDATE training_jobs
+        SET status = ?, error = ?, finished_at = ?
+        WHERE status IN ({",".join("?" * len(ACTIVE_STATUSES))})
+          AND COALESCE(heartbeat, 0) < ?
+        """,
+        (FAILED, "Worker stopped responding", datetime.now().isoformat(),
+         *ACTIVE_STATUSES, time.time() - STALE_AFTER)
+    )
+
+
+def submit_job():
+    """
+    Queue a full training run and start its worker process
+
+    Returns:
+        int: The new job id
+
+    Raises:
+        JobAlreadyRunning: If another job is queued or running
+    """
+    conn = _conn()
+    cur = conn.cursor()
+
+    # IMMEDIATE takes the write lock up front, so two processes can't both
+    # see "no active job" and insert one each
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        _expire_stale(cur)
+        cur.execute(
+            f"SELECT id FROM training_jobs WHERE status IN ({','.join('?' * len(ACTIVE_STATUSES))})",
+            ACTIVE_STATUSES
+        )
+        active = cur.fetchone()
+        if active:
+            raise JobAlreadyRunning(active[0])
+
+        cur.execute(
+            "INSERT INTO training_jobs (status, heartbeat, created_at) VALUES (?, ?, ?)",
+            (QUEUED, time.time(), datetime.now().isoformat())
+        )
+        job_id = cur.lastrowid
+        log_path = os.path.join(JOBS_DIR, f"{job_id}.log")
+        cur.execute("UPDATE training_jobs SET log_path = ? WHERE id = ?", (log_path, job_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get("PYTHONPATH")])))
+    with open(log_path, "ab") as log_file:
+        process = subprocess.Popen(
+            [sys.executable, "-u", "-m", "nlu_engine.training_jobs", str(job_id)],
+            cwd=os.getcwd(),  # same relative bankbot.db as the caller
+            env=env,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+        )
+
+    cur.execute("UPDATE training_jobs SET pid = ? WHERE id = ?", (process.pid, job_id))
+    conn.commit()
+    conn.close()
+    return job_id
+
+
+def get_job(job_id):
+    conn = _conn()
+    cur = conn.cursor()
+    _expire_stale(cur)
+    conn.commit()
+    cur.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM training_jobs WHERE id = ?", (job_id,))
+    job = _row_to_job(cur.fetchone())
+    conn.close()
+    return job
+
+
+def latest_job():
+    """Most recently submitted job, or None"""
+    conn = _conn()
+    cur = conn.cursor()
+    _expire_stale(cur)
+    conn.commit()
+    cur.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM training_jobs ORDER BY id DESC LIMIT 1")
+    job = _row_to_job(cur.fetchone())
+    conn.close()
+    return job
+
+
+def list_jobs(limit=20):
+    conn = _conn()
+    cur = conn.cursor()
+    cur.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM training_jobs ORDER BY id DESC LIMIT ?", (limit,))
+    jobs = [_row_to_job(row) for row in cur.fetchall()]
+    conn.close()
+    return jobs
+
+
+def read_log(job_id, offset=0):
+    """
+    Read a job's log from a byte offset
+
+    Returns:
+        tuple: (new text, offset to pass on the next call)
+    """
+    job = get_job(job_id)
+    if not job or not job["log_path"] or not os.path.exists(job["log_path"]):
+        return "", offset
+
+    with open(job["log_path"], "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    return data.decode("utf-8", errors="replace"), offset + len(data)
+
+
+def cancel_job(job_id):
+    """
+    Cancel a queued or running job
+
+    Returns:
+        bool: True if the job was active and is now cancelled
+    """
+    conn = _conn()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        UPDATE training_jobs SET status = ?, finished_at = ?
+        WHERE id = ? AND status IN ({",".join("?" * len(ACTIVE_STATUSES))})
+        """,
+        (CANCELLED, datetime.now().isoformat(), job_id, *ACTIVE_STATUSES)
+    )
+    cancelled = cur.rowcount == 1
+    conn.commit()
+    cur.execute("SELECT pid FROM training_jobs WHERE id = ?", (job_id,))
+    row = cur.fetchone()
+    conn.close()
+
+    if cancelled and row and row[0]:
+        try:
+            os.kill(row[0], signal.SIGTERM)
+        except OSError:
+            pass  # Worker already gone
+
+    return cancelled
+
+
+# ---------------- WORKER ----------------
+
+def _update(job_id, **fields):
+    """Update a job, but never overwrite a cancellation"""
+    conn = _conn()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    cur = conn.cursor()
+    cur.execute(
+        f"UPDATE training_jobs SET {assignments} WHERE id = ? AND status != ?",
+        (*fields.values(), job_id, CANCELLED)
+    )
+    updated = cur.rowcount == 1
+    conn.commit()
+    conn.close()
+    return updated
+
+
+def _heartbeat(job_id, stop):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        _update(job_id, heartbeat=time.time())
+
+
+def _cv_accuracy(n_splits=5):
+    """Cross-validated accuracy of the training config on intents.json (held-out folds)"""
+    from nlu_engine.evaluate_models import cross_validate, stratifiable
+    from nlu_engine.train_intent import load_training_config, load_training_examples
+
+    texts, labels, _, n_splits = stratifiable(load_training_examples(), n_splits)
+    _, predictions = cross_validate("live", load_training_config(), texts, labels, n_splits)
+    return sum(p == label for p, label in zip(predictions, labels)) / len(labels)
+
+
+def run_job(job_id):
+    """Worker entry point: train, publish and record the outcome"""
+
+    def on_sigterm(signum, frame):
+        raise JobCancelled()
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+    started = time.monotonic()
+    if not _update(job_id, status=RUNNING, pid=os.getpid(), heartbeat=time.time(),
+                   started_at=datetime.now().isoformat()):
+        print(f"Job {job_id} was cancelled before it started")
+        return
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True).start()
+    done = False
+
+    try:
+        from nlu_engine.train_intent import load_intents, train_model
+
+        intents_dict = load_intents()
+        n_examples = sum(len(examples) for examples in intents_dict.values())
+        print(f"📊 Training on {len(intents_dict)} intents, {n_examples} examples")
+        _update(job_id, n_intents=len(intents_dict), n_examples=n_examples)
+
+        version = train_model()
+
+        print("🧪 Measuring cross-validated accuracy...")
+        accuracy = _cv_accuracy()
+        print(f"✅ CV accuracy {accuracy:.3f}, model version {version}")
+
+        done = _update(job_id, status=DONE, model_version=version, accuracy=accuracy,
+                       finished_at=datetime.now().isoformat(), duration=time.monotonic() - started)
+
+    except JobCancelled:
+        print("⛔ Training cancelled")
+        _update(job_id, status=CANCELLED, finished_at=datetime.now().isoformat(),
+                duration=time.monotonic() - started)
+
+    except Exception as e:
+        print(f"❌ Training failed: {e}")
+        _update(job_id, status=FAILED, error=str(e), finished_at=datetime.now().isoformat(),
+                duration=time.monotonic() - started)
+
+    finally:
+        stop.set()
+
+    if done:
+        _relabel(version)
+
+
+def _relabel(version):
+    """Keep the dashboard's labels in step with a published model, outside the job slot"""
+    # The job is finished, so there is nothing left for cancel_job to cancel
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        from nlu_engine.relabel_chats import relabel
+        relabel(version, workers=RELABEL_WORKERS)
+    except Exception as e:
+        print(f"⚠️ Relabelling chat history failed: {e}")
+
+
+if __name__ == "__main__":
+    run_job(int(sys.argv[1]))
@@ -0,0 +1,115 @@
+"""ChatLogWriter: batching, flushing and backpressure"""
+
+import threading
+import time
+
+import pytest
+
+from database import bank_crud
+from database.chat_log_writer import ChatLogWriter
+
+
+def row(i):
+    return ("guest", f"query {i}", "greet", 1.0, "2026-01-01T10:00:00")
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Records every batch the writer writes instead of touching bankbot.db"""
+    written = []
+    monkeypatch.setattr(bank_crud, "save_chats", lambda rows: written.append(list(rows)))
+    return written
+
+
+def test_rows_are_written_in_batches(batches):
+    writer = ChatLogWriter(batch_size=3, flush_ms=5000)
+    for i in range(7):
+        writer.submit(row(i))
+    assert writer.flush(timeout=2)
+    writer.close()
+
+    assert [len(batch) for batch in batches[:2]] == [3, 3]
+    assert [r for batch in batches for r in batch] == [row(i) for i in range(7)]
+    assert writer.stats()["written"] == 7
+
+
+def test_partial_batch_is_written_after_the_flush_interval(batches):
+    writer = ChatLogWriter(batch_size=100, flush_ms=50)
+    writer.submit(row(0))
+
+    deadline = time.monotonic() + 2.0
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batches == [[row(0)]]
+    writer.close()
+
+
+def test_full_queue_writes_directly(monkeypatch):
+    writing = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def save_chats(rows):
+        if threading.current_thread().name == "chat-log-writer":
+            writing.set()
+            release.wait(5)
+        written.extend(rows)
+
+    monkeypatch.setattr(bank_crud, "save_chats", save_chats)
+    writer = ChatLogWriter(batch_size=1, flush_ms=0, max_queue=1, put_timeout=0.05)
+
+    writer.submit(row(0))
+    assert writing.wait(2)  # The background thread is stuck on row 0
+    writer.submit(row(1))   # Fills the queue
+    writer.submit(row(2))   # No room: written by the caller
+
+    assert written == [row(2)]
+    assert writer.stats()["direct_writes"] == 1
+
+    release.set()
+    writer.close()
+    assert sorted(written) == [row(0), row(1), row(2)]
+
+
+def test_close_writes_pending_rows_and_later_rows_directly(batches):
+    writer = ChatLogWriter(batch_size=100, flush_ms=5000)
+    writer.submit(row(0))
+    writer.close()
+    assert batches == [[row(0)]]
+
+    writer.submit(row(1))
+    assert batches == [[row(0)], [row(1)]]
+
+
+def test_failed_batch_is_retried_then_dropped(monkeypatch):
+    attempts = []
+
+    def save_chats(rows):
+        attempts.append(rows)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(bank_crud, "save_chats", save_chats)
+    writer = ChatLogWriter(batch_size=1)
+    writer.submit(row(0))
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert len(attempts) == 3
+    assert writer.stats()["dropped"] == 1
+
+
+def test_rows_reach_chat_history(tmp_path, monkeypatch):
+    from database.db import get_conn, init_db
+
+    monkeypatch.chdir(tmp_path)  # bankbot.db is opened relative to the working directory
+    init_db()
+
+    writer = ChatLogWriter(batch_size=10, flush_ms=5000)
+    for i in range(25):
+        writer.submit(row(i))
+    writer.close()
+
+    conn = get_conn()
+    rows = conn.execute("SELECT username, query, intent, confidence, timestamp FROM chat_history ORDER BY id").fetchall()
+    conn.close()
+    assert rows == [row(i) for i in range(25)]
@@ -0,0 +1,168 @@
+"""LLMGateway: single-flight, deadlines, circuit breaker and streams"""
+
+import threading
+import time
+
+import pytest
+
+from dialogue_manager.llm_gateway import HALF_OPEN, OPEN, CircuitBreaker, LLMGateway
+
+
+class FakeBackend:
+    """Answers after `delay` seconds, or raises `error`"""
+
+    def __init__(self, answer="answer", delay=0.0, error=None, chunks=None, chunk_delay=0.0):
+        self.answer = answer
+        self.delay = delay
+        self.error = error
+        self.chunks = chunks or [answer]
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def invoke(self, system_prompt, text):
+        with self._lock:
+            self.calls += 1
+        self.release.wait(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.answer
+
+    def stream(self, system_prompt, text):
+        with self._lock:
+            self.calls += 1
+        for chunk in self.chunks:
+            self.release.wait(self.chunk_delay)
+            yield chunk
+
+
+def make_gateway(backend, **kwargs):
+    kwargs.setdefault("hedge_after", 10.0)
+    kwargs.setdefault("breaker", CircuitBreaker(min_calls=2, open_seconds=60.0))
+    return LLMGateway(lambda: backend, fallback=lambda text: "fallback", **kwargs)
+
+
+@pytest.fixture
+def backends():
+    """Releases every backend a test made, so no pool thread outlives it"""
+    made = []
+
+    def make(**kwargs):
+        backend = FakeBackend(**kwargs)
+        made.append(backend)
+        return backend
+
+    yield make
+    for backend in made:
+        backend.release.set()
+
+
+def test_identical_concurrent_calls_share_one_upstream_call(backends):
+    backend = backends(delay=0.3)
+    gateway = make_gateway(backend)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gateway.call("k", "sys", "hi"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.calls == 1
+    assert sorted(source for _, source in results) == ["coalesced"] * 3 + ["llm"]
+    assert {answer for answer, _ in results} == {"answer"}
+
+
+def test_missed_deadline_returns_the_fallback(backends):
+    backend = backends(delay=5.0)
+    gateway = make_gateway(backend, deadline=0.2)
+
+    started = time.monotonic()
+    assert gateway.call("k", "sys", "hi") == ("fallback", "fallback")
+    assert time.monotonic() - started < 1.0
+
+    stats = gateway.stats()
+    assert stats["timeouts"] == 1
+    assert stats["abandoned_running"] == 1
+
+
+def test_slow_attempt_is_hedged(backends):
+    backend = backends(delay=5.0)
+    gateway = make_gateway(backend, deadline=0.5, hedge_after=0.1)
+
+    gateway.call("k", "sys", "hi")
+    assert backend.calls == 2
+    assert gateway.stats()["hedges"] == 1
+
+
+def test_breaker_opens_on_errors_and_fails_fast(backends):
+    backend = backends(error=RuntimeError("upstream down"))
+    gateway = make_gateway(backend, max_attempts=1)
+
+    for i in range(2):
+        assert gateway.call(f"k{i}", "sys", "hi")[1] == "fallback"
+    assert gateway.breaker.state == OPEN
+
+    assert gateway.call("k3", "sys", "hi") == ("fallback", "fallback")
+    assert backend.calls == 2
+    assert gateway.stats()["short_circuited"] == 1
+
+
+def test_abandoned_attempts_cap_new_calls(backends):
+    backend = backends(delay=5.0)
+    gateway = make_gateway(backend, deadline=0.1, max_attempts=1, max_abandoned=1)
+
+    gateway.call("k1", "sys", "hi")
+    assert gateway.stats()["abandoned_running"] == 1
+
+    # The hung attempt still holds a worker: fail fast instead of queueing
+    assert gateway.call("k2", "sys", "hi") == ("fallback", "fallback")
+    assert backend.calls == 1
+
+    backend.release.set()
+    deadline = time.monotonic() + 2.0
+    while gateway.stats()["abandoned_running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert gateway.call("k3", "sys", "hi") == ("answer", "llm")
+
+
+def test_stream_yields_chunks_and_reports_the_answer(backends):
+    backend = backends(chunks=["Hel", "lo"])
+    gateway = make_gateway(backend)
+
+    completed = []
+    assert list(gateway.stream("k", "sys", "hi", on_complete=completed.append)) == ["Hel", "lo"]
+    assert completed == ["Hello"]
+    assert gateway.breaker.window_stats() == {"window_calls": 1, "window_error_rate": 0.0}
+
+
+def test_stream_has_one_deadline_for_the_whole_answer(backends):
+    # Every chunk arrives well within the deadline, the whole answer doesn't
+    backend = backends(chunks=["a"] * 50, chunk_delay=0.05)
+    gateway = make_gateway(backend, deadline=0.3)
+
+    started = time.monotonic()
+    chunks = list(gateway.stream("k", "sys", "hi"))
+    assert time.monotonic() - started < 1.0
+    assert 0 < len(chunks) < 50
+
+    stats = gateway.stats()
+    assert stats["timeouts"] == 1
+    assert gateway.breaker.window_stats() == {"window_calls": 1, "window_error_rate": 1.0}
+
+
+def test_closed_stream_frees_the_half_open_probe(backends):
+    backend = backends(chunks=["a", "b", "c"], chunk_delay=0.05)
+    breaker = CircuitBreaker(min_calls=1, open_seconds=0.0)
+    breaker.record(False, 0.0)
+    assert breaker.state == HALF_OPEN
+    gateway = make_gateway(backend, breaker=breaker)
+
+    stream = gateway.stream("k", "sys", "hi")
+    assert next(stream) == "a"
+    stream.close()
+
+    # Neither closed (a success) nor re-opened (a failure), and the next call may probe
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,100 @@
+"""ModelHandle: non-blocking get() and background hot-swap"""
+
+import threading
+import time
+
+import pytest
+
+from nlu_engine import model_registry
+from nlu_engine.model_registry import ModelHandle
+
+
+class FakeModel:
+    def __init__(self, version):
+        self.version = version
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fake registry: CURRENT names `state["version"]`, loads go through `state["load"]`"""
+    state = {"version": "v1", "stamp": "s1", "loads": 0}
+
+    def load_version(version):
+        state["loads"] += 1
+        return state["load"](version)
+
+    state["load"] = FakeModel
+    monkeypatch.setattr(model_registry, "artifact_stamp", lambda: state["stamp"])
+    monkeypatch.setattr(model_registry, "current_version", lambda: state["version"])
+    monkeypatch.setattr(model_registry, "load_version", load_version)
+    return state
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def idle(handle):
+    """True once no background load holds the swap lock"""
+    if handle._swap_lock.acquire(blocking=False):
+        handle._swap_lock.release()
+        return True
+    return False
+
+
+def test_first_get_loads_the_current_version(registry):
+    handle = ModelHandle(poll_interval=0)
+    assert handle.get().version == "v1"
+    assert handle.get().version == "v1"
+    assert registry["loads"] == 1
+
+
+def test_get_never_waits_for_a_background_swap(registry):
+    handle = ModelHandle(poll_interval=0)
+    handle.get()
+
+    release = threading.Event()
+    loading = threading.Event()
+
+    def slow_load(version):
+        loading.set()
+        release.wait(5)
+        return FakeModel(version)
+
+    registry.update(version="v2", stamp="s2", load=slow_load)
+
+    started = time.monotonic()
+    assert handle.get().version == "v1"
+    assert loading.wait(2)
+    # A second get() while the load runs neither blocks nor starts another load
+    assert handle.get().version == "v1"
+    assert time.monotonic() - started < 1.0
+    assert registry["loads"] == 2
+
+    release.set()
+    wait_for(lambda: handle.get().version == "v2")
+    assert registry["loads"] == 2
+
+
+def test_failed_swap_keeps_the_old_model_and_backs_off(registry):
+    handle = ModelHandle(poll_interval=1.0, max_backoff=10.0)
+    handle.get()
+
+    def broken_load(version):
+        raise OSError("truncated bundle")
+
+    registry.update(version="v2", stamp="s2", load=broken_load)
+    handle._checked_at = 0.0  # Due for a poll
+    assert handle.get().version == "v1"
+    wait_for(lambda: idle(handle) and handle._failures == 1)
+    assert handle._retry_at > time.monotonic()
+
+    # Within the backoff a due poll doesn't try again
+    handle._checked_at = 0.0
+    assert handle.get().version == "v1"
+    assert idle(handle)
+    assert registry["loads"] == 2
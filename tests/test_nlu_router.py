@@ -0,0 +1,66 @@
+"""Exact-match index and route_intents_batch"""
+
+import numpy as np
+
+from nlu_engine import nlu_router
+from nlu_engine.exact_index import ExactMatchIndex, normalize_query
+from nlu_engine.nlu_router import route_intents_batch
+
+
+class FakeModel:
+    def __init__(self, class_names, examples):
+        self.class_names = tuple(class_names)
+        self.exact_index = ExactMatchIndex(examples)
+
+
+def fake_classifier(monkeypatch):
+    """Scores every query it's given as the model's last class; records the queries"""
+    scored = []
+
+    def score_intents_batch(texts, intent_model):
+        scored.extend(texts)
+        scores = np.zeros((len(texts), len(intent_model.class_names)))
+        scores[:, -1] = 0.7
+        return scores, intent_model.class_names
+
+    monkeypatch.setattr(nlu_router, "score_intents_batch", score_intents_batch)
+    return scored
+
+
+def test_normalize_query():
+    assert normalize_query("  What's my   BALANCE?? ") == "what s my balance"
+
+
+def test_index_skips_ambiguous_and_unknown_intents():
+    index = ExactMatchIndex(
+        [("greet", "Hello!"), ("check_balance", "balance"), ("faq", "balance"), ("new_intent", "open a locker")],
+        intents={"greet", "check_balance", "faq"},
+    )
+    assert index.lookup("hello") == "greet"
+    assert index.lookup("balance") is None
+    assert index.lookup("open a locker") is None
+    assert len(index) == 1
+
+
+def test_known_examples_skip_the_classifier(monkeypatch):
+    scored = fake_classifier(monkeypatch)
+    model = FakeModel(["check_balance", "greet"], [("check_balance", "show my balance")])
+
+    scores, class_names, sources = route_intents_batch(["Show my balance!", "something else"], model)
+
+    assert class_names == ("check_balance", "greet")
+    assert sources == ["exact_match", "classifier"]
+    assert scores.tolist() == [[1.0, 0.0], [0.0, 0.7]]
+    assert scored == ["something else"]
+
+
+def test_hit_for_an_intent_the_model_lacks_goes_to_the_classifier(monkeypatch):
+    scored = fake_classifier(monkeypatch)
+    # The index knows an intent added after the model was trained
+    model = FakeModel(["check_balance", "greet"], [("open_locker", "open a locker")])
+
+    scores, _, sources = route_intents_batch(["open a locker"], model)
+
+    assert sources == ["classifier"]
+    assert scores.tolist() == [[0.0, 0.7]]
+    assert scored == ["open a locker"]
@@ -0,0 +1,171 @@
+"""Session stores, session ownership and flow state persistence"""
+
+import sqlite3
+
+import pytest
+
+from dialogue_manager.dialogue_handler import DialogueHandler
+from dialogue_manager.flows import IDLE, SessionState
+from dialogue_manager.session_store import (
+    MemorySessionStore, SessionConflict, SQLiteSessionStore, save_messages
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(sweep_interval=3600)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), sweep_interval=3600)
+
+
+def test_missing_session_is_new(store):
+    session = store.load("sid")
+    assert session.version == 0
+    assert session.history == []
+    assert session.state.step == IDLE
+
+
+def test_save_and_load_round_trip(store):
+    session = store.load("sid")
+    session.state.start("transfer")
+    session.state.advance("1001")
+    session.history = [("You", "transfer money"), ("Bot", "💸 Please enter sender account number.")]
+    store.save(session)
+    assert session.version == 1
+
+    loaded = store.load("sid")
+    assert loaded.version == 1
+    assert loaded.history == session.history
+    assert loaded.state.step == session.state.step
+    assert loaded.state.slots == ("1001",)
+
+
+def test_stale_save_conflicts(store):
+    first = store.load("sid")
+    second = store.load("sid")
+    store.save(first)
+
+    with pytest.raises(SessionConflict):
+        store.save(second)
+
+
+def test_save_messages_merges_history_on_conflict(store):
+    first = store.load("sid")
+    second = store.load("sid")
+    save_messages(store, first, [("You", "hi"), ("Bot", "Hello")])
+
+    second.state.start("card_block")
+    save_messages(store, second, [("You", "block my card"), ("Bot", "🔒 ...")])
+
+    loaded = store.load("sid")
+    assert loaded.history == [("You", "hi"), ("Bot", "Hello"), ("You", "block my card"), ("Bot", "🔒 ...")]
+    # The message was handled with this session's state, so that state wins
+    assert loaded.state.step == second.state.step
+
+
+def test_expired_session_starts_over(tmp_path):
+    store = MemorySessionStore(ttl=-1, sweep_interval=3600)
+    session = store.load("sid")
+    session.history = [("You", "hi")]
+    store.save(session)
+
+    loaded = store.load("sid")
+    assert loaded.history == []
+    # Still the stored version, so saving it replaces the expired row
+    store.save(loaded)
+    assert store.sweep() == 1
+
+
+def test_guest_session_is_bound_to_the_browser(store):
+    session = store.load("sid")
+    assert session.owner is None
+    assert session.allows(None, "anyone")  # Unclaimed
+
+    session.claim("browser-a")
+    store.save(session)
+
+    loaded = store.load("sid")
+    assert loaded.allows(None, "browser-a")
+    assert not loaded.allows(None, "browser-b")
+    assert not loaded.allows("mallory", "browser-b")
+
+
+def test_logged_in_session_belongs_to_its_user(store):
+    session = store.load("sid")
+    session.claim("browser-a")
+    session.state.username = "alice"
+    store.save(session)
+
+    loaded = store.load("sid")
+    assert loaded.owner == "alice"
+    assert loaded.allows("alice", "browser-b")
+    assert not loaded.allows("bob", "browser-a")
+    assert not loaded.allows(None, "browser-a")
+
+
+def test_sqlite_store_migrates_old_databases(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE sessions (
+        sid TEXT PRIMARY KEY,
+        state BLOB NOT NULL,
+        history TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        version INTEGER NOT NULL
+    )
+    """)
+    conn.commit()
+    conn.close()
+
+    store = SQLiteSessionStore(path, sweep_interval=3600)
+    session = store.load("sid")
+    session.claim("browser-a")
+    store.save(session)
+    assert store.load("sid").secret_hash == session.secret_hash
+
+
+def test_state_from_an_unknown_flow_is_idle():
+    state = SessionState(username="alice")
+    state.start("balance")
+    data = state.to_bytes().replace(b'"balance"', b'"retired_flow"')
+
+    restored = SessionState.from_bytes(data)
+    assert restored.step == IDLE
+    assert restored.username == "alice"
+
+
+# ---------------- FLOW ACTIONS ----------------
+
+def card_block_handler(before_action):
+    handler = DialogueHandler(SessionState(), before_action=before_action)
+    handler.state.start("card_block")
+    handler.state.advance("1001")
+    return handler
+
+
+def test_flow_state_is_persisted_before_the_action_runs():
+    events = []
+
+    def before_action():
+        events.append(("persist", handler.state.step))
+
+    handler = card_block_handler(before_action)
+    handler.process_card_block = lambda acc_no, reason: events.append(("action", acc_no, reason)) or "blocked"
+
+    intent, _, response = handler._respond("stolen")
+    assert (intent, response) == ("card_block", "blocked")
+    assert events == [("persist", IDLE), ("action", "1001", "stolen")]
+
+
+def test_action_does_not_run_if_persisting_fails():
+    def before_action():
+        raise SessionConflict("sid")
+
+    actions = []
+    handler = card_block_handler(before_action)
+    handler.process_card_block = lambda acc_no, reason: actions.append(acc_no)
+
+    with pytest.raises(SessionConflict):
+        handler._respond("stolen")
+    assert actions == []